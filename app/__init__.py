@@ -0,0 +1,95 @@
+import os
+import time
+
+from dotenv import load_dotenv
+from flask import Flask, render_template
+
+from logger.logger import init_app as init_logging, setup_logger
+
+# Templates live next to the package, at the project root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def create_app(config=None):
+    """
+    Build the Flask application with one shared service container.
+    The database and OMDb client are only created when a request first needs them.
+    """
+    started = time.perf_counter()
+    logger = setup_logger(__name__)
+    load_dotenv()
+
+    # Imported here so that importing the package stays free of side effects
+    from app.assets import AssetManifest
+    from app.commands import build_assets, build_recommendations, link_catalog, rebuild_user_stats
+    from app.container import ServiceContainer
+    from app.controller.http_cache import PageCache, templates_fingerprint
+    from app.controller.api_controller import api_controller
+    from app.controller.assets_controller import assets_controller
+    from app.controller.home_controller import home_controller
+    from app.controller.metrics_controller import metrics_controller
+    from app.controller.poster_controller import poster_controller
+    from app.metrics import metrics
+    from app.controller.users_movie_controller import users_movie_controller
+
+    app = Flask(__name__, root_path=PROJECT_ROOT)
+    app.config['DB_NAME'] = os.getenv('DB_NAME', 'moviwebapp.db')
+    # Any SQLAlchemy URL (sqlite:///..., postgresql://...); overrides DB_NAME when set
+    app.config['DATABASE_URL'] = os.getenv('DATABASE_URL')
+    # Read-only methods use this replica; SQLite defaults to a read-only pool on the same file
+    app.config['DATABASE_READ_URL'] = os.getenv('DATABASE_READ_URL')
+    # After a write, the client's reads stay on the primary this long so it sees its own changes
+    app.config['READ_YOUR_WRITES_SECONDS'] = float(os.getenv('READ_YOUR_WRITES_SECONDS', 0))
+    # Add movies immediately and look them up on OMDb in the background
+    app.config['ASYNC_MOVIE_RESOLUTION'] = os.getenv('ASYNC_MOVIE_RESOLUTION', '').lower() in ('1', 'true', 'yes')
+    # Instrumentation: /metrics endpoint and Server-Timing response header
+    app.config['METRICS_ENABLED'] = os.getenv('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes')
+    app.config['SERVER_TIMING'] = os.getenv('SERVER_TIMING', '').lower() in ('1', 'true', 'yes')
+    if config:
+        app.config.update(config)
+    if not app.config['DB_NAME'] and not app.config['DATABASE_URL']:
+        raise Exception("Movie DB Key not found in environment variables.")
+
+    ServiceContainer(app.config['DB_NAME'], app.config['DATABASE_URL'], app.config['DATABASE_READ_URL'],
+                     app.config['ASYNC_MOVIE_RESOLUTION']).init_app(app)
+    init_logging(app)
+
+    # Templates reference static files through asset(), resolved from static/dist/manifest.json
+    assets = AssetManifest(app.static_folder)
+    assets.init_app(app)
+
+    # Conditional GETs: ETags change with the data, the templates and the asset build
+    app.config.setdefault('ETAG_SALT', templates_fingerprint(os.path.join(app.root_path, app.template_folder))
+                          + assets.fingerprint)
+    page_cache_size = int(app.config.get('PAGE_CACHE_SIZE', os.getenv('PAGE_CACHE_SIZE', 0)))
+    if page_cache_size:
+        app.extensions['page_cache'] = PageCache(page_cache_size)
+
+    # Register Blueprints
+    app.register_blueprint(home_controller)
+    app.register_blueprint(users_movie_controller)
+    app.register_blueprint(api_controller)
+    app.register_blueprint(poster_controller)
+    app.register_blueprint(assets_controller)
+    if app.config['METRICS_ENABLED']:
+        app.register_blueprint(metrics_controller)
+    metrics.init_app(app)
+    app.cli.add_command(rebuild_user_stats)
+    app.cli.add_command(link_catalog)
+    app.cli.add_command(build_assets)
+    app.cli.add_command(build_recommendations)
+
+    @app.errorhandler(404)
+    def page_not_found(e):
+        """Displaying message if any http route i not found  """
+        app.logger.warning("Page not found: 404.")
+        return render_template('404.html'), 404
+
+    @app.errorhandler(Exception)
+    def handle_error(e):
+        """Global error handler for all exceptions."""
+        app.logger.error(f"An unhandled exception occurred: {e}", exc_info=True)
+        return render_template('error.html'), 500
+
+    logger.info(f"Created app in {(time.perf_counter() - started) * 1000:.1f} ms.")
+    return app
@@ -0,0 +1,152 @@
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+
+import requests
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only gzip variants are written
+    brotli = None
+
+BOOTSTRAP_URL = 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/'
+# URL prefix of the fingerprinted files, served by assets_controller
+ASSETS_URL = '/assets/'
+
+
+class Asset:
+    """A file under the static folder; vendored files also name the pinned URL they are fetched from."""
+
+    def __init__(self, path, url=None, integrity=None):
+        self.path = path
+        self.url = url
+        # Subresource Integrity hash the download must match
+        self.integrity = integrity
+
+
+# Every asset templates can reference with asset(name)
+ASSETS = {
+    'bootstrap.min.css': Asset(
+        'vendor/bootstrap-5.3.2/bootstrap.min.css', BOOTSTRAP_URL + 'css/bootstrap.min.css',
+        'sha384-T3c6CoIi6uLrA9TneNEoa7RxnatzjcDSCmG1MXxSR1GAsXEV/Dwwykc2MPK8M2HN',
+    ),
+    'bootstrap.bundle.min.js': Asset(
+        'vendor/bootstrap-5.3.2/bootstrap.bundle.min.js', BOOTSTRAP_URL + 'js/bootstrap.bundle.min.js',
+        'sha384-C6RzsynM9kWDrMNeT87bh95OGNyZPhcTNXj1NW7RuBCsyN/o0jlpcV8Qyq46cDfL',
+    ),
+    'app.css': Asset('css/app.css'),
+    'style.css': Asset('css/style.css'),
+}
+
+# Content-Encoding -> file suffix of the precompressed variants, in order of preference
+PRECOMPRESSED = [('br', '.br'), ('gzip', '.gz')] if brotli else [('gzip', '.gz')]
+
+
+def minify_css(css):
+    """Strip comments and insignificant whitespace from a stylesheet."""
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.DOTALL)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{}:;,>])\s*', r'\1', css)
+    return css.replace(';}', '}').strip()
+
+
+def _fetch_vendor_file(asset, source):
+    response = requests.get(asset.url, timeout=30)
+    response.raise_for_status()
+    algorithm, expected = asset.integrity.split('-', 1)
+    actual = base64.b64encode(hashlib.new(algorithm, response.content).digest()).decode()
+    if actual != expected:
+        raise ValueError(f"{asset.url} does not match its pinned integrity hash")
+    os.makedirs(os.path.dirname(source), exist_ok=True)
+    with open(source, 'wb') as file:
+        file.write(response.content)
+    logging.info(f"Vendored {asset.url}.")
+
+
+def _write(path, data):
+    # Written under a temporary name so that a running server never reads a partial file
+    with open(f"{path}.tmp", 'wb') as file:
+        file.write(data)
+    os.replace(f"{path}.tmp", path)
+
+
+def build_assets(static_folder, assets=ASSETS):
+    """
+    Write a fingerprinted copy of every asset to <static_folder>/dist, with precompressed
+    variants, and return the manifest mapping asset names to the fingerprinted file names.
+
+    Vendored files missing from the static folder are downloaded once and checked against
+    their integrity hash; the app's own stylesheets are minified. Files of earlier builds
+    are kept, so pages cached by browsers keep working until they are refreshed.
+    """
+    dist_folder = os.path.join(static_folder, 'dist')
+    os.makedirs(dist_folder, exist_ok=True)
+    manifest = {}
+    for name, asset in assets.items():
+        source = os.path.join(static_folder, asset.path)
+        if not os.path.exists(source) and asset.url:
+            _fetch_vendor_file(asset, source)
+        with open(source, 'rb') as file:
+            data = file.read()
+        if name.endswith('.css') and '.min.' not in name:
+            data = minify_css(data.decode()).encode()
+
+        stem, extension = os.path.splitext(name)
+        file_name = f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{extension}"
+        path = os.path.join(dist_folder, file_name)
+        if not os.path.exists(path):
+            _write(path, data)
+            # mtime=0 keeps the gzip output identical across builds
+            _write(path + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli:
+                _write(path + '.br', brotli.compress(data, quality=11))
+        manifest[name] = file_name
+
+    _write(os.path.join(dist_folder, 'manifest.json'), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+
+class AssetManifest:
+    """
+    Resolves asset names to URLs for the templates' asset() helper.
+
+    Built assets resolve to their fingerprinted /assets/ URL. Until `flask build-assets`
+    has run, they fall back to their source under /static/, or to the CDN for vendored
+    files that have not been downloaded. The manifest is read once, when the app starts.
+    """
+
+    def __init__(self, static_folder, assets=ASSETS):
+        self.static_folder = static_folder
+        self.dist_folder = os.path.join(static_folder, 'dist')
+        self.assets = assets
+        self.files = {}
+        path = os.path.join(self.dist_folder, 'manifest.json')
+        if os.path.exists(path):
+            with open(path) as file:
+                self.files = json.load(file)
+
+    @property
+    def fingerprint(self):
+        """Changes with every build, so that cached pages referencing older files are re-rendered."""
+        return hashlib.sha1(json.dumps(self.files, sort_keys=True).encode()).hexdigest()[:12]
+
+    def url(self, name):
+        if name in self.files:
+            return ASSETS_URL + self.files[name]
+        asset = self.assets[name]
+        if asset.url and not os.path.exists(os.path.join(self.static_folder, asset.path)):
+            return asset.url
+        return f"/static/{asset.path}"
+
+    def has_file(self, file_name):
+        path = safe_join(self.dist_folder, file_name)
+        return path is not None and os.path.isfile(path)
+
+    def init_app(self, app):
+        app.extensions['assets'] = self
+        app.add_template_global(self.url, 'asset')
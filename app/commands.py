@@ -0,0 +1,47 @@
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from app.assets import build_assets as build_asset_files
+from app.services.service_proxy import movie_service
+
+
+@click.command('rebuild-user-stats')
+@with_appcontext
+def rebuild_user_stats():
+    """Recompute the denormalized per-user movie counters from the movies table."""
+    repaired = movie_service.rebuild_user_stats()
+    if repaired is None:
+        raise click.ClickException("Rebuilding the user counters failed, see the log for details.")
+    click.echo(f"Repaired the counters of {repaired} user(s).")
+
+
+@click.command('link-catalog')
+@with_appcontext
+def link_catalog():
+    """Link movies added before the shared catalog existed to their catalog entries."""
+    linked, unresolved = movie_service.link_catalog()
+    click.echo(f"Linked {linked} movie(s) to the catalog.")
+    if unresolved:
+        click.echo(f"Could not resolve {len(unresolved)} title(s): {', '.join(unresolved[:20])}")
+
+
+@click.command('build-recommendations')
+@with_appcontext
+def build_recommendations():
+    """Recompute the similar titles shown as recommendations on the user pages."""
+    titles = movie_service.rebuild_recommendations()
+    click.echo(f"Computed recommendations for {titles} title(s).")
+
+
+@click.command('build-assets')
+@with_appcontext
+def build_assets():
+    """Vendor, minify and fingerprint the static assets into static/dist."""
+    try:
+        manifest = build_asset_files(current_app.static_folder)
+    except Exception as e:
+        raise click.ClickException(f"Building the assets failed: {e}")
+    for name, file_name in sorted(manifest.items()):
+        click.echo(f"{name} -> {file_name}")
+    click.echo("Restart the app to serve the new files.")
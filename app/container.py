@@ -0,0 +1,158 @@
+import logging
+import threading
+import time
+
+from flask import current_app, request
+
+from app.data_manager.factory import create_data_manager
+from app.data_manager.sql_data_manager import read_from_primary
+from app.external_apis.omdb_api import OMDbAPI
+from app.services.movie_resolver import MovieResolver
+from app.services.movie_service import MovieService
+from app.services.omdb_api_service import OMDbAPIService
+from app.services.omdb_cache import OMDbCache
+from app.services.poster_cache import PosterCache
+from app.services.recommender import Recommender
+from app.services.title_index import TitleAutocomplete
+
+
+class ServiceContainer:
+    """
+    Owns the application's single set of services: the data manager (engine and
+    sessions), the OMDb client and its cache, and the MovieService built on them.
+
+    Every service is created on first use, so building the app neither touches
+    the database nor reads the OMDb settings until a request needs them.
+    """
+
+    # Cookie marking a client that wrote recently, whose reads stay on the primary
+    READ_PRIMARY_COOKIE = 'read_primary_until'
+
+    def __init__(self, db_file_name, database_url=None, read_url=None, async_resolution=False):
+        self.db_file_name = db_file_name
+        self.database_url = database_url
+        self.read_url = read_url
+        # Whether movies are looked up on OMDb in the background (ASYNC_MOVIE_RESOLUTION)
+        self.async_resolution = async_resolution
+        self._lock = threading.RLock()
+        self._data_manager = None
+        self._omdb_api_service = None
+        self._movie_resolver = None
+        self._movie_service = None
+        self._poster_cache = None
+        self._title_autocomplete = None
+        self._recommender = None
+
+    @property
+    def data_manager(self):
+        if self._data_manager is None:
+            with self._lock:
+                if self._data_manager is None:
+                    started = time.perf_counter()
+                    self._data_manager = create_data_manager(self.database_url, self.db_file_name, self.read_url)
+                    logging.info(f"Initialized database '{self._data_manager.engine.url}' "
+                                 f"in {(time.perf_counter() - started) * 1000:.1f} ms.")
+        return self._data_manager
+
+    @property
+    def omdb_api_service(self):
+        if self._omdb_api_service is None:
+            with self._lock:
+                if self._omdb_api_service is None:
+                    cache = OMDbCache(self.data_manager.session_factory)
+                    self._omdb_api_service = OMDbAPIService(client=OMDbAPI(), cache=cache,
+                                                            catalog=self.data_manager)
+        return self._omdb_api_service
+
+    @property
+    def movie_resolver(self):
+        if self._movie_resolver is None:
+            with self._lock:
+                if self._movie_resolver is None:
+                    self._movie_resolver = MovieResolver(self.data_manager, lambda: self.omdb_api_service,
+                                                         title_autocomplete=self.title_autocomplete)
+                    # Pick up lookups interrupted by a restart
+                    self._movie_resolver.resume()
+        return self._movie_resolver
+
+    @property
+    def movie_service(self):
+        if self._movie_service is None:
+            with self._lock:
+                if self._movie_service is None:
+                    # The OMDb service is resolved lazily too, so browsing works without an API key.
+                    # The resolver, its worker threads and its resume() query only exist in async mode.
+                    movie_resolver = self.movie_resolver if self.async_resolution else None
+                    self._movie_service = MovieService(self.data_manager, lambda: self.omdb_api_service,
+                                                       movie_resolver, self.title_autocomplete, self.recommender)
+        return self._movie_service
+
+    @property
+    def title_autocomplete(self):
+        if self._title_autocomplete is None:
+            with self._lock:
+                if self._title_autocomplete is None:
+                    # The index itself is built in the background on the first suggestion request
+                    self._title_autocomplete = TitleAutocomplete(self.data_manager)
+        return self._title_autocomplete
+
+    @property
+    def recommender(self):
+        if self._recommender is None:
+            with self._lock:
+                if self._recommender is None:
+                    # Reads the similarity file written by `flask build-recommendations`, if there is one
+                    self._recommender = Recommender(self.data_manager)
+        return self._recommender
+
+    @property
+    def poster_cache(self):
+        if self._poster_cache is None:
+            with self._lock:
+                if self._poster_cache is None:
+                    self._poster_cache = PosterCache(self.data_manager)
+        return self._poster_cache
+
+    def poster_cache_stats(self):
+        """Size of the poster thumbnail cache, or None while it has not been created."""
+        if self._poster_cache is None:
+            return None
+        return self._poster_cache.stats()
+
+    def omdb_cache_stats(self):
+        """Hit/miss counters of the OMDb cache, or None while it has not been created."""
+        if self._omdb_api_service is None or self._omdb_api_service.cache is None:
+            return None
+        return self._omdb_api_service.cache.stats()
+
+    def shutdown(self):
+        """Wait for the background poster downloads and movie lookups that were started, then stop them."""
+        with self._lock:
+            workers = [worker for worker in (self._poster_cache, self._movie_resolver) if worker is not None]
+        for worker in workers:
+            worker.shutdown()
+
+    def init_app(self, app):
+        """Register the container on the app and tie database sessions to the request lifecycle."""
+        app.extensions['services'] = self
+        app.teardown_appcontext(self.remove_session)
+        app.before_request(self._route_reads)
+        app.after_request(self._mark_writer)
+
+    def _route_reads(self):
+        # Read-your-writes: a client that wrote within the window reads from the primary
+        until = request.cookies.get(self.READ_PRIMARY_COOKIE, type=float)
+        if until and until > time.time():
+            read_from_primary()
+
+    def _mark_writer(self, response):
+        window = current_app.config.get('READ_YOUR_WRITES_SECONDS', 0)
+        if window and request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            response.set_cookie(self.READ_PRIMARY_COOKIE, str(time.time() + window), max_age=int(window) or 1,
+                                httponly=True, samesite='Lax')
+        return response
+
+    def remove_session(self, exception=None):
+        # Nothing to clean up if no request has touched the database yet
+        if self._data_manager is not None:
+            self._data_manager.remove_session(exception)
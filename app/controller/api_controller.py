@@ -0,0 +1,136 @@
+import csv
+import io
+import json
+import logging
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+
+from app.controller.http_cache import conditional
+from app.services.movie_service import DEFAULT_PAGE_SIZE
+from app.services.service_proxy import movie_service
+from app.validation.pagination_validator import PaginationValidator
+
+api_controller = Blueprint('api_controller', __name__, url_prefix='/api/v1')
+
+# Columns of the movie export, in order
+EXPORT_FIELDS = ['id', 'user_id', 'name', 'year', 'rating', 'status']
+# Bytes buffered before an export chunk is sent
+EXPORT_CHUNK_SIZE = 64 * 1024
+# Longest query and largest number of suggestions of the title autocomplete
+MAX_AUTOCOMPLETE_QUERY = 100
+MAX_AUTOCOMPLETE_LIMIT = 20
+
+
+@api_controller.route('/users', methods=['GET'])
+@conditional(lambda: ['*'])
+def list_users():
+    """
+        Route returning one keyset page of users with their movie count.
+    """
+    after_id, before_id, limit = PaginationValidator.validate_page(DEFAULT_PAGE_SIZE)
+    return jsonify(movie_service.get_users_page(after_id=after_id, before_id=before_id, limit=limit))
+
+@api_controller.route('/users/<int:user_id>', methods=['GET'])
+@conditional(lambda user_id: [f'user:{user_id}'])
+def get_user(user_id):
+    """
+        Route returning a user with their movie count.
+    """
+    user = movie_service.get_user_with_movie_count(user_id)
+    if not user:
+        return jsonify({"error": f"User not found with ID:{user_id}"}), 404
+    return jsonify(user)
+
+@api_controller.route('/users/<int:user_id>/movies', methods=['GET'])
+@conditional(lambda user_id: [f'user:{user_id}'])
+def user_movies(user_id):
+    """
+        Route returning one keyset page of a user's movies, newest first.
+    """
+    if not movie_service.get_user(user_id):
+        return jsonify({"error": f"User not found with ID:{user_id}"}), 404
+    after_id, before_id, limit = PaginationValidator.validate_page(DEFAULT_PAGE_SIZE)
+    return jsonify(movie_service.get_user_movies_page(user_id, after_id=after_id, before_id=before_id, limit=limit))
+
+@api_controller.route('/favorites', methods=['GET'])
+@conditional(lambda: ['*'])
+def favorites():
+    """
+        Route returning each user's favorite movie; repeat ?user_id= to select users.
+    """
+    user_ids = request.args.getlist('user_id', type=int) or None
+    return jsonify(movie_service.get_user_favorites(user_ids))
+
+@api_controller.route('/stats', methods=['GET'])
+@conditional(lambda: ['*'])
+def stats():
+    """
+        Route returning the total number of users and movies.
+    """
+    dashboard = movie_service.get_dashboard()
+    return jsonify({"total_users": dashboard["total_users"], "total_movies": dashboard["total_movies"]})
+
+@api_controller.route('/titles/autocomplete', methods=['GET'])
+def autocomplete_titles():
+    """
+        Route suggesting movie titles for ?q=, from the titles users added and the OMDb catalog.
+    """
+    query = request.args.get('q', '')[:MAX_AUTOCOMPLETE_QUERY]
+    limit = request.args.get('limit', 10, type=int)
+    if not 1 <= limit <= MAX_AUTOCOMPLETE_LIMIT:
+        limit = 10
+    titles = movie_service.suggest_titles(query, limit)
+    response = jsonify({"query": query, "titles": titles or []})
+    if titles is not None:
+        # Suggestions change slowly; let the browser reuse them while the user edits the query
+        response.cache_control.max_age = 60
+    return response
+
+@api_controller.route('/export', methods=['GET'])
+def export_movies():
+    """
+        Route streaming every movie (or one user's with ?user_id=) as NDJSON, or CSV with ?format=csv.
+        Rows are read in batches and sent as they arrive, so memory use does not grow with the export.
+    """
+    user_id = request.args.get('user_id', type=int)
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({"error": "format must be 'ndjson' or 'csv'"}), 400
+
+    movies = movie_service.iter_movies(user_id=user_id)
+    if export_format == 'csv':
+        body, mimetype = _csv_chunks(movies), 'text/csv'
+    else:
+        body, mimetype = _ndjson_chunks(movies), 'application/x-ndjson'
+    logging.info(f"Started {export_format} export of movies.")
+
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=movies.{export_format}'
+    return response
+
+def _ndjson_chunks(movies):
+    buffer = io.StringIO()
+    for movie in movies:
+        buffer.write(json.dumps(movie, separators=(',', ':')))
+        buffer.write('\n')
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def _csv_chunks(movies):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    # Send the header straight away
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    for movie in movies:
+        writer.writerow(movie)
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
@@ -0,0 +1,31 @@
+import mimetypes
+
+from flask import Blueprint, current_app, request, send_from_directory
+
+from app.assets import PRECOMPRESSED
+
+assets_controller = Blueprint('assets_controller', __name__, url_prefix='/assets')
+
+# Fingerprinted file names change with their content, so they can be cached for good
+MAX_AGE = 365 * 24 * 3600
+
+
+@assets_controller.route('/<path:filename>', methods=['GET'])
+def asset(filename):
+    """
+        Route serving a file written by `flask build-assets`, precompressed when the client accepts it.
+    """
+    manifest = current_app.extensions['assets']
+    mimetype = mimetypes.guess_type(filename)[0]
+    encoding = next((encoding for encoding, suffix in PRECOMPRESSED
+                     if encoding in request.accept_encodings and manifest.has_file(filename + suffix)), None)
+    if encoding:
+        response = send_from_directory(manifest.dist_folder, filename + dict(PRECOMPRESSED)[encoding],
+                                       mimetype=mimetype, max_age=MAX_AGE)
+        response.content_encoding = encoding
+    else:
+        response = send_from_directory(manifest.dist_folder, filename, mimetype=mimetype, max_age=MAX_AGE)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
@@ -0,0 +1,28 @@
+import logging
+
+from flask import Blueprint, render_template
+
+from app.controller.http_cache import conditional
+from app.services.service_proxy import movie_service
+
+home_controller = Blueprint('home_controller', __name__)
+
+
+# Route: Home Page
+@home_controller.route('/')
+@conditional(lambda: ['*'])
+def home():
+    """
+        Route to display the dashboard with totals and the most recent users.
+    """
+    dashboard = movie_service.get_dashboard()
+
+    logging.info("Rendered the home page successfully.")
+
+    return render_template(
+        "index.html",
+        total_users=dashboard["total_users"],
+        total_movies=dashboard["total_movies"],
+        user_favorites=dashboard["favorites"],
+        users=dashboard["users"],
+    )
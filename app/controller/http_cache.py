@@ -0,0 +1,105 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import current_app, make_response, request
+
+from app.services.service_proxy import movie_service
+
+
+class PageCache:
+    """
+    Bounded LRU of rendered 200 responses keyed by URL and ETag, so repeat viewers skip the render.
+    Each page is stored as (body, headers), headers including the response's Content-Type.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+            return page
+
+    def put(self, key, page):
+        with self._lock:
+            self._pages[key] = page
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_size:
+                self._pages.popitem(last=False)
+
+
+def templates_fingerprint(template_folder):
+    """Hash of the template files, so that ETags change when a deploy changes the markup."""
+    digest = hashlib.sha1()
+    for root, _, files in sorted(os.walk(template_folder)):
+        for name in sorted(files):
+            stat = os.stat(os.path.join(root, name))
+            digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()[:12]
+
+
+def conditional(resources, extra_versions=None):
+    """
+    Decorator for GET views whose output only depends on the given resources' versions.
+
+    `resources(**view_args)` returns the resource names (see MovieService.get_versions).
+    `extra_versions(**view_args)`, if given, returns more {name: (version, updated_at)} for
+    what the view shows that is not versioned in the database. A 200 response carries a strong
+    ETag and Last-Modified built from those versions, and a matching If-None-Match /
+    If-Modified-Since is answered with 304 before the view runs. Other responses (a 404 for a
+    user that may exist later) carry neither, so they are never revalidated into a 304.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            versions = movie_service.get_versions(resources(**kwargs))
+            if versions is None:
+                return view(*args, **kwargs)
+            if extra_versions is not None:
+                versions = {**versions, **extra_versions(**kwargs)}
+
+            salt = current_app.config['ETAG_SALT']
+            etag = hashlib.sha1(
+                f"{salt}|{sorted(versions.items())}".encode()
+            ).hexdigest()[:20]
+            timestamps = [updated_at for _, updated_at in versions.values() if updated_at]
+            last_modified = (
+                datetime.fromtimestamp(int(max(timestamps)), tz=timezone.utc) if timestamps else None
+            )
+
+            if etag in request.if_none_match or (
+                not request.if_none_match
+                and last_modified
+                and request.if_modified_since
+                and last_modified <= request.if_modified_since
+            ):
+                response = make_response('', 304)
+            else:
+                page_cache = current_app.extensions.get('page_cache')
+                key = (request.full_path, etag)
+                page = page_cache.get(key) if page_cache else None
+                if page is None:
+                    response = make_response(view(*args, **kwargs))
+                    if page_cache and response.status_code == 200:
+                        page_cache.put(key, (response.get_data(), list(response.headers)))
+                else:
+                    body, headers = page
+                    response = current_app.response_class(body, status=200, headers=headers)
+
+            if response.status_code in (200, 304):
+                response.set_etag(etag)
+                if last_modified:
+                    response.last_modified = last_modified
+            # Browsers may keep the page but must revalidate it on every visit
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
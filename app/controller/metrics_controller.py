@@ -0,0 +1,35 @@
+from flask import Blueprint, Response, current_app
+
+from app.metrics import metrics
+
+metrics_controller = Blueprint('metrics_controller', __name__)
+
+
+@metrics_controller.route('/metrics', methods=['GET'])
+def show_metrics():
+    """
+        Route exposing the collected metrics in the Prometheus text format.
+    """
+    extra_lines = []
+    cache_stats = current_app.extensions['services'].omdb_cache_stats()
+    if cache_stats:
+        extra_lines = [
+            '# HELP moviweb_omdb_cache_lookups_total OMDb cache lookups, by result.',
+            '# TYPE moviweb_omdb_cache_lookups_total counter',
+            f'moviweb_omdb_cache_lookups_total{{result="hit"}} {cache_stats["hits"]}',
+            f'moviweb_omdb_cache_lookups_total{{result="miss"}} {cache_stats["misses"]}',
+            '# HELP moviweb_omdb_cache_entries OMDb lookups held in memory.',
+            '# TYPE moviweb_omdb_cache_entries gauge',
+            f'moviweb_omdb_cache_entries {cache_stats["size"]}',
+        ]
+    poster_stats = current_app.extensions['services'].poster_cache_stats()
+    if poster_stats:
+        extra_lines += [
+            '# HELP moviweb_poster_cache_bytes Size of the cached poster thumbnails.',
+            '# TYPE moviweb_poster_cache_bytes gauge',
+            f'moviweb_poster_cache_bytes {poster_stats["bytes"]}',
+            '# HELP moviweb_poster_cache_files Poster thumbnails on disk.',
+            '# TYPE moviweb_poster_cache_files gauge',
+            f'moviweb_poster_cache_files {poster_stats["files"]}',
+        ]
+    return Response(metrics.render(extra_lines), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,31 @@
+import os
+
+from flask import Blueprint, request, send_file
+
+from app.services.service_proxy import poster_cache
+
+poster_controller = Blueprint('poster_controller', __name__, url_prefix='/posters')
+
+# A thumbnail URL carrying its file name (?v=) always serves the same bytes
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Without it the film's thumbnail may still change, e.g. after a catalog refresh
+DEFAULT_MAX_AGE = 24 * 3600
+
+
+@poster_controller.route('/<imdb_id>', methods=['GET'])
+def poster(imdb_id):
+    """
+        Route serving the cached poster thumbnail of a catalog entry.
+        A thumbnail that is not cached yet is generated, waiting at most POSTER_WAIT_SECONDS.
+    """
+    file_name = poster_cache.get(imdb_id, timeout=float(os.getenv('POSTER_WAIT_SECONDS', 5)))
+    if file_name is None:
+        return '', 404
+
+    immutable = request.args.get('v') == file_name
+    response = send_file(poster_cache.path(file_name), mimetype=poster_cache.mimetype(file_name),
+                         etag=file_name.split('.')[0], conditional=True,
+                         max_age=IMMUTABLE_MAX_AGE if immutable else DEFAULT_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = immutable
+    return response
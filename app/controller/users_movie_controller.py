@@ -1,48 +1,68 @@
 import logging
-import os
 from xml.dom import NotFoundErr
 
-from flask import Blueprint, render_template, request, redirect, jsonify, url_for
-from app.services.movie_service import MovieService
+from flask import Blueprint, current_app, render_template, request, redirect, jsonify, url_for
+from app.controller.http_cache import conditional
+from app.services.movie_service import DEFAULT_PAGE_SIZE
+from app.services.service_proxy import movie_service, poster_cache
 from werkzeug.exceptions import BadRequest
-from dotenv import load_dotenv
 from app.validation.movie_validator import MovieValidator
+from app.validation.pagination_validator import PaginationValidator
 from app.validation.user_validator import UserValidator
 
-load_dotenv()
 users_movie_controller = Blueprint('users_movie_controller', __name__, url_prefix='/users')
 
-# Initialize the movie service with the SQLite database file
-DB_NAME = os.getenv('DB_NAME', 'moviwebapp.db')
-if not DB_NAME:
-    raise Exception("Movie DB Key not found in environment variables.")
-movie_service = MovieService(DB_NAME)
-
 
 @users_movie_controller.route('/', methods=['GET'])
+@conditional(lambda: ['*'])
 def list_users():
     """
-        Route to display the list of all users.
+        Route to display the list of users, one keyset page at a time.
     """
-    users = movie_service.get_all_users()
+    after_id, before_id, limit = PaginationValidator.validate_page(DEFAULT_PAGE_SIZE)
+    page = movie_service.get_users_page(after_id=after_id, before_id=before_id, limit=limit)
     logging.info("Rendered the users list page.")
-    return render_template('users.html', users=users)
+    return render_template('users.html', users=page["items"], page=page)
+
+# Route: Search Movies
+@users_movie_controller.route('/search', methods=['GET'])
+def search_movies():
+    """
+        Route to search movie titles across all users, or within one user's list with ?user_id=.
+    """
+    query = request.args.get('q', '').strip()
+    user_id = request.args.get('user_id', type=int)
+    user = movie_service.get_user(user_id) if user_id is not None else None
+    results = movie_service.search_movies(query, user_id=user_id) if query else []
+    logging.info(f"Searched movies for '{query}'.")
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify(results)
+    return render_template('search.html', query=query, user=user, results=results)
 
 @users_movie_controller.route('/<int:user_id>', methods=['GET'])
+@conditional(lambda user_id: [f'user:{user_id}'],
+             lambda user_id: {'recommendations': movie_service.get_recommendations_version()})
 def user_movies(user_id):
     """
-    Route to display the movies of a specific user by user ID.
+    Route to display the movies of a specific user by user ID, one keyset page at a time.
     """
-    if not movie_service.get_user(user_id):
+    user = movie_service.get_user_with_movie_count(user_id)
+    if not user:
         raise NotFoundErr(f"User not found with ID:{user_id}")
-    movies = movie_service.get_user_movies(user_id)
-    user = next((u for u in movie_service.get_all_users() if u["id"] == user_id), None)
+    after_id, before_id, limit = PaginationValidator.validate_page(DEFAULT_PAGE_SIZE)
+    page = movie_service.get_user_movies_page(user_id, after_id=after_id, before_id=before_id, limit=limit)
+    movies = page["items"]
+    # Thumbnails are downloaded in the background; the page does not wait for them
+    poster_cache.prefetch(movies)
+    # Precomputed neighbours of the movies on this page
+    recommendations = movie_service.recommend_movies(user_id, movies)
 
     message = request.args.get('message', '')
     status = request.args.get('status', '')
 
     logging.info(f"Rendered movies for user ID {user_id}.")
-    return render_template("user_movies.html", movies=movies, user=user, message=message, status=status)
+    return render_template("user_movies.html", movies=movies, page=page, user=user, message=message, status=status,
+                           recommendations=recommendations)
 
 # Route: Add User
 @users_movie_controller.route('/add', methods=['GET', 'POST'])
@@ -73,6 +93,17 @@ def add_movie(user_id):
     if request.method == 'POST':
         try:
             name = MovieValidator.validate_add_movie()
+            if current_app.config['ASYNC_MOVIE_RESOLUTION']:
+                movie_id = movie_service.add_movie_async(name, user_id)
+                logging.info(f"Queued movie '{name}' for user ID {user_id}.")
+                if request.accept_mimetypes.best == 'application/json':
+                    return jsonify({
+                        "id": movie_id,
+                        "status": "pending",
+                        "status_url": url_for('users_movie_controller.movie_status',
+                                              user_id=user_id, movie_id=movie_id),
+                    }), 202
+                return redirect(f'/users/{user_id}?message=Movie "{name}" is being added.&status=success')
             movie_service.add_movie(name, user_id)
             logging.info(f"Added movie '{name}' for user ID {user_id}.")
             return redirect(f'/users/{user_id}?message=Movie "{name}" added successfully!&status=success')
@@ -81,18 +112,48 @@ def add_movie(user_id):
             return redirect(f'/users/{user_id}?message={str(e)}&status=error')
     return render_template('add_movie.html', user_id=user_id)
 
+# Route: Movie Status
+@users_movie_controller.route('/<int:user_id>/movies/<int:movie_id>/status', methods=['GET'])
+def movie_status(user_id, movie_id):
+    """
+       Route returning a movie's resolution status as JSON, for polling pending movies.
+    """
+    movie = movie_service.get_user_movie(user_id, movie_id)
+    if not movie:
+        return jsonify({"error": "Movie not found"}), 404
+    return jsonify(movie)
+
+# Route: Import Movies
+@users_movie_controller.route('/<int:user_id>/import', methods=['GET', 'POST'])
+def import_movies(user_id):
+    """
+       Route to import a CSV or JSON list of movie titles for a user.
+    """
+    user = movie_service.get_user(user_id)
+    if not user:
+        raise NotFoundErr(f"User not found with ID:{user_id}")
+    if request.method == 'POST':
+        try:
+            titles = MovieValidator.validate_import_movies()
+        except BadRequest as e:
+            logging.error(f"Error importing movies for user ID {user_id}: {str(e)}")
+            return render_template('import_movies.html', user=user, error_message=e.description)
+        report = movie_service.import_movies(titles, user_id)
+        logging.info(f"Imported {report['imported']}/{len(titles)} movies for user ID {user_id} "
+                     f"({report['titles_per_second']} titles/s).")
+        if request.accept_mimetypes.best == 'application/json':
+            return jsonify(report)
+        return render_template('import_movies.html', user=user, report=report)
+    return render_template('import_movies.html', user=user)
+
 @users_movie_controller.route('/<int:user_id>/update/<int:movie_id>', methods=['GET', 'POST'])
 def update_movie(user_id, movie_id):
     """
        Route to update an existing movie for a user.
     """
-    if not movie_service.get_user(user_id) or not movie_service.get_movie(movie_id):
-        raise NotFoundErr(f"User or movie not found with userId:{user_id}, movieid: {movie_id}")
-    movies = movie_service.get_user_movies(user_id)
-    movie = next((m for m in movies if m['id'] == movie_id), None)
-
+    movie = movie_service.get_user_movie(user_id, movie_id)
     if not movie:
-        raise NotFoundErr(f"Error updating movie for user ID {user_id}, movie ID {movie_id}")
+        raise NotFoundErr(f"User or movie not found with userId:{user_id}, movieid: {movie_id}")
 
     if request.method == 'POST':
         try:
@@ -119,7 +180,7 @@ def delete_movie(user_id, movie_id):
     """
         Route to delete a movie for a specific user.
     """
-    if not movie_service.get_user(user_id) or not movie_service.get_movie(movie_id):
+    if not movie_service.get_user_movie(user_id, movie_id):
         raise NotFoundErr(f"User or movie not found with userId:{user_id}, movieid: {movie_id}")
     try:
         movie_service.delete_movie(movie_id)
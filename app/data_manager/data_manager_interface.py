@@ -1,5 +1,5 @@
 from abc import abstractmethod, ABC
-from typing import List, Dict
+from typing import List, Dict, Iterable, Iterator, Optional, Set, Tuple
 
 class DataManagerInterface(ABC):
 
@@ -8,11 +8,29 @@ class DataManagerInterface(ABC):
         pass
 
     @abstractmethod
-    def add_movie(self, name: str, year: int, rating: float, user_id: int) -> bool:
+    def add_movie(self, name: str, year: int, rating: float, user_id: int, imdb_id: Optional[str] = None) -> bool:
         pass
 
     @abstractmethod
-    def update_movie(self, movie_id: int, name: str = None, year: int = None, rating: float = None) -> bool:
+    def add_pending_movie(self, name: str, user_id: int) -> Optional[int]:
+        pass
+
+    @abstractmethod
+    def resolve_movie(self, movie_id: int, name: str = None, year: int = None, rating: float = None,
+                      imdb_id: Optional[str] = None) -> bool:
+        pass
+
+    @abstractmethod
+    def get_pending_movies(self) -> List[Dict[str, str]]:
+        pass
+
+    @abstractmethod
+    def add_movies(self, movies: List[Dict], user_id: int) -> bool:
+        pass
+
+    @abstractmethod
+    def update_movie(self, movie_id: int, name: str = None, year: int = None, rating: float = None,
+                     imdb_id: Optional[str] = None) -> bool:
         pass
 
     @abstractmethod
@@ -20,21 +38,87 @@ class DataManagerInterface(ABC):
         pass
 
     @abstractmethod
-    def get_all_users(self) -> List[Dict[str, str]]:
+    def get_all_users(self, after_id: Optional[int] = None, before_id: Optional[int] = None,
+                      limit: Optional[int] = None) -> List[Dict[str, str]]:
+        pass
+
+    @abstractmethod
+    def get_user_movies(self, user_id: int, after_id: Optional[int] = None, before_id: Optional[int] = None,
+                        limit: Optional[int] = None) -> List[Dict[str, str]]:
         pass
 
     @abstractmethod
-    def get_user_movies(self, user_id: int) -> List[Dict[str, str]]:
+    def search_movies(self, query: str, user_id: Optional[int] = None, limit: int = 20) -> List[Dict[str, str]]:
         pass
 
     @abstractmethod
-    def get_user_favorites(self) -> List[Dict[str, str]]:
+    def iter_movies(self, user_id: Optional[int] = None, batch_size: int = 1000) -> Iterator[Dict]:
+        pass
+
+    @abstractmethod
+    def get_user_favorites(self, user_ids: Optional[Iterable[int]] = None) -> List[Dict[str, str]]:
         pass
 
     @abstractmethod
     def get_user(self, user_id: int) -> Dict[str, str]:
         pass
 
+    @abstractmethod
+    def get_user_with_movie_count(self, user_id: int) -> Dict[str, str]:
+        pass
+
     @abstractmethod
     def get_movie(self, movie_id: int) -> Dict[str, str]:
         pass
+
+    @abstractmethod
+    def get_user_movie(self, user_id: int, movie_id: int) -> Dict[str, str]:
+        pass
+
+    @abstractmethod
+    def get_dashboard(self, limit: int) -> Dict:
+        pass
+
+    @abstractmethod
+    def get_versions(self, resources: Iterable[str]) -> Dict[str, tuple]:
+        pass
+
+    @abstractmethod
+    def rebuild_user_stats(self) -> Optional[int]:
+        pass
+
+    @abstractmethod
+    def get_catalog_entry(self, title: str, fetched_after: float = 0) -> Optional[Dict]:
+        pass
+
+    @abstractmethod
+    def save_catalog_entry(self, movie_data: Dict) -> bool:
+        pass
+
+    @abstractmethod
+    def get_unlinked_titles(self, after_name: Optional[str] = None, limit: int = 100) -> List[str]:
+        pass
+
+    @abstractmethod
+    def link_movies(self, name: str, imdb_id: str) -> int:
+        pass
+
+    @abstractmethod
+    def get_poster(self, imdb_id: str) -> Optional[Dict]:
+        pass
+
+    @abstractmethod
+    def set_poster_thumbnail(self, imdb_id: str, file_name: str) -> bool:
+        pass
+
+    @abstractmethod
+    def iter_titles(self, batch_size: int = 10000) -> Iterator[Tuple[str, int]]:
+        pass
+
+    @abstractmethod
+    def get_rater_ratings(self, titles: List[str], max_users: int = 5000) -> List[Tuple[int, str, float]]:
+        pass
+
+    @abstractmethod
+    def get_user_titles(self, user_id: int, titles: List[str]) -> Set[str]:
+        pass
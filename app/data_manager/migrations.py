@@ -0,0 +1,274 @@
+import json
+import logging
+import time
+
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.exc import IntegrityError
+
+from app.model.data_model import normalize_title
+
+# Bookkeeping table recording which migrations have been applied
+metadata = MetaData()
+schema_migrations = Table(
+    'schema_migrations', metadata,
+    Column('version', Integer, primary_key=True),
+    Column('name', String, nullable=False),
+    Column('applied_at', Float, nullable=False),
+)
+
+
+class Migration:
+    """One versioned schema change; `upgrade` receives a connection inside a transaction."""
+
+    def __init__(self, version, name, upgrade):
+        self.version = version
+        self.name = name
+        self.upgrade = upgrade
+
+
+def execute_sql(*statements):
+    """Build an upgrade step that runs the given SQL statements in order."""
+    def upgrade(connection):
+        for statement in statements:
+            connection.execute(text(statement))
+    return upgrade
+
+
+def add_column(table, column, ddl):
+    """Build an upgrade step that adds a column unless the table already has it."""
+    def upgrade(connection):
+        columns = {c['name'] for c in inspect(connection).get_columns(table)}
+        if column not in columns:
+            connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+    return upgrade
+
+
+def steps(*upgrades):
+    """Build an upgrade step that runs several steps in order."""
+    def upgrade(connection):
+        for step in upgrades:
+            step(connection)
+    return upgrade
+
+
+def sqlite_only(upgrade):
+    """Run an upgrade step only on SQLite databases."""
+    def guarded(connection):
+        if connection.dialect.name == 'sqlite':
+            upgrade(connection)
+    return guarded
+
+
+def postgresql_only(upgrade):
+    """Run an upgrade step only on PostgreSQL databases."""
+    def guarded(connection):
+        if connection.dialect.name == 'postgresql':
+            upgrade(connection)
+    return guarded
+
+
+def seed_catalog(connection):
+    """Copy the OMDb lookups cached with an IMDb id into the catalog, then link the movies with those titles."""
+    rows = connection.execute(text("SELECT payload, fetched_at FROM omdb_cache WHERE found = :found"),
+                              {"found": True})
+    entries = {}
+    for payload, fetched_at in rows:
+        movie = json.loads(payload)
+        if movie.get('imdb_id'):
+            entries[movie['imdb_id']] = {
+                "imdb_id": movie['imdb_id'], "title": movie['title'],
+                "title_key": normalize_title(movie['title']), "year": movie['year'],
+                "rating": movie['rating'], "poster": movie.get('poster'), "fetched_at": fetched_at,
+            }
+    existing = set(connection.execute(text("SELECT imdb_id FROM catalog")).scalars())
+    new_entries = [entry for imdb_id, entry in entries.items() if imdb_id not in existing]
+    if new_entries:
+        connection.execute(text(
+            "INSERT INTO catalog (imdb_id, title, title_key, year, rating, poster, fetched_at) "
+            "VALUES (:imdb_id, :title, :title_key, :year, :rating, :poster, :fetched_at)"
+        ), new_entries)
+    # Matched in Python: SQL lower() folds ASCII only on SQLite, and never the spacing
+    imdb_ids = {}
+    for title_key, imdb_id in connection.execute(text("SELECT title_key, imdb_id FROM catalog ORDER BY imdb_id")):
+        imdb_ids.setdefault(title_key, imdb_id)
+    names = connection.execute(text(
+        "SELECT DISTINCT name FROM movies WHERE imdb_id IS NULL AND status = 'resolved'"
+    )).scalars()
+    links = [{"name": name, "imdb_id": imdb_ids[normalize_title(name)]}
+             for name in names if normalize_title(name) in imdb_ids]
+    if links:
+        connection.execute(text(
+            "UPDATE movies SET imdb_id = :imdb_id WHERE name = :name AND imdb_id IS NULL AND status = 'resolved'"
+        ), links)
+
+
+# Clears the name, year and rating of linked movies where they only repeat their catalog entry's
+DROP_CATALOG_COPIES = (
+    "UPDATE movies SET "
+    "name = NULLIF(name, (SELECT title FROM catalog WHERE catalog.imdb_id = movies.imdb_id)), "
+    "year = NULLIF(year, (SELECT year FROM catalog WHERE catalog.imdb_id = movies.imdb_id)), "
+    "rating = NULLIF(rating, (SELECT rating FROM catalog WHERE catalog.imdb_id = movies.imdb_id)) "
+    "WHERE imdb_id IS NOT NULL"
+)
+
+
+def make_movie_details_nullable(connection):
+    """Drop the NOT NULL constraints of movies.name, year and rating, which linked movies leave to the catalog."""
+    if connection.dialect.name == 'postgresql':
+        for column in ('name', 'year', 'rating'):
+            connection.execute(text(f"ALTER TABLE movies ALTER COLUMN {column} DROP NOT NULL"))
+        return
+    not_null = {row[1]: row[3] for row in connection.execute(text("PRAGMA table_info(movies)"))}
+    if not not_null['name']:
+        # Created from the current model
+        return
+    # SQLite cannot alter a column: copy the rows into a new table. Indexes and triggers go with the old one.
+    connection.execute(text(
+        "CREATE TABLE movies_new (id INTEGER NOT NULL, name VARCHAR, year INTEGER, rating FLOAT, "
+        "user_id INTEGER, imdb_id VARCHAR, status VARCHAR DEFAULT 'resolved' NOT NULL, PRIMARY KEY (id), "
+        "FOREIGN KEY(user_id) REFERENCES users (id), FOREIGN KEY(imdb_id) REFERENCES catalog (imdb_id))"
+    ))
+    connection.execute(text(
+        "INSERT INTO movies_new (id, name, year, rating, user_id, imdb_id, status) "
+        "SELECT id, name, year, rating, user_id, imdb_id, status FROM movies"
+    ))
+    connection.execute(text("DROP TABLE movies"))
+    connection.execute(text("ALTER TABLE movies_new RENAME TO movies"))
+    connection.execute(text("CREATE INDEX ix_movies_user_id_id ON movies (user_id, id DESC)"))
+    connection.execute(text("CREATE INDEX ix_movies_name_lower ON movies (lower(name))"))
+
+
+# Every statement must be safe to run against a database created by
+# Base.metadata.create_all, which already has the current model's schema.
+MIGRATIONS = [
+    Migration(1, 'index movies by user, newest first', execute_sql(
+        'CREATE INDEX IF NOT EXISTS ix_movies_user_id_id ON movies (user_id, id DESC)',
+    )),
+    Migration(2, 'index movies by user and rating', execute_sql(
+        'CREATE INDEX IF NOT EXISTS ix_movies_user_id_rating ON movies (user_id, rating DESC)',
+    )),
+    Migration(3, 'case-insensitive index on movie names', execute_sql(
+        'CREATE INDEX IF NOT EXISTS ix_movies_name_lower ON movies (lower(name))',
+    )),
+    Migration(4, 'movie resolution status', add_column(
+        'movies', 'status', "VARCHAR NOT NULL DEFAULT 'resolved'",
+    )),
+    # Full-text index over movie names, kept in sync with the movies table by triggers
+    Migration(5, 'full-text search on movie names', sqlite_only(execute_sql(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS movies_fts USING fts5("
+        "name, content='movies', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        "CREATE TRIGGER IF NOT EXISTS movies_fts_insert AFTER INSERT ON movies BEGIN "
+        "INSERT INTO movies_fts(rowid, name) VALUES (new.id, new.name); END",
+        "CREATE TRIGGER IF NOT EXISTS movies_fts_delete AFTER DELETE ON movies BEGIN "
+        "INSERT INTO movies_fts(movies_fts, rowid, name) VALUES ('delete', old.id, old.name); END",
+        "CREATE TRIGGER IF NOT EXISTS movies_fts_update AFTER UPDATE OF name ON movies BEGIN "
+        "INSERT INTO movies_fts(movies_fts, rowid, name) VALUES ('delete', old.id, old.name); "
+        "INSERT INTO movies_fts(rowid, name) VALUES (new.id, new.name); END",
+        "INSERT INTO movies_fts(movies_fts) VALUES ('rebuild')",
+    ))),
+    Migration(6, 'user movie counters', steps(
+        add_column('users', 'movies_count', 'INTEGER NOT NULL DEFAULT 0'),
+        add_column('users', 'avg_rating', 'FLOAT'),
+        add_column('users', 'top_rating', 'FLOAT'),
+        execute_sql(
+            "UPDATE users SET "
+            "movies_count = (SELECT count(*) FROM movies WHERE movies.user_id = users.id), "
+            "avg_rating = (SELECT avg(rating) FROM movies "
+            "WHERE movies.user_id = users.id AND movies.status = 'resolved'), "
+            "top_rating = (SELECT max(rating) FROM movies "
+            "WHERE movies.user_id = users.id AND movies.status = 'resolved')",
+        ),
+    )),
+    # PostgreSQL's counterpart of migration 5, used by PostgresDataManager.search_movies
+    Migration(7, 'full-text index on movie names', postgresql_only(execute_sql(
+        "CREATE INDEX IF NOT EXISTS ix_movies_name_tsv ON movies USING gin (to_tsvector('simple', name))",
+    ))),
+    # Movies whose titles are not in the catalog yet are linked by `flask link-catalog`
+    Migration(8, 'shared movie catalog', steps(
+        execute_sql(
+            "CREATE TABLE IF NOT EXISTS catalog ("
+            "imdb_id VARCHAR NOT NULL PRIMARY KEY, title VARCHAR NOT NULL, title_key VARCHAR NOT NULL, "
+            "year INTEGER NOT NULL, rating FLOAT NOT NULL, poster VARCHAR, fetched_at FLOAT NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS ix_catalog_title_key ON catalog (title_key)",
+        ),
+        add_column('movies', 'imdb_id', 'VARCHAR REFERENCES catalog (imdb_id)'),
+        seed_catalog,
+    )),
+    Migration(9, 'cached poster thumbnails', add_column(
+        'catalog', 'poster_thumbnail', 'VARCHAR',
+    )),
+    # Linked movies keep only the user's overrides; reads fall back to the catalog entry.
+    # SQLite files only shrink on the next VACUUM.
+    Migration(10, 'movie details from the catalog', steps(
+        make_movie_details_nullable,
+        execute_sql(
+            # Favorites now rank by the catalog's rating as well, which this index cannot order
+            "DROP INDEX IF EXISTS ix_movies_user_id_rating",
+            "CREATE INDEX IF NOT EXISTS ix_movies_imdb_id ON movies (imdb_id)",
+        ),
+        # The full-text index covers each movie's own name, or else its catalog title
+        sqlite_only(execute_sql(
+            "DROP TRIGGER IF EXISTS movies_fts_insert",
+            "DROP TRIGGER IF EXISTS movies_fts_delete",
+            "DROP TRIGGER IF EXISTS movies_fts_update",
+            "DROP TABLE IF EXISTS movies_fts",
+            DROP_CATALOG_COPIES,
+            "CREATE VIEW IF NOT EXISTS movie_titles AS "
+            "SELECT movies.id, coalesce(movies.name, catalog.title) AS name "
+            "FROM movies LEFT JOIN catalog ON catalog.imdb_id = movies.imdb_id",
+            "CREATE VIRTUAL TABLE movies_fts USING fts5("
+            "name, content='movie_titles', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+            "CREATE TRIGGER movies_fts_insert AFTER INSERT ON movies BEGIN "
+            "INSERT INTO movies_fts(rowid, name) VALUES (new.id, "
+            "coalesce(new.name, (SELECT title FROM catalog WHERE imdb_id = new.imdb_id))); END",
+            "CREATE TRIGGER movies_fts_delete AFTER DELETE ON movies BEGIN "
+            "INSERT INTO movies_fts(movies_fts, rowid, name) VALUES ('delete', old.id, "
+            "coalesce(old.name, (SELECT title FROM catalog WHERE imdb_id = old.imdb_id))); END",
+            "CREATE TRIGGER movies_fts_update AFTER UPDATE OF name, imdb_id ON movies BEGIN "
+            "INSERT INTO movies_fts(movies_fts, rowid, name) VALUES ('delete', old.id, "
+            "coalesce(old.name, (SELECT title FROM catalog WHERE imdb_id = old.imdb_id))); "
+            "INSERT INTO movies_fts(rowid, name) VALUES (new.id, "
+            "coalesce(new.name, (SELECT title FROM catalog WHERE imdb_id = new.imdb_id))); END",
+            "CREATE TRIGGER catalog_fts_update AFTER UPDATE OF title ON catalog "
+            "WHEN old.title IS NOT new.title BEGIN "
+            "INSERT INTO movies_fts(movies_fts, rowid, name) "
+            "SELECT 'delete', id, old.title FROM movies WHERE imdb_id = old.imdb_id AND name IS NULL; "
+            "INSERT INTO movies_fts(rowid, name) "
+            "SELECT id, new.title FROM movies WHERE imdb_id = new.imdb_id AND name IS NULL; END",
+            "INSERT INTO movies_fts(movies_fts) VALUES ('rebuild')",
+        )),
+        postgresql_only(execute_sql(
+            DROP_CATALOG_COPIES,
+            # Counterpart of ix_movies_name_tsv for the titles linked movies take from the catalog
+            "CREATE INDEX IF NOT EXISTS ix_catalog_title_tsv ON catalog USING gin (to_tsvector('simple', title))",
+        )),
+    )),
+]
+
+
+def run_migrations(engine, migrations=MIGRATIONS):
+    """
+    Apply every migration that has not been recorded in schema_migrations yet.
+    Each migration runs in its own transaction together with its bookkeeping row,
+    so a failure leaves the database at the last fully applied version.
+    """
+    metadata.create_all(engine)
+    with engine.connect() as connection:
+        applied = set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+    for migration in sorted(migrations, key=lambda m: m.version):
+        if migration.version in applied:
+            continue
+        try:
+            with engine.begin() as connection:
+                migration.upgrade(connection)
+                connection.execute(schema_migrations.insert().values(
+                    version=migration.version, name=migration.name, applied_at=time.time()
+                ))
+        except IntegrityError:
+            # Another process applied the same migration concurrently
+            logging.info(f"Migration {migration.version} was applied by another process.")
+            continue
+        logging.info(f"Applied migration {migration.version}: {migration.name}.")
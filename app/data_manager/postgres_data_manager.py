@@ -0,0 +1,47 @@
+import os
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+from app.data_manager.sql_data_manager import SQLDataManager
+
+
+def _create_postgres_engine(database_url, **options):
+    # Connect through a pool of persistent connections, sized for a multi-threaded server
+    return create_engine(
+        database_url,
+        poolclass=QueuePool,
+        pool_size=int(os.getenv('DB_POOL_SIZE', 10)),
+        # Extra connections opened under bursts, closed again once returned
+        max_overflow=int(os.getenv('DB_MAX_OVERFLOW', 20)),
+        pool_timeout=float(os.getenv('DB_POOL_TIMEOUT', 30)),
+        # Replace connections before server or proxy idle timeouts cut them
+        pool_recycle=int(os.getenv('DB_POOL_RECYCLE', 1800)),
+        # Test each connection on checkout, so a restarted server costs no failed request
+        pool_pre_ping=True,
+        **options,
+    )
+
+
+class PostgresDataManager(SQLDataManager):
+    def __init__(self, database_url, read_url=None):
+        # Writes go to database_url; reads go to read_url (e.g. a streaming replica) when given
+        engine = _create_postgres_engine(database_url)
+        read_engine = None
+        if read_url:
+            # The server rejects any write attempted through the read pool
+            read_engine = _create_postgres_engine(
+                read_url, connect_args={'options': '-c default_transaction_read_only=on'})
+        super().__init__(engine, read_engine)
+
+    def _match_words(self, words, within_user=False):
+        # Prefix tsquery over 'simple' tsvectors, ranked by ts_rank: movies' own names are served by
+        # ix_movies_name_tsv, the catalog titles of the others by ix_catalog_title_tsv
+        query = "to_tsquery('simple', :match)"
+        match = ' & '.join(f'{word.lower()}:*' for word in words)
+        matches = (
+            f"movies.id IN (SELECT id FROM movies WHERE to_tsvector('simple', name) @@ {query} "
+            "UNION ALL SELECT movies.id FROM catalog JOIN movies ON movies.imdb_id = catalog.imdb_id "
+            f"AND movies.name IS NULL WHERE to_tsvector('simple', catalog.title) @@ {query})"
+        )
+        document = "to_tsvector('simple', coalesce(movies.name, catalog.title))"
+        return "movies", matches, f"ts_rank({document}, {query}) DESC, movies.id DESC", {"match": match}
@@ -0,0 +1,798 @@
+import logging
+import re
+import time
+
+from flask import g, has_app_context, has_request_context
+from sqlalchemy import and_, insert, select, func, text, update, or_
+from sqlalchemy.orm import scoped_session, sessionmaker
+from app.data_manager.data_manager_interface import DataManagerInterface  # Interface for data manager
+from app.data_manager.migrations import run_migrations
+from app.model.data_model import (Base, User, Movie, CatalogEntry, ResourceVersion, MOVIE_PENDING, MOVIE_RESOLVED,
+                                  MOVIE_FAILED, normalize_title)
+
+def _catalog_value(column, imdb_id):
+    # The value of a catalog column for imdb_id, as a scalar subquery
+    return select(column).where(CatalogEntry.imdb_id == imdb_id).scalar_subquery()
+
+
+def _override(column, value, imdb_id):
+    # What to store for a movie's name, year or rating: NULL where it only repeats its catalog entry's value
+    if value is None or imdb_id is None:
+        return value
+    return func.nullif(value, _catalog_value(column, imdb_id))
+
+
+# A movie's name, year and rating: the user's own where set, otherwise its catalog entry's.
+# Queries selecting them outer join CatalogEntry on imdb_id.
+movie_name = func.coalesce(Movie.name, CatalogEntry.title)
+movie_year = func.coalesce(Movie.year, CatalogEntry.year)
+movie_rating = func.coalesce(Movie.rating, CatalogEntry.rating)
+with_catalog = (CatalogEntry, CatalogEntry.imdb_id == Movie.imdb_id)
+
+
+def read_from_primary():
+    """
+    Send the rest of this request's reads to the primary engine, so that it sees its own writes.
+    Called after every commit: a read replica may not have the write yet.
+    """
+    if has_app_context():
+        g._read_from_primary = True
+
+
+class SQLDataManager(DataManagerInterface):
+    """
+    Query code shared by every SQLAlchemy backend. Subclasses build and tune the engine;
+    the schema, migrations, sessions and queries are the same for all of them.
+    """
+
+    def __init__(self, engine, read_engine=None):
+        self.engine = engine
+        Base.metadata.create_all(self.engine)
+        run_migrations(self.engine)
+        # Independent short-lived sessions, for work outside the request's unit of work
+        self.session_factory = sessionmaker(bind=self.engine, expire_on_commit=False)
+        # One session per thread; inside a Flask request it is the request's unit of work
+        self.Session = scoped_session(self.session_factory)
+        # Read-only methods go to read_engine (a read-only pool or a replica) when there is one
+        self.read_engine = read_engine or engine
+        self.read_session_factory = self.session_factory
+        self.ReadSession = self.Session
+        if read_engine is not None:
+            self.read_session_factory = sessionmaker(bind=read_engine, expire_on_commit=False)
+            self.ReadSession = scoped_session(self.read_session_factory)
+
+    def remove_session(self, exception=None):
+        # Roll back anything uncommitted and return the connections to their pools
+        self.Session.remove()
+        self.ReadSession.remove()
+
+    def _close_session(self):
+        # Inside a request the sessions are shared until teardown, elsewhere they end with the call
+        if not has_request_context():
+            self.Session.remove()
+            self.ReadSession.remove()
+
+    @staticmethod
+    def _reads_from_primary():
+        return has_app_context() and g.get('_read_from_primary', False)
+
+    def _read_session(self):
+        # Session for read-only methods: the read engine, unless this request must see its own writes
+        if self._reads_from_primary():
+            return self.Session()
+        return self.ReadSession()
+
+    def get_versions(self, resources):
+        # Retrieve {resource: (version, updated_at)} for the given resource names, (0, None) if never changed
+        session = self._read_session()
+        try:
+            rows = session.query(ResourceVersion).filter(ResourceVersion.resource.in_(list(resources))).all()
+            versions = {resource: (0, None) for resource in resources}
+            versions.update({row.resource: (row.version, row.updated_at) for row in rows})
+            return versions
+        except Exception as e:
+            logging.error(f"Error retrieving resource versions: {e}")
+            return None
+        finally:
+            self._close_session()
+
+    @staticmethod
+    def _touch(session, user_id=None):
+        # Bump the version of '*' and of the user's resource, in the caller's transaction
+        now = time.time()
+        resources = ['*'] if user_id is None else ['*', f'user:{user_id}']
+        # One statement for both rows
+        values = ', '.join(f"(:resource{i}, 1, :now)" for i in range(len(resources)))
+        session.execute(text(
+            f"INSERT INTO resource_versions (resource, version, updated_at) VALUES {values} "
+            "ON CONFLICT (resource) DO UPDATE SET version = resource_versions.version + 1, updated_at = :now"
+        ), {"now": now, **{f"resource{i}": resource for i, resource in enumerate(resources)}})
+
+    @staticmethod
+    def _touch_owners(session, imdb_id):
+        # Bump the version of '*' and of every user with a movie linked to the catalog entry, in one statement
+        session.execute(text(
+            "INSERT INTO resource_versions (resource, version, updated_at) "
+            "SELECT DISTINCT 'user:' || user_id, 1, :now FROM movies WHERE imdb_id = :imdb_id "
+            "UNION ALL SELECT '*', 1, :now WHERE EXISTS (SELECT 1 FROM movies WHERE imdb_id = :imdb_id) "
+            "ON CONFLICT (resource) DO UPDATE SET version = resource_versions.version + 1, updated_at = :now"
+        ), {"now": time.time(), "imdb_id": imdb_id})
+
+    @staticmethod
+    def _user_stats_values(user_id):
+        # Column values recomputing a user's counters from the movies table; user_id may be a column
+        resolved = (Movie.user_id == user_id, Movie.status == MOVIE_RESOLVED)
+        return {
+            "movies_count": select(func.count(Movie.id)).where(Movie.user_id == user_id).scalar_subquery(),
+            "avg_rating": select(func.avg(movie_rating)).select_from(Movie).outerjoin(*with_catalog)
+            .where(*resolved).scalar_subquery(),
+            "top_rating": select(func.max(movie_rating)).select_from(Movie).outerjoin(*with_catalog)
+            .where(*resolved).scalar_subquery(),
+        }
+
+    @staticmethod
+    def _drop_catalog_copies(session, *conditions):
+        # Clear the name, year and rating of the matching linked movies where they repeat their catalog entry's
+        session.execute(
+            update(Movie).where(
+                Movie.imdb_id.isnot(None), or_(Movie.name.isnot(None), Movie.year.isnot(None),
+                                               Movie.rating.isnot(None)), *conditions
+            ).values(
+                name=_override(CatalogEntry.title, Movie.name, Movie.imdb_id),
+                year=_override(CatalogEntry.year, Movie.year, Movie.imdb_id),
+                rating=_override(CatalogEntry.rating, Movie.rating, Movie.imdb_id),
+            ),
+            execution_options={"synchronize_session": False},
+        )
+
+    def _refresh_user_stats(self, session, user_id):
+        # Recompute one user's counters in the caller's transaction, from ix_movies_user_id_* range scans
+        session.execute(
+            update(User).where(User.id == user_id).values(self._user_stats_values(user_id)),
+            execution_options={"synchronize_session": False},
+        )
+
+    def rebuild_user_stats(self):
+        # Recompute every user's counters and return how many had drifted
+        session = self.Session()
+        try:
+            values = self._user_stats_values(User.id)
+            drifted = [getattr(User, column).is_distinct_from(value) for column, value in values.items()]
+            repaired = session.execute(
+                update(User).where(or_(*drifted)).values(values),
+                execution_options={"synchronize_session": False},
+            ).rowcount
+            if repaired:
+                self._touch(session)
+            session.commit()
+            if repaired:
+                read_from_primary()
+            return repaired
+        except Exception as e:
+            session.rollback()
+            logging.error(f"Error rebuilding user stats: {e}")
+            return None
+        finally:
+            self._close_session()
+
+    def get_catalog_entry(self, title, fetched_after=0):
+        # Retrieve the catalog entry for a title, ignoring case and spacing, in the shape of an OMDb lookup.
+        # Entries fetched before fetched_after count as missing.
+        session = self._read_session()
+        try:
+            entry = session.query(CatalogEntry).filter(
+                CatalogEntry.title_key == normalize_title(title), CatalogEntry.fetched_at >= fetched_after
+            ).order_by(CatalogEntry.fetched_at.desc()).first()
+            if entry is None:
+                return None
+            return {"title": entry.title, "year": entry.year, "rating": entry.rating, "poster": entry.poster,
+                    "imdb_id": entry.imdb_id}
+        except Exception as e:
+            logging.error(f"Error retrieving catalog entry for '{title}': {e}")
+            return None
+        finally:
+            self._close_session()
+
+    def save_catalog_entry(self, movie_data):
+        # Insert or refresh the catalog entry of an OMDb lookup; lookups without an IMDb id are skipped.
+        # Movies linked to a refreshed entry show its new details, so their owners' counters and versions follow.
+        if not movie_data.get('imdb_id'):
+            return False
+        session = self.session_factory()
+        try:
+            # An upsert rather than session.merge(), which reads the row first
+            session.execute(text(
+                "INSERT INTO catalog (imdb_id, title, title_key, year, rating, poster, fetched_at) "
+                "VALUES (:imdb_id, :title, :title_key, :year, :rating, :poster, :fetched_at) "
+                "ON CONFLICT (imdb_id) DO UPDATE SET title = excluded.title, title_key = excluded.title_key, "
+                "year = excluded.year, rating = excluded.rating, poster = excluded.poster, "
+                "fetched_at = excluded.fetched_at"
+            ), {
+                "imdb_id": movie_data['imdb_id'],
+                "title": movie_data['title'],
+                "title_key": normalize_title(movie_data['title']),
+                "year": movie_data['year'],
+                "rating": movie_data['rating'],
+                "poster": movie_data.get('poster'),
+                "fetched_at": time.time(),
+            })
+            owners = select(Movie.user_id).where(Movie.imdb_id == movie_data['imdb_id'])
+            session.execute(
+                update(User).where(User.id.in_(owners)).values(self._user_stats_values(User.id)),
+                execution_options={"synchronize_session": False},
+            )
+            self._touch_owners(session, movie_data['imdb_id'])
+            session.commit()
+            read_from_primary()
+            return True
+        except Exception as e:
+            session.rollback()
+            logging.error(f"Error saving catalog entry {movie_data['imdb_id']}: {e}")
+            return False
+        finally:
+            session.close()
+
+    def get_unlinked_titles(self, after_name=None, limit=100):
+        # Retrieve distinct names of resolved movies without a catalog entry, in name order after after_name
+        session = self.Session()
+        try:
+            query = select(Movie.name).where(Movie.imdb_id.is_(None), Movie.status == MOVIE_RESOLVED)
+            if after_name is not None:
+                query = query.where(Movie.name > after_name)
+            return list(session.execute(query.distinct().order_by(Movie.name).limit(limit)).scalars())
+        except Exception as e:
+            logging.error(f"Error retrieving unlinked movie titles: {e}")
+            return []
+        finally:
+            self._close_session()
+
+    def link_movies(self, name, imdb_id):
+        # Point every unlinked resolved movie with this exact name at a catalog entry; returns the row count
+        session = self.Session()
+        try:
+            linked = session.query(Movie).filter(
+                Movie.name == name, Movie.imdb_id.is_(None), Movie.status == MOVIE_RESOLVED
+            ).update({"imdb_id": imdb_id}, synchronize_session=False)
+            self._drop_catalog_copies(session, Movie.imdb_id == imdb_id)
+            session.commit()
+            return linked
+        except Exception as e:
+            session.rollback()
+            logging.error(f"Error linking movies named '{name}': {e}")
+            return 0
+        finally:
+            self._close_session()
+
+    def get_poster(self, imdb_id):
+        # Retrieve a catalog entry's poster URL and the file name of its cached thumbnail
+        session = self.Session()
+        try:
+            row = session.query(CatalogEntry.poster, CatalogEntry.poster_thumbnail).filter(
+                CatalogEntry.imdb_id == imdb_id
+            ).first()
+            if row is None:
+                return None
+            return {"poster": row.poster, "poster_thumbnail": row.poster_thumbnail}
+        except Exception as e:
+            logging.error(f"Error retrieving poster of {imdb_id}: {e}")
+            return None
+        finally:
+            self._close_session()
+
+    def set_poster_thumbnail(self, imdb_id, file_name):
+        # Record the cached thumbnail of a catalog entry's poster; the pages of the film's owners show it
+        session = self.session_factory()
+        try:
+            session.query(CatalogEntry).filter(CatalogEntry.imdb_id == imdb_id).update(
+                {"poster_thumbnail": file_name}, synchronize_session=False
+            )
+            self._touch_owners(session, imdb_id)
+            session.commit()
+            read_from_primary()
+            return True
+        except Exception as e:
+            session.rollback()
+            logging.error(f"Error saving poster thumbnail of {imdb_id}: {e}")
+            return False
+        finally:
+            session.close()
+
+    def add_user(self, name):
+        # Add a new user to the database
+        session = self.Session()
+        try:
+            new_user = User(name=name)
+            session.add(new_user)
+            session.flush()
+            # The user's page may have been cached as a 404 before
+            self._touch(session, new_user.id)
+            session.commit()
+            read_from_primary()
+            return new_user.id
+        except Exception as e:
+            session.rollback()
+            logging.error(f"Error adding user: {e}")
+            return None
+        finally:
+            self._close_session()
+
+    def add_movie(self, name, year, rating, user_id, imdb_id=None):
+        # Add a new movie for a user, linked to its catalog entry when imdb_id is given.
+        # A linked movie stores only the details that differ from its catalog entry.
+        if not name or not isinstance(name, str):
+            logging.error("Invalid movie name.")
+            return False
+        if not (0 <= rating <= 10):
+            logging.error("Rating must be between 0 and 10.")
+            return False
+        session = self.Session()
+        try:
+            new_movie = Movie(name=_override(CatalogEntry.title, name, imdb_id),
+                              year=_override(CatalogEntry.year, year, imdb_id),
+                              rating=_override(CatalogEntry.rating, rating, imdb_id),
+                              user_id=user_id, imdb_id=imdb_id)
+            session.add(new_movie)
+            session.flush()
+            self._refresh_user_stats(session, user_id)
+            self._touch(session, user_id)
+            session.commit()
+            read_from_primary()
+        except Exception as e:
+            session.rollback()
+            logging.error(f"Error adding movie:{e}")
+        finally:
+            self._close_session()
+
+    def add_pending_movie(self, name, user_id):
+        # Add a placeholder movie whose details are resolved in the background; returns its ID
+        if not name or not isinstance(name, str):
+            logging.error("Invalid movie name.")
+            return None
+        session = self.Session()
+        try:
+            new_movie = Movie(name=name, year=0, rating=0, user_id=user_id, status=MOVIE_PENDING)
+            session.add(new_movie)
+            session.flush()
+            self._refresh_user_stats(session, user_id)
+            self._touch(session, user_id)
+            session.commit()
+            read_from_primary()
+            return new_movie.id
+        except Exception as e:
+            session.rollback()
+            logging.error(f"Error adding pending movie:{e}")
+            return None
+        finally:
+            self._close_session()
+
+    def resolve_movie(self, movie_id, name=None, year=None, rating=None, imdb_id=None):
+        # Store the looked-up details of a pending movie, or mark it failed when name is None
+        session = self.Session()
+        try:
+            values = {"status": MOVIE_FAILED}
+            if name is not None:
+                values = {"name": _override(CatalogEntry.title, name, imdb_id),
+                          "year": _override(CatalogEntry.year, year, imdb_id),
+                          "rating": _override(CatalogEntry.rating, rating, imdb_id),
+                          "imdb_id": imdb_id, "status": MOVIE_RESOLVED}
+            user_id = session.query(Movie.user_id).filter(
+                Movie.id == movie_id, Movie.status == MOVIE_PENDING
+            ).scalar()
+            if user_id is None:
+                return False
+            updated = session.query(Movie).filter(
+                Movie.id == movie_id, Movie.status == MOVIE_PENDING
+            ).update(values, synchronize_session=False)
+            if updated:
+                self._refresh_user_stats(session, user_id)
+                self._touch(session, user_id)
+            session.commit()
+            if updated:
+                read_from_primary()
+            return bool(updated)
+        except Exception as e:
+            session.rollback()
+            logging.error(f"Error resolving movie with ID {movie_id}: {e}")
+            return False
+        finally:
+            self._close_session()
+
+    def get_pending_movies(self):
+        # Retrieve the movies still waiting for their OMDb lookup
+        session = self.Session()
+        try:
+            movies = session.query(Movie.id, Movie.name).filter(Movie.status == MOVIE_PENDING).all()
+            return [{"id": movie.id, "name": movie.name} for movie in movies]
+        except Exception as e:
+            logging.error(f"Error retrieving pending movies: {e}")
+            return []
+        finally:
+            self._close_session()
+
+    def add_movies(self, movies, user_id):
+        # Add several movies for a user with one bulk insert in a single transaction.
+        # Each movie is a dict with name, year, rating and optionally imdb_id.
+        # Linked movies store only the details that differ from their catalog entries.
+        for movie in movies:
+            if not movie.get('name') or not isinstance(movie['name'], str):
+                logging.error("Invalid movie name.")
+                return False
+            if not (0 <= movie['rating'] <= 10):
+                logging.error("Rating must be between 0 and 10.")
+                return False
+        session = self.Session()
+        try:
+            session.execute(insert(Movie), [
+                {"name": movie['name'], "year": movie['year'], "rating": movie['rating'],
+                 "imdb_id": movie.get('imdb_id'), "user_id": user_id}
+                for movie in movies
+            ])
+            if any(movie.get('imdb_id') for movie in movies):
+                self._drop_catalog_copies(session, Movie.user_id == user_id)
+            self._refresh_user_stats(session, user_id)
+            self._touch(session, user_id)
+            session.commit()
+            read_from_primary()
+            return True
+        except Exception as e:
+            session.rollback()
+            logging.error(f"Error adding movies:{e}")
+            return False
+        finally:
+            self._close_session()
+
+    def update_movie(self, movie_id, name=None, year=None, rating=None, imdb_id=None):
+        # Update the details of an existing movie; a new name comes with the imdb_id it resolved to
+        session = self.Session()
+        try:
+            movie = session.query(Movie).filter_by(id=movie_id).first()
+            if not movie:
+                logging.error(f"Movie with id {movie_id} not found.")
+                return
+            if name:
+                movie.name = _override(CatalogEntry.title, name, imdb_id)
+                movie.imdb_id = imdb_id
+            if year:
+                movie.year = _override(CatalogEntry.year, year, movie.imdb_id)
+            if rating:
+                movie.rating = _override(CatalogEntry.rating, rating, movie.imdb_id)
+            session.flush()
+            self._refresh_user_stats(session, movie.user_id)
+            self._touch(session, movie.user_id)
+            session.commit()
+            read_from_primary()
+        except Exception as e:
+            session.rollback()
+            logging.error(f"Error updating movie: {e}")
+        finally:
+            self._close_session()
+
+    def delete_movie(self, movie_id):
+        # Delete a movie from the database
+        session = self.Session()
+        try:
+            movie = session.query(Movie).filter_by(id=movie_id).first()
+            if not movie:
+                logging.error(f"Movie with id {movie_id} not found.")
+                return
+            session.delete(movie)
+            session.flush()
+            self._refresh_user_stats(session, movie.user_id)
+            self._touch(session, movie.user_id)
+            session.commit()
+            read_from_primary()
+        except Exception as e:
+            session.rollback()
+            logging.error(f"Error deleting movie: {e}")
+        finally:
+            self._close_session()
+
+    def get_user(self, user_id):
+        # Retrieve user details by user ID
+        session = self._read_session()
+        try:
+            user = session.query(User).filter(User.id == user_id).first()
+            if user:
+                return {"id": user.id, "name": user.name}
+            else:
+                logging.error(f"User with ID {user_id} not found.")
+                return None
+        except Exception as e:
+            logging.error(f"Error retrieving user with ID {user_id}: {e}")
+            return None
+        finally:
+            self._close_session()
+
+    def get_user_with_movie_count(self, user_id):
+        # Retrieve user details together with the number of movies in one query
+        session = self._read_session()
+        try:
+            user = session.query(*self._user_columns).filter(User.id == user_id).first()
+            if user:
+                return self._user_to_dict(user)
+            else:
+                logging.error(f"User with ID {user_id} not found.")
+                return None
+        except Exception as e:
+            logging.error(f"Error retrieving user with ID {user_id}: {e}")
+            return None
+        finally:
+            self._close_session()
+
+    def get_movie(self, movie_id):
+        # Retrieve movie details by movie ID
+        session = self._read_session()
+        try:
+            movie = session.query(*self._movie_columns).outerjoin(*with_catalog).filter(Movie.id == movie_id).first()
+            if movie:
+                return self._movie_to_dict(movie)
+            else:
+                logging.error(f"Movie with ID {movie_id} not found.")
+                return None
+        except Exception as e:
+            logging.error(f"Error retrieving movie with ID {movie_id}: {e}")
+            return None
+        finally:
+            self._close_session()
+
+    def get_user_movie(self, user_id, movie_id):
+        # Retrieve a movie by ID, only if it belongs to the given user
+        session = self._read_session()
+        try:
+            movie = session.query(*self._movie_columns).outerjoin(*with_catalog).filter(
+                Movie.id == movie_id, Movie.user_id == user_id
+            ).first()
+            if movie:
+                return self._movie_to_dict(movie)
+            else:
+                logging.error(f"Movie with ID {movie_id} not found for user ID {user_id}.")
+                return None
+        except Exception as e:
+            logging.error(f"Error retrieving movie with ID {movie_id}: {e}")
+            return None
+        finally:
+            self._close_session()
+
+    _movie_columns = (Movie.id, movie_name.label("name"), movie_year.label("year"), movie_rating.label("rating"),
+                      Movie.user_id, Movie.status, Movie.imdb_id)
+
+    @staticmethod
+    def _movie_to_dict(movie):
+        return {"id": movie.id, "name": movie.name, "year": movie.year, "rating": movie.rating,
+                "user_id": movie.user_id, "status": movie.status}
+
+    # Queried as plain columns so that counters updated earlier in the same session are never stale
+    _user_columns = (User.id, User.name, User.movies_count, User.avg_rating, User.top_rating)
+
+    @staticmethod
+    def _user_to_dict(user):
+        return {"id": user.id, "name": user.name, "movies_count": user.movies_count,
+                "avg_rating": user.avg_rating, "top_rating": user.top_rating}
+
+    def get_all_users(self, after_id=None, before_id=None, limit=None):
+        # Retrieve users ordered by ID together with their movie counters.
+        # after_id/before_id are keyset cursors; limit bounds the number of users returned.
+        session = self._read_session()
+        try:
+            query = session.query(*self._user_columns)
+            if before_id is not None:
+                query = query.filter(User.id < before_id).order_by(User.id.desc())
+            else:
+                if after_id is not None:
+                    query = query.filter(User.id > after_id)
+                query = query.order_by(User.id)
+            if limit is not None:
+                query = query.limit(limit)
+            users = query.all()
+            if before_id is not None:
+                users.reverse()
+            return [self._user_to_dict(user) for user in users]
+        except Exception as e:
+            logging.error(f"Error retrieving users: {e}")
+            return []
+        finally:
+            self._close_session()
+
+    def get_user_movies(self, user_id, after_id=None, before_id=None, limit=None):
+        # Retrieve the movies of a specific user, newest first.
+        # after_id/before_id are keyset cursors; limit bounds the number of movies returned.
+        session = self._read_session()
+        try:
+            query = session.query(*self._movie_columns, CatalogEntry.poster, CatalogEntry.poster_thumbnail).outerjoin(
+                *with_catalog
+            ).filter(Movie.user_id == user_id)
+            if before_id is not None:
+                query = query.filter(Movie.id > before_id).order_by(Movie.id)
+            else:
+                if after_id is not None:
+                    query = query.filter(Movie.id < after_id)
+                query = query.order_by(Movie.id.desc())
+            if limit is not None:
+                query = query.limit(limit)
+            movies = query.all()
+            if before_id is not None:
+                movies.reverse()
+            return [
+                {"id": movie.id, "name": movie.name, "year": movie.year, "rating": movie.rating,
+                 "status": movie.status, "imdb_id": movie.imdb_id, "poster": movie.poster,
+                 "poster_thumbnail": movie.poster_thumbnail}
+                for movie in movies
+            ]
+        except Exception as e:
+            logging.error(f"Error retrieving movies: {e}")
+            return []
+        finally:
+            self._close_session()
+
+    def search_movies(self, query, user_id=None, limit=20):
+        # Full-text search over movie names, best matches first.
+        # Every word is matched as a prefix, so "dark kni" finds "The Dark Knight".
+        words = re.findall(r'\w+', query)
+        if not words:
+            return []
+        session = self._read_session()
+        try:
+            source, condition, order, params = self._match_words(words, within_user=user_id is not None)
+            sql = (
+                "SELECT movies.id, coalesce(movies.name, catalog.title) AS name, "
+                "coalesce(movies.year, catalog.year) AS year, coalesce(movies.rating, catalog.rating) AS rating, "
+                "movies.status, movies.user_id, users.name AS user_name "
+                f"FROM {source} "
+                "LEFT JOIN catalog ON catalog.imdb_id = movies.imdb_id "
+                "JOIN users ON users.id = movies.user_id "
+                f"WHERE {condition} "
+            )
+            params["limit"] = limit
+            if user_id is not None:
+                sql += "AND movies.user_id = :user_id "
+                params["user_id"] = user_id
+            sql += f"ORDER BY {order} LIMIT :limit"
+            return [dict(row._mapping) for row in session.execute(text(sql), params)]
+        except Exception as e:
+            logging.error(f"Error searching movies for '{query}': {e}")
+            return []
+        finally:
+            self._close_session()
+
+    def _match_words(self, words, within_user=False):
+        # The FROM source, WHERE condition, ORDER BY and parameters matching every word in a movie name,
+        # within_user when the search is limited to one user's movies. catalog is joined after the source.
+        # Portable fallback without an index; backends with full-text search override it.
+        conditions = [f"lower(coalesce(movies.name, catalog.title)) LIKE :word{index}" for index in range(len(words))]
+        params = {f"word{index}": f"%{word.lower()}%" for index, word in enumerate(words)}
+        return "movies", " AND ".join(conditions), "movies.id DESC", params
+
+    def iter_movies(self, user_id=None, batch_size=1000):
+        # Yield every movie (optionally one user's) as a dict, fetching batch_size rows at a time.
+        # Uses its own session so that it can outlive the request that started it.
+        session = (self.session_factory if self._reads_from_primary() else self.read_session_factory)()
+        try:
+            query = select(
+                Movie.id, Movie.user_id, movie_name.label("name"), movie_year.label("year"),
+                movie_rating.label("rating"), Movie.status
+            ).outerjoin(*with_catalog).order_by(Movie.id).execution_options(yield_per=batch_size)
+            if user_id is not None:
+                query = query.where(Movie.user_id == user_id)
+            for row in session.execute(query):
+                yield dict(row._mapping)
+        finally:
+            session.close()
+
+    def iter_titles(self, batch_size=10000):
+        # Yield (title, number of movies) for every distinct resolved movie name, then (title, 0) for every
+        # catalog title. Uses its own session so that it can run on a background thread.
+        session = self.read_session_factory()
+        try:
+            movie_names = select(movie_name, func.count()).outerjoin(*with_catalog).where(
+                Movie.status == MOVIE_RESOLVED
+            ).group_by(movie_name)
+            catalog_titles = select(CatalogEntry.title, 0)
+            for query in (movie_names, catalog_titles):
+                for title, count in session.execute(query.execution_options(yield_per=batch_size)):
+                    yield title, count
+        finally:
+            session.close()
+
+    def get_rater_ratings(self, titles, max_users=5000):
+        # Retrieve (user_id, name, rating) of every resolved movie of up to max_users users
+        # who have one of the given titles, matched case-insensitively
+        session = self._read_session()
+        try:
+            raters = select(Movie.user_id).where(
+                self._has_title(titles), Movie.status == MOVIE_RESOLVED
+            ).distinct().limit(max_users)
+            return [tuple(row) for row in session.execute(
+                select(Movie.user_id, movie_name, movie_rating).outerjoin(*with_catalog).where(
+                    Movie.user_id.in_(raters.scalar_subquery()), Movie.status == MOVIE_RESOLVED
+                )
+            )]
+        except Exception as e:
+            logging.error(f"Error retrieving ratings of users with titles {titles[:5]}: {e}")
+            return []
+        finally:
+            self._close_session()
+
+    @staticmethod
+    def _has_title(titles):
+        # Matches movies named one of the titles: by their own name through ix_movies_name_lower,
+        # or else by their catalog entry's title through ix_catalog_title_key and ix_movies_imdb_id
+        return or_(
+            func.lower(Movie.name).in_([title.lower() for title in titles]),
+            and_(Movie.name.is_(None), Movie.imdb_id.in_(select(CatalogEntry.imdb_id).where(
+                CatalogEntry.title_key.in_([normalize_title(title) for title in titles])
+            ))),
+        )
+
+    def get_user_titles(self, user_id, titles):
+        # Retrieve which of the given titles the user has, as lowercase names
+        session = self._read_session()
+        try:
+            names = session.execute(select(func.lower(movie_name)).outerjoin(*with_catalog).where(
+                Movie.user_id == user_id, self._has_title(titles)
+            )).scalars()
+            return set(names)
+        except Exception as e:
+            logging.error(f"Error retrieving titles of user ID {user_id}: {e}")
+            return set()
+        finally:
+            self._close_session()
+
+    def get_user_favorites(self, user_ids=None):
+        # Retrieve each user's favorite movie (highest rated), optionally for the given users only
+        session = self._read_session()
+        try:
+            return self._query_user_favorites(session, user_ids)
+        except Exception as e:
+            logging.error(f"Error retrieving user favorites: {e}")
+            return []
+        finally:
+            self._close_session()
+
+    @staticmethod
+    def _query_user_favorites(session, user_ids=None):
+        # ROW_NUMBER() per user over the effective rating, each user's movies read through ix_movies_user_id_id
+        ranked = select(
+            Movie.user_id,
+            movie_name.label("name"),
+            movie_rating.label("rating"),
+            func.row_number().over(
+                partition_by=Movie.user_id, order_by=(movie_rating.desc(), Movie.id)
+            ).label("position"),
+        ).outerjoin(*with_catalog)
+        ranked = ranked.where(Movie.status == MOVIE_RESOLVED)
+        if user_ids is not None:
+            ranked = ranked.where(Movie.user_id.in_(list(user_ids)))
+        ranked = ranked.subquery()
+        favorites = session.execute(
+            select(ranked.c.user_id, ranked.c.name, ranked.c.rating)
+            .where(ranked.c.position == 1)
+            .order_by(ranked.c.user_id)
+        ).all()
+        return [
+            {"user_id": user_id, "favorite_movie": name, "rating": rating}
+            for user_id, name, rating in favorites
+        ]
+
+    def get_dashboard(self, limit):
+        # Retrieve the home page aggregates: totals, the most recent users and their favorites
+        session = self._read_session()
+        try:
+            total_users, total_movies = session.execute(
+                select(func.count(User.id), func.coalesce(func.sum(User.movies_count), 0))
+            ).one()
+
+            users = session.query(*self._user_columns).order_by(User.id.desc()).limit(limit).all()
+
+            favorites = self._query_user_favorites(session, [user.id for user in users])
+
+            return {
+                "total_users": total_users,
+                "total_movies": total_movies,
+                "users": [self._user_to_dict(user) for user in users],
+                "favorites": favorites,
+            }
+        except Exception as e:
+            logging.error(f"Error retrieving dashboard: {e}")
+            return {"total_users": 0, "total_movies": 0, "users": [], "favorites": []}
+        finally:
+            self._close_session()
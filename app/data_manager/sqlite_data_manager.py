@@ -1,167 +1,66 @@
-import logging
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from app.data_manager.data_manager_interface import DataManagerInterface  # Interface for data manager
-from app.model.data_model import Base, User, Movie
 
-logging.basicConfig(level=logging.ERROR)
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from app.data_manager.sql_data_manager import SQLDataManager
 
-class SQLiteDataManager(DataManagerInterface):
-    def __init__(self, db_file_name):
-        # Initialize the database connection and create tables if they don't exist
-        db_path = 'data'
-        if not os.path.exists(db_path):
-            os.makedirs(db_path)
-        self.engine = create_engine(f'sqlite:///{db_path}/{db_file_name}')
-        Base.metadata.create_all(self.engine)
-        self.Session = sessionmaker(bind=self.engine)
 
-    def add_user(self, name):
-        # Add a new user to the database
-        session = self.Session()
-        try:
-            new_user = User(name=name)
-            session.add(new_user)
-            session.commit()
-            return new_user.id
-        except Exception as e:
-            session.rollback()
-            logging.error(f"Error adding user: {e}")
-            return None
-        finally:
-            session.close()
+def _sqlite_pragmas(read_only=False):
+    # Connection settings applied to every new SQLite connection, tunable from the environment
+    pragmas = [] if read_only else [
+        # WAL lets readers run while a writer commits
+        "PRAGMA journal_mode=WAL",
+        # Safe with WAL: a power loss may drop the last commits but never corrupts the file
+        "PRAGMA synchronous=NORMAL",
+    ]
+    return pragmas + [
+        f"PRAGMA busy_timeout={int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000))}",
+        # A negative cache_size is in KiB
+        f"PRAGMA cache_size=-{int(os.getenv('SQLITE_CACHE_SIZE', 65536))}",
+        f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_SIZE', 268435456))}",
+        "PRAGMA temp_store=MEMORY",
+    ]
 
-    def add_movie(self, name, year, rating, user_id):
-        # Add a new movie for a user
-        if not name or not isinstance(name, str):
-            logging.error("Invalid movie name.")
-            return False
-        if not (0 <= rating <= 10):
-            logging.error("Rating must be between 0 and 10.")
-            return False
-        session = self.Session()
-        try:
-            new_movie = Movie(name=name, year=year, rating=rating, user_id=user_id)
-            session.add(new_movie)
-            session.commit()
-        except Exception as e:
-            session.rollback()
-            logging.error(f"Error adding movie:{e}")
-        finally:
-            session.close()
 
-    def update_movie(self, movie_id, name=None, year=None, rating=None):
-        # Update the details of an existing movie
-        session = self.Session()
-        try:
-            movie = session.query(Movie).filter_by(id=movie_id).first()
-            if not movie:
-                logging.error(f"Movie with id {movie_id} not found.")
-                return
-            if name:
-                movie.name = name
-            if year:
-                movie.year = year
-            if rating:
-                movie.rating = rating
-            session.commit()
-        except Exception as e:
-            session.rollback()
-            print(f"Error updating movie: {e}")
-        finally:
-            session.close()
+def _create_sqlite_engine(database_url, read_only=False):
+    engine = create_engine(database_url)
+    pragmas = _sqlite_pragmas(read_only)
 
-    def delete_movie(self, movie_id):
-        # Delete a movie from the database
-        session = self.Session()
-        try:
-            movie = session.query(Movie).filter_by(id=movie_id).first()
-            if not movie:
-                logging.error(f"Movie with id {movie_id} not found.")
-                return
-            session.delete(movie)
-            session.commit()
-        except Exception as e:
-            session.rollback()
-            logging.error(f"Error deleting movie: {e}")
-        finally:
-            session.close()
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
 
-    def get_user(self, user_id):
-        # Retrieve user details by user ID
-        session = self.Session()
-        try:
-            user = session.query(User).filter(User.id == user_id).first()
-            if user:
-                return {"id": user.id, "name": user.name}
-            else:
-                logging.error(f"User with ID {user_id} not found.")
-                return None
-        except Exception as e:
-            logging.error(f"Error retrieving user with ID {user_id}: {e}")
-            return None
-        finally:
-            session.close()
+    return engine
 
-    def get_movie(self, movie_id):
-        # Retrieve movie details by movie ID
-        session = self.Session()
-        try:
-            movie = session.query(Movie).filter_by(id=movie_id).first()
-            if movie:
-                return {"id": movie.id, "name": movie.name}
-            else:
-                logging.error(f"User with ID {movie} not found.")
-                return None
-        except Exception as e:
-            logging.error(f"Error retrieving movie with ID {movie_id}: {e}")
-            return None
-        finally:
-            session.close()
 
-    def get_all_users(self):
-        # Retrieve all users from the database
-        session = self.Session()
-        try:
-            users = session.query(User).all()
-            return [{"id": user.id, "name": user.name} for user in users]
-        except Exception as e:
-            logging.error(f"Error retrieving users: {e}")
-            return []
-        finally:
-            session.close()
+class SQLiteDataManager(SQLDataManager):
+    def __init__(self, db_file_name=None, database_url=None, read_url=None):
+        # Open data/<db_file_name>, or any sqlite:/// URL, and create tables if they don't exist.
+        # Reads use read_url, or by default their own read-only pool on the same file.
+        if database_url is None:
+            db_path = 'data'
+            if not os.path.exists(db_path):
+                os.makedirs(db_path)
+            database_url = f'sqlite:///{db_path}/{db_file_name}'
+        engine = _create_sqlite_engine(database_url)
 
-    def get_user_movies(self, user_id):
-        # Retrieve all movies associated with a specific user
-        session = self.Session()
-        try:
-            movies = session.query(Movie).filter_by(user_id=user_id).all()
-            return [
-                {"id": movie.id, "name": movie.name, "year": movie.year, "rating": movie.rating}
-                for movie in movies
-            ]
-        except Exception as e:
-            logging.error(f"Error retrieving movies: {e}")
-            return []
-        finally:
-            session.close()
+        database = make_url(database_url).database
+        if read_url is None and database and database != ':memory:':
+            read_url = f'sqlite:///file:{os.path.abspath(database)}?mode=ro&uri=true'
+        read_engine = _create_sqlite_engine(read_url, read_only=True) if read_url else None
 
-    def get_user_favorites(self):
-        # Retrieve each user's favorite movie (highest rated)
-        session = self.Session()
-        try:
-            favorites = session.query(
-                Movie.user_id,
-                Movie.name,
-                Movie.rating
-            ).distinct(Movie.user_id).order_by(Movie.user_id, Movie.rating.desc()).all()
-            return [
-                {"user_id": user_id, "favorite_movie": name, "rating": rating}
-                for user_id, name, rating in favorites
-            ]
-        except Exception as e:
-            logging.error(f"Error retrieving user favorites: {e}")
-            return []
-        finally:
-            session.close()
+        super().__init__(engine, read_engine)
+
+    def _match_words(self, words, within_user=False):
+        # FTS5 prefix query over movies_fts, ranked by bm25
+        match = ' '.join(f'"{word}"*' for word in words)
+        if within_user:
+            # Ranking every match across all users costs far more than one user's list; the unary + keeps
+            # SQLite reading the user's movies through ix_movies_user_id_id, checked against the matching ids
+            return ("movies", "+movies.id IN (SELECT rowid FROM movies_fts WHERE movies_fts MATCH :match)",
+                    "movies.id DESC", {"match": match})
+        return ("movies_fts JOIN movies ON movies.id = movies_fts.rowid",
+                "movies_fts MATCH :match", "movies_fts.rank", {"match": match})
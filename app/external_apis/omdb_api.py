@@ -1,32 +1,154 @@
+import logging
 import os
+import random
+import threading
+import time
+
 import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+
+class MovieNotFoundError(ValueError):
+    """Raised when OMDb has no movie for the requested title."""
+
+
+class CircuitBreaker:
+    """
+    Fails fast after repeated upstream failures.
+
+    After `failure_threshold` consecutive failures the breaker opens and
+    every call is rejected until `reset_timeout` seconds have passed. The
+    next call is then let through as a probe: success closes the breaker,
+    failure opens it again.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        with self._lock:
+            return self._opened_at is not None and time.monotonic() - self._opened_at < self.reset_timeout
+
+    def allow_request(self):
+        """Return False while the breaker is open."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                # Half-open: let this call probe the upstream
+                self._opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logging.warning("OMDb circuit breaker opened after %d failures.", self._failures)
+                self._opened_at = time.monotonic()
+
 
 class OMDbAPI:
+    """
+    HTTP client for the OMDb API.
+
+    Requests go through one pooled keep-alive `requests.Session`, with
+    connect/read timeouts, exponential backoff with full jitter bounded by a
+    retry budget, and a circuit breaker that fails fast while OMDb is down.
+    """
     API_URL = "http://www.omdbapi.com/"
 
-    def __init__(self):
-        """Initialize the OMDbAPI class, loading the API key from environment variables."""
+    # Status codes worth retrying; anything else is returned to the caller
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, api_key=None, api_url=None, pool_size=None, connect_timeout=None, read_timeout=None,
+                 max_retries=None, backoff_base=None, backoff_cap=None, retry_budget=None,
+                 breaker_threshold=None, breaker_reset=None):
+        """Initialize the client, reading unset options from environment variables."""
         load_dotenv()
-        self.API_KEY = os.getenv('API_KEY')
+        self.API_KEY = api_key or os.getenv('API_KEY')
         if not self.API_KEY:
             raise Exception("Movie API Key not found in environment variables.")
+        self.API_URL = api_url or os.getenv('OMDB_API_URL', self.API_URL)
 
-    def fetch_movie_data(self, title):
-        """Fetch movie data from OMDb API."""
-        url = f'{self.API_URL}?apikey={self.API_KEY}&t={title}'
-        response = requests.get(url)
+        pool_size = int(pool_size or os.getenv('OMDB_POOL_SIZE', 10))
+        self.timeout = (
+            float(connect_timeout or os.getenv('OMDB_CONNECT_TIMEOUT', 3.05)),
+            float(read_timeout or os.getenv('OMDB_READ_TIMEOUT', 5)),
+        )
+        self.max_retries = int(max_retries if max_retries is not None else os.getenv('OMDB_MAX_RETRIES', 2))
+        self.backoff_base = float(backoff_base or os.getenv('OMDB_BACKOFF_BASE', 0.2))
+        self.backoff_cap = float(backoff_cap or os.getenv('OMDB_BACKOFF_CAP', 2))
+        self.retry_budget = float(retry_budget or os.getenv('OMDB_RETRY_BUDGET', 10))
+        self.breaker = CircuitBreaker(
+            int(breaker_threshold or os.getenv('OMDB_BREAKER_THRESHOLD', 5)),
+            float(breaker_reset or os.getenv('OMDB_BREAKER_RESET', 30)),
+        )
+
+        # Retries are handled here so that they count against the breaker and the budget
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def fetch_raw(self, title):
+        """Fetch the raw OMDb JSON for a title."""
+        if not self.breaker.allow_request():
+            raise ConnectionError("OMDb API is unavailable, try again later")
+
+        deadline = time.monotonic() + self.retry_budget
+        attempt = 0
+        while True:
+            try:
+                response = self.session.get(self.API_URL, params={'apikey': self.API_KEY, 't': title},
+                                            timeout=self.timeout)
+                if response.status_code not in self.RETRY_STATUSES:
+                    break
+                error = f"OMDb API returned HTTP {response.status_code}"
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = f"OMDb API request failed: {e}"
+
+            self.breaker.record_failure()
+            delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+            attempt += 1
+            if attempt > self.max_retries or time.monotonic() + delay >= deadline or not self.breaker.allow_request():
+                logging.error(error)
+                raise ConnectionError("Failed to connect to OMDb API")
+            time.sleep(delay)
 
         if response.status_code != 200:
+            self.breaker.record_failure()
             raise ConnectionError("Failed to connect to OMDb API")
 
-        data = response.json()
+        self.breaker.record_success()
+        return response.json()
+
+    def fetch_movie_data(self, title):
+        """Fetch movie data from OMDb API."""
+        data = self.fetch_raw(title)
         if data.get('Response') == 'False':
-            raise ValueError("Movie not found")
+            raise MovieNotFoundError("Movie not found")
 
         return {
             'title': data.get('Title'),
             'year': int(data.get('Year')),
             'rating': float(data.get('imdbRating')),
-            'poster': data.get('Poster')
+            'poster': data.get('Poster'),
+            'imdb_id': data.get('imdbID')
         }
+
+    def close(self):
+        """Release the pooled connections."""
+        self.session.close()
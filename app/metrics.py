@@ -0,0 +1,192 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Default latency buckets in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Buckets for the number of SQL queries run by one request
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+class Counter:
+    """Monotonic counter with optional labels, rendered in the Prometheus text format."""
+
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(labels)} {value}')
+        return lines
+
+
+class Histogram:
+    """Bucketed distribution with optional labels, rendered in the Prometheus text format."""
+
+    def __init__(self, name, description, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last one is +Inf), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                    cumulative += bucket_count
+                    lines.append(f'{self.name}_bucket{_format_labels(labels + (("le", bound),))} {cumulative}')
+                lines.append(f'{self.name}_sum{_format_labels(labels)} {total}')
+                lines.append(f'{self.name}_count{_format_labels(labels)} {count}')
+        return lines
+
+
+class Metrics:
+    """
+    Process-wide instrumentation: per-route latency, SQL query counts and time,
+    and OMDb call latency. Recording is skipped entirely while disabled.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.server_timing = False
+        self.request_duration = Histogram(
+            'moviweb_http_request_duration_seconds', 'Time spent handling a request, by route.')
+        self.requests = Counter('moviweb_http_requests_total', 'Requests handled, by route and status.')
+        self.request_queries = Histogram(
+            'moviweb_http_request_sql_queries', 'SQL queries run by one request, by route.', QUERY_COUNT_BUCKETS)
+        self.request_sql_duration = Histogram(
+            'moviweb_http_request_sql_duration_seconds', 'Time spent in SQL by one request, by route.')
+        self.sql_duration = Histogram('moviweb_sql_query_duration_seconds', 'Duration of single SQL queries.')
+        self.omdb_duration = Histogram('moviweb_omdb_request_duration_seconds', 'Duration of OMDb lookups.')
+        self.omdb_errors = Counter('moviweb_omdb_errors_total', 'OMDb lookups that raised, by exception type.')
+        self._engine_hooks_installed = False
+
+    def init_app(self, app):
+        """Install the request and SQL hooks if metrics or the Server-Timing header are enabled."""
+        self.enabled = self.enabled or app.config.get('METRICS_ENABLED', False)
+        self.server_timing = self.server_timing or app.config.get('SERVER_TIMING', False)
+        if not (self.enabled or self.server_timing):
+            return
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        if not self._engine_hooks_installed:
+            # Engines are created lazily, so listen on every engine
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+            event.listen(Engine, 'handle_error', self._handle_error)
+            self._engine_hooks_installed = True
+
+    @contextmanager
+    def time_omdb(self):
+        """Time one OMDb lookup."""
+        if not (self.enabled or self.server_timing):
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.omdb_errors.inc(error=type(e).__name__)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.omdb_duration.observe(elapsed)
+            if has_request_context() and hasattr(g, '_metrics_started'):
+                g._metrics_omdb_time += elapsed
+
+    def render(self, extra_lines=()):
+        lines = []
+        for metric in (self.request_duration, self.requests, self.request_queries, self.request_sql_duration,
+                       self.sql_duration, self.omdb_duration, self.omdb_errors):
+            lines.extend(metric.render())
+        lines.extend(extra_lines)
+        return '\n'.join(lines) + '\n'
+
+    def _start_request(self):
+        g._metrics_started = time.perf_counter()
+        g._metrics_queries = 0
+        g._metrics_sql_time = 0.0
+        g._metrics_omdb_time = 0.0
+
+    def _finish_request(self, response):
+        if not hasattr(g, '_metrics_started'):
+            return response
+        elapsed = time.perf_counter() - g._metrics_started
+        endpoint = request.endpoint or 'unmatched'
+        if self.enabled:
+            self.request_duration.observe(elapsed, endpoint=endpoint, method=request.method)
+            self.requests.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+            self.request_queries.observe(g._metrics_queries, endpoint=endpoint)
+            self.request_sql_duration.observe(g._metrics_sql_time, endpoint=endpoint)
+        if self.server_timing:
+            # Streamed responses are still running; their timing would be misleading
+            if not response.is_streamed:
+                response.headers['Server-Timing'] = (
+                    f'db;dur={g._metrics_sql_time * 1000:.2f};desc="{g._metrics_queries} queries", '
+                    f'omdb;dur={g._metrics_omdb_time * 1000:.2f}, '
+                    f'app;dur={elapsed * 1000:.2f}'
+                )
+        return response
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_query_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['metrics_query_started'].pop()
+        elapsed = time.perf_counter() - started
+        if self.enabled:
+            self.sql_duration.observe(elapsed)
+        if has_request_context() and hasattr(g, '_metrics_started'):
+            g._metrics_queries += 1
+            g._metrics_sql_time += elapsed
+
+
+    def _handle_error(self, exception_context):
+        # A failed query never reaches after_cursor_execute
+        connection = exception_context.connection
+        if connection is not None and connection.info.get('metrics_query_started'):
+            connection.info['metrics_query_started'].pop()
+
+
+# The application's instrumentation, shared by every module
+metrics = Metrics()
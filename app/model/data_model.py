@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, ForeignKey
+from sqlalchemy import create_engine, Column, Integer, String, Float, ForeignKey, Boolean, Text, Index, func
 from sqlalchemy.orm import declarative_base, relationship
 
 # Database setup
@@ -8,13 +8,76 @@ class User(Base):
     __tablename__ = 'users'
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String, nullable=False)
+    # Denormalized from movies by the data manager's write paths, so user lists need no aggregate.
+    # `flask rebuild-user-stats` recomputes them if they ever drift.
+    movies_count = Column(Integer, nullable=False, default=0, server_default='0')
+    # Average and highest rating of the user's resolved movies, NULL while there are none
+    avg_rating = Column(Float, nullable=True)
+    top_rating = Column(Float, nullable=True)
     movies = relationship("Movie", back_populates="user")
 
+# Values of Movie.status
+MOVIE_PENDING = 'pending'
+MOVIE_RESOLVED = 'resolved'
+MOVIE_FAILED = 'failed'
+
+
+def normalize_title(title):
+    """Normalize a title so that 'The Matrix' and ' the  matrix' compare equal."""
+    return " ".join(title.split()).casefold()
+
+
+class CatalogEntry(Base):
+    """OMDb metadata stored once per film, shared by every user's copy of it."""
+    __tablename__ = 'catalog'
+    imdb_id = Column(String, primary_key=True)
+    title = Column(String, nullable=False)
+    # normalize_title(title), for lookups of the titles users type
+    title_key = Column(String, nullable=False, index=True)
+    year = Column(Integer, nullable=False)
+    rating = Column(Float, nullable=False)
+    poster = Column(String, nullable=True)
+    # File name of the poster's thumbnail in the PosterCache, NULL until it has been downloaded
+    poster_thumbnail = Column(String, nullable=True)
+    fetched_at = Column(Float, nullable=False)
+
+
 class Movie(Base):
+    """One user's copy of a film: a link to its catalog entry and whatever the user changed about it."""
     __tablename__ = 'movies'
     id = Column(Integer, primary_key=True, autoincrement=True)
-    name = Column(String, nullable=False)
-    year = Column(Integer, nullable=False)
-    rating = Column(Float, nullable=False)
+    # The user's own name, year and rating. On movies linked to the catalog they are NULL unless they
+    # differ from the catalog entry's; movies without an entry (pending, failed, unlinked) keep all three.
+    name = Column(String, nullable=True)
+    year = Column(Integer, nullable=True)
+    rating = Column(Float, nullable=True)
     user_id = Column(Integer, ForeignKey('users.id'))
+    # NULL until the movie has been resolved through OMDb
+    imdb_id = Column(String, ForeignKey('catalog.imdb_id'), nullable=True)
+    # 'pending' while the OMDb lookup runs in the background, then 'resolved' or 'failed'
+    status = Column(String, nullable=False, default='resolved', server_default='resolved')
     user = relationship("User", back_populates="movies")
+
+    # Existing databases receive these through app/data_manager/migrations.py
+    __table_args__ = (
+        # Serves per-user movie lists, newest first, and the users/movies joins
+        Index('ix_movies_user_id_id', user_id, id.desc()),
+        # Serves case-insensitive lookups by the titles stored on the movies themselves
+        Index('ix_movies_name_lower', func.lower(name)),
+        # Serves the joins from catalog entries to the movies linked to them
+        Index('ix_movies_imdb_id', imdb_id),
+    )
+
+class OMDbCacheEntry(Base):
+    __tablename__ = 'omdb_cache'
+    title_key = Column(String, primary_key=True)
+    payload = Column(Text, nullable=True)
+    found = Column(Boolean, nullable=False)
+    fetched_at = Column(Float, nullable=False)
+
+class ResourceVersion(Base):
+    """Change counter per cached resource: '*' for any change, 'user:<id>' for one user's movies."""
+    __tablename__ = 'resource_versions'
+    resource = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False)
+    updated_at = Column(Float, nullable=False)
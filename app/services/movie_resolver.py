@@ -0,0 +1,71 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.omdb_cache import OMDbCache
+
+
+class MovieResolver:
+    """
+    Resolves pending movies through OMDb on a background thread pool.
+
+    Requests for the same title are coalesced: while a lookup is in flight,
+    further movies with that title wait for it instead of starting another.
+    """
+
+    def __init__(self, data_manager, omdb_api_service, max_workers=None, title_autocomplete=None):
+        """omdb_api_service may be the service or a callable returning it."""
+        self.data_manager = data_manager
+        self._omdb_api_service = omdb_api_service
+        self.title_autocomplete = title_autocomplete
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(max_workers or os.getenv('OMDB_ASYNC_WORKERS', 4)),
+            thread_name_prefix='movie-resolver',
+        )
+        self._lock = threading.Lock()
+        # Normalized title -> IDs of the movies waiting for its lookup
+        self._waiting = {}
+
+    @property
+    def omdb_api_service(self):
+        if callable(self._omdb_api_service):
+            self._omdb_api_service = self._omdb_api_service()
+        return self._omdb_api_service
+
+    def submit(self, movie_id, title):
+        """Queue the lookup for a pending movie; returns immediately."""
+        key = OMDbCache.normalize(title)
+        with self._lock:
+            waiting = self._waiting.get(key)
+            if waiting is not None:
+                waiting.append(movie_id)
+                return
+            self._waiting[key] = [movie_id]
+        self._executor.submit(self._resolve, key, title)
+
+    def resume(self):
+        """Queue the lookups left pending by a previous run."""
+        for movie in self.data_manager.get_pending_movies():
+            self.submit(movie["id"], movie["name"])
+
+    def _resolve(self, key, title):
+        try:
+            movie_data = self.omdb_api_service.fetch_movie_data(title)
+        except Exception as e:
+            logging.error(f"Error resolving movie '{title}': {e}")
+            movie_data = None
+
+        with self._lock:
+            movie_ids = self._waiting.pop(key, [])
+        if movie_data and movie_ids and self.title_autocomplete is not None:
+            self.title_autocomplete.add(movie_data['title'])
+        for movie_id in movie_ids:
+            if movie_data:
+                self.data_manager.resolve_movie(movie_id, movie_data['title'], movie_data['year'],
+                                                movie_data['rating'], movie_data.get('imdb_id'))
+            else:
+                self.data_manager.resolve_movie(movie_id)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
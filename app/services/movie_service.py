@@ -1,43 +1,85 @@
 import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from xml.dom import NotFoundErr
 
-from sqlalchemy import func
-from app.data_manager.sqlite_data_manager import SQLiteDataManager
-from app.model.data_model import User, Movie
-from app.services.omdb_api_service import OMDbAPIService
+from app.services.request_cache import get_cached, set_cached, clear_cached
+
+# Number of rows on one page of the user and movie lists
+DEFAULT_PAGE_SIZE = 25
 
 
 class MovieService:
-    def __init__(self, db_file_name):
-        """Initialize MovieService with a data manager and OMDb API service."""
-        self.data_manager = SQLiteDataManager(db_file_name)
-        self.omdb_api_service = OMDbAPIService()
+    def __init__(self, data_manager, omdb_api_service, movie_resolver=None, title_autocomplete=None,
+                 recommender=None):
+        """
+        Initialize MovieService with a data manager and an OMDb API service.
+        omdb_api_service may also be a callable returning the service, to create it on first use.
+        movie_resolver enables add_movie_async; title_autocomplete and recommender are told about
+        every added or re-rated title.
+        """
+        self.data_manager = data_manager
+        self._omdb_api_service = omdb_api_service
+        self.movie_resolver = movie_resolver
+        self.title_autocomplete = title_autocomplete
+        self.recommender = recommender
+        self.dashboard_ttl = float(os.getenv('DASHBOARD_CACHE_TTL', 5))
+        self._dashboard_cache = {}
+
+    @property
+    def omdb_api_service(self):
+        if callable(self._omdb_api_service):
+            self._omdb_api_service = self._omdb_api_service()
+        return self._omdb_api_service
+
+    def get_versions(self, resources):
+        """
+        Fetch the change counters of the given resources, as {resource: (version, updated_at)}.
+        '*' changes on every write, 'user:<id>' whenever that user's movies change.
+        Fetched once per request, so a view sees the same versions as its ETag.
+        """
+        resources = tuple(resources)
+        return get_cached(('versions', resources), lambda: self.data_manager.get_versions(resources))
+
+    def get_dashboard(self, limit=6):
+        """
+        Fetch the home page aggregates: total users and movies, the most recent users
+        and their favorite movies. The result is cached until the '*' version changes,
+        which is shared by all processes and is the version the home page ETag is built
+        from, and for at most DASHBOARD_CACHE_TTL seconds.
+        """
+        versions = self.get_versions(['*'])
+        version = versions['*'][0] if versions else None
+        cached = self._dashboard_cache.get(limit)
+        if (version is not None and cached and cached[0] == version
+                and time.monotonic() - cached[1] < self.dashboard_ttl):
+            return cached[2]
+
+        dashboard = self.data_manager.get_dashboard(limit)
+        self._dashboard_cache[limit] = (version, time.monotonic(), dashboard)
+        return dashboard
 
     def get_all_users(self):
         """Fetch all users with their associated movie count."""
-        session = self.data_manager.Session()
-        try:
-            # Query users with the count of movies they have added
-            users_with_counts = (
-                session.query(
-                    User.id,
-                    User.name,
-                    func.count(Movie.id).label("movies_count")
-                )
-                .outerjoin(Movie, User.id == Movie.user_id)
-                .group_by(User.id)
-                .all()
-            )
-
-            return [
-                {"id": user.id, "name": user.name, "movies_count": user.movies_count}
-                for user in users_with_counts
-            ]
-        finally:
-            session.close()
+        return self.data_manager.get_all_users()
+
+    def get_users_page(self, after_id=None, before_id=None, limit=DEFAULT_PAGE_SIZE):
+        """Fetch one keyset page of users with their movie count, ordered by user ID."""
+        users = self.data_manager.get_all_users(after_id=after_id, before_id=before_id, limit=limit + 1)
+        return self._page(users, after_id, before_id, limit)
+
+    def rebuild_user_stats(self):
+        """
+        Recompute every user's movie count and ratings from the movies table.
+        Returns the number of users whose stored counters had drifted.
+        """
+        clear_cached()
+        return self.data_manager.rebuild_user_stats()
 
     def add_user(self, name):
         """Add a new user to the database."""
+        clear_cached()
         return self.data_manager.add_user(name)
 
     def get_all_movies(self):
@@ -46,7 +88,7 @@ class MovieService:
 
     def add_movie(self, name, user_id):
         """Add a movie to the database by fetching its details from OMDb API."""
-        user = self.data_manager.get_user(user_id)
+        user = self.get_user(user_id)
         if not user:
             raise NotFoundErr(f"user not found: {user_id}")
 
@@ -60,19 +102,110 @@ class MovieService:
             raise FileNotFoundError("Movie name not found")
 
         # Add the movie to the database
-        self.data_manager.add_movie(name, year, rating, user_id)
+        clear_cached()
+        self.data_manager.add_movie(name, year, rating, user_id, movie_data.get('imdb_id'))
+        self._index_titles([name])
+
+    def add_movie_async(self, name, user_id):
+        """
+        Add a pending movie right away and resolve its details from OMDb in the background.
+        Returns the new movie's ID; its status moves from 'pending' to 'resolved' or 'failed'.
+        """
+        if self.movie_resolver is None:
+            raise RuntimeError("Background movie resolution is not configured.")
+        user = self.get_user(user_id)
+        if not user:
+            raise NotFoundErr(f"user not found: {user_id}")
+
+        clear_cached()
+        movie_id = self.data_manager.add_pending_movie(name, user_id)
+        if movie_id is None:
+            raise RuntimeError(f"Could not add movie '{name}'.")
+        self.movie_resolver.submit(movie_id, name)
+        return movie_id
+
+    def import_movies(self, titles, user_id):
+        """
+        Add a list of movies for a user, resolving the titles concurrently through OMDb
+        and inserting every resolved movie in one transaction.
+        Returns a per-title report together with the import throughput.
+        """
+        user = self.get_user(user_id)
+        if not user:
+            raise NotFoundErr(f"user not found: {user_id}")
+
+        started = time.perf_counter()
+        workers = int(os.getenv('IMPORT_WORKERS', 8))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            lookups = list(executor.map(self._resolve_title, titles))
+
+        results = []
+        movies = []
+        for title, (movie_data, error) in zip(titles, lookups):
+            if movie_data:
+                movies.append({"name": movie_data['title'], "year": movie_data['year'],
+                               "rating": movie_data['rating'], "imdb_id": movie_data.get('imdb_id')})
+                results.append({"title": title, "status": "success", "name": movie_data['title']})
+            else:
+                results.append({"title": title, "status": "error", "error": error})
+
+        clear_cached()
+        if movies and not self.data_manager.add_movies(movies, user_id):
+            for result in results:
+                if result["status"] == "success":
+                    result.update(status="error", error="Could not save movie")
+        elif movies:
+            self._index_titles(movie["name"] for movie in movies)
+
+        elapsed = time.perf_counter() - started
+        imported = sum(1 for result in results if result["status"] == "success")
+        return {
+            "results": results,
+            "imported": imported,
+            "failed": len(results) - imported,
+            "seconds": round(elapsed, 3),
+            "titles_per_second": round(len(titles) / elapsed, 2) if elapsed else None,
+        }
+
+    def link_catalog(self, batch_size=100):
+        """
+        Link existing movies to the shared catalog, looking up each distinct title once.
+        Returns (linked movies, titles that could not be resolved).
+        """
+        linked, unresolved = 0, []
+        after_name = None
+        while True:
+            titles = self.data_manager.get_unlinked_titles(after_name=after_name, limit=batch_size)
+            if not titles:
+                break
+            for title in titles:
+                movie_data, error = self._resolve_title(title)
+                if movie_data and movie_data.get('imdb_id'):
+                    linked += self.data_manager.link_movies(title, movie_data['imdb_id'])
+                else:
+                    unresolved.append(title)
+            after_name = titles[-1]
+        return linked, unresolved
+
+    def _resolve_title(self, title):
+        # Look up one title, returning (movie_data, error message)
+        try:
+            return self.omdb_api_service.fetch_movie_data(title), None
+        except (ValueError, TypeError, ConnectionError) as e:
+            return None, str(e)
 
     def update_movie(self, movie_id, new_name=None, new_year=None, new_rating=None):
         """
         Update movie details in the database, fetching updated data from OMDb API if necessary.
         If new_year or new_rating is None, it will take the values from the OMDb API or fallback to the existing database values.
         """
-        existing_movie = self.data_manager.get_movie(movie_id)
+        existing_movie = self.get_movie(movie_id)
         if not existing_movie:
             raise NotFoundErr(f"Movie with ID {movie_id} does not exist in the database.")
 
         movie_data = None
         if new_name:
+            # Served from the shared catalog when any user already has this film
             movie_data = self.omdb_api_service.fetch_movie_data(new_name)
             if movie_data:
                 new_name = movie_data.get('title', new_name)
@@ -82,25 +215,124 @@ class MovieService:
         new_year = new_year or (movie_data.get('year') if movie_data else existing_movie['year'])
         new_rating = new_rating or (movie_data.get('rating') if movie_data else existing_movie['rating'])
 
-        self.data_manager.update_movie(movie_id, new_name, new_year, new_rating)
+        clear_cached()
+        self.data_manager.update_movie(movie_id, new_name, new_year, new_rating,
+                                       movie_data.get('imdb_id') if movie_data else None)
+        if new_name:
+            self._index_titles([new_name])
+        if self.recommender is not None:
+            self.recommender.mark_changed([existing_movie['name'], new_name])
         logging.info(f"Movie with ID {movie_id} successfully updated.")
 
+    def _index_titles(self, titles):
+        titles = list(titles)
+        if self.title_autocomplete is not None:
+            for title in titles:
+                self.title_autocomplete.add(title)
+        if self.recommender is not None:
+            self.recommender.mark_changed(titles)
+
+    def recommend_movies(self, user_id, movies, limit=5):
+        """Titles liked by the users who liked the given movies of this user, which the user does not have."""
+        if self.recommender is None:
+            return []
+        return self.recommender.recommend(user_id, movies, limit)
+
+    def get_recommendations_version(self):
+        """(version, updated_at) of the similar titles recommend_movies reads, like get_versions."""
+        if self.recommender is None:
+            return 0, None
+        return self.recommender.version()
+
+    def rebuild_recommendations(self):
+        """Recompute the similar titles of every title; returns the number of titles."""
+        return self.recommender.rebuild()
+
+    def suggest_titles(self, query, limit=10):
+        """
+        Titles starting with or resembling `query`, most common first, from the autocomplete index.
+        Returns None while the index is not available yet.
+        """
+        if self.title_autocomplete is None:
+            return None
+        return self.title_autocomplete.search(query, limit)
+
     def delete_movie(self, movie_id):
         """Delete a movie from the database."""
+        movie = self.get_movie(movie_id)
+        clear_cached()
         self.data_manager.delete_movie(movie_id)
+        if movie and self.recommender is not None:
+            self.recommender.mark_changed([movie['name']])
 
     def get_user(self, user_id):
-        """Fetch a user by their ID."""
-        return self.data_manager.get_user(user_id)
+        """Fetch a user by their ID, at most once per request."""
+        return get_cached(('user', user_id), lambda: self.data_manager.get_user(user_id))
+
+    def get_user_with_movie_count(self, user_id):
+        """Fetch a user by their ID together with their movie count, at most once per request."""
+        user = get_cached(('user_with_count', user_id),
+                          lambda: self.data_manager.get_user_with_movie_count(user_id))
+        if user:
+            set_cached(('user', user_id), user)
+        return user
 
     def get_movie(self, movie_id):
-        """Fetch a movie by its ID."""
-        return self.data_manager.get_movie(movie_id)
+        """Fetch a movie by its ID, at most once per request."""
+        return get_cached(('movie', movie_id), lambda: self.data_manager.get_movie(movie_id))
+
+    def get_user_movie(self, user_id, movie_id):
+        """Fetch a movie by its ID if it belongs to the given user, at most once per request."""
+        movie = get_cached(('user_movie', user_id, movie_id),
+                           lambda: self.data_manager.get_user_movie(user_id, movie_id))
+        if movie:
+            set_cached(('movie', movie_id), movie)
+        return movie
+
+    def get_user_favorites(self, user_ids=None):
+        """Fetch each user's highest rated movie, optionally for the given users only."""
+        return self.data_manager.get_user_favorites(user_ids)
+
+    def iter_movies(self, user_id=None, batch_size=1000):
+        """Iterate over every stored movie, or one user's, in ID order without loading them all."""
+        return self.data_manager.iter_movies(user_id=user_id, batch_size=batch_size)
+
+    def search_movies(self, query, user_id=None, limit=20):
+        """Search stored movies by title, across all users or within one user's list."""
+        return self.data_manager.search_movies(query, user_id=user_id, limit=limit)
 
     def get_user_movies(self, user_id):
-        """Fetch all movies associated with a specific user, sorted by movie ID."""
+        """Fetch all movies associated with a specific user, newest first."""
+        if not self.get_user(user_id):
+            raise NotFoundErr(f"user not found: {user_id}")
+
+        return self.data_manager.get_user_movies(user_id)
+
+    def get_user_movies_page(self, user_id, after_id=None, before_id=None, limit=DEFAULT_PAGE_SIZE):
+        """Fetch one keyset page of a user's movies, newest first."""
         if not self.get_user(user_id):
             raise NotFoundErr(f"user not found: {user_id}")
 
-        movies = self.data_manager.get_user_movies(user_id)
-        return sorted(movies, key=lambda x: x['id'], reverse=True)
+        movies = self.data_manager.get_user_movies(user_id, after_id=after_id, before_id=before_id, limit=limit + 1)
+        return self._page(movies, after_id, before_id, limit)
+
+    @staticmethod
+    def _page(items, after_id, before_id, limit):
+        """
+        Trim a result fetched with limit + 1 rows to one page and work out its cursors.
+        next_after_id continues after the last item, prev_before_id goes back before the first.
+        """
+        has_more = len(items) > limit
+        if before_id is not None:
+            # Walking backwards: the extra row sits before the page
+            items = items[-limit:] if has_more else items
+            has_prev, has_next = has_more, True
+        else:
+            items = items[:limit]
+            has_prev, has_next = after_id is not None, has_more
+        return {
+            "items": items,
+            "limit": limit,
+            "next_after_id": items[-1]["id"] if has_next and items else None,
+            "prev_before_id": items[0]["id"] if has_prev and items else None,
+        }
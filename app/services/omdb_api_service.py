@@ -1,34 +1,53 @@
-import os
+import time
 
-import requests
-from dotenv import load_dotenv
+from app.external_apis.omdb_api import OMDbAPI, MovieNotFoundError
+from app.metrics import metrics
 
 
 class OMDbAPIService:
-    API_URL = "http://www.omdbapi.com/"
-
-    def __init__(self):
-        load_dotenv()
-        self.API_KEY = os.getenv('API_KEY')
-        if not self.API_KEY:
-            raise Exception("Movie API Key not found in environment variables.")
+    def __init__(self, client=None, cache=None, catalog=None):
+        """
+        catalog is the data manager holding the shared movie catalog: films already in it
+        are served from there, and every film fetched from OMDb is added to it.
+        """
+        self.client = client or OMDbAPI()
+        self.cache = cache
+        self.catalog = catalog
 
     def fetch_movie_data(self, title):
-        """Fetch movie data from OMDb API."""
-        url = f'{self.API_URL}?apikey={self.API_KEY}&t={title}'
-        response = requests.get(url)
-
-        if response.status_code != 200:
-            raise ConnectionError("Failed to connect to OMDb API")
-
-        data = response.json()
-        if data.get('Response') == 'False':
-            raise ValueError("Movie not found")
-
-        return {
-            'title': data.get('Title'),
-            'year': int(data.get('Year')),
-            'rating': float(data.get('imdbRating')),
-            'poster': data.get('Poster')
-        }
-
+        """Fetch movie data from the cache or the catalog, falling back to the OMDb API."""
+        if self.cache is None:
+            return self._fetch_and_catalog(title)
+
+        cached = self.cache.get(title)
+        if cached is self.cache.NOT_FOUND:
+            raise MovieNotFoundError("Movie not found")
+        # Lookups cached before the catalog existed carry no IMDb id; fetch those again
+        if cached is not None and 'imdb_id' in cached:
+            return cached
+
+        try:
+            movie_data = self._fetch_and_catalog(title)
+        except MovieNotFoundError:
+            self.cache.put_not_found(title)
+            raise
+        self.cache.put(title, movie_data)
+        return movie_data
+
+    def _fetch_and_catalog(self, title):
+        if self.catalog is None:
+            return self._fetch(title)
+        # Catalog entries are trusted as long as cached lookups are
+        fetched_after = time.time() - self.cache.ttl if self.cache is not None else 0
+        movie_data = self.catalog.get_catalog_entry(title, fetched_after)
+        if movie_data is not None:
+            return movie_data
+        movie_data = self._fetch(title)
+        if not self.catalog.save_catalog_entry(movie_data):
+            # Never link movies to an entry that is not there
+            movie_data = dict(movie_data, imdb_id=None)
+        return movie_data
+
+    def _fetch(self, title):
+        with metrics.time_omdb():
+            return self.client.fetch_movie_data(title)
@@ -0,0 +1,157 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import text
+
+from app.model.data_model import OMDbCacheEntry, normalize_title
+
+
+class OMDbCache:
+    """
+    Cache for OMDb lookups keyed on the normalized title.
+
+    Entries live in an in-process LRU and are written through to the
+    `omdb_cache` table so they survive restarts. "Movie not found" answers
+    are cached too, with their own (usually shorter) TTL.
+    """
+
+    # Sentinel returned by get() for cached negative answers
+    NOT_FOUND = object()
+
+    def __init__(self, session_factory, max_size=None, ttl=None, negative_ttl=None, max_rows=None):
+        self.Session = session_factory
+        self.max_size = int(max_size or os.getenv('OMDB_CACHE_SIZE', 1024))
+        self.ttl = int(ttl or os.getenv('OMDB_CACHE_TTL', 7 * 24 * 3600))
+        self.negative_ttl = int(negative_ttl or os.getenv('OMDB_CACHE_NEGATIVE_TTL', 24 * 3600))
+        self.max_rows = int(max_rows or os.getenv('OMDB_CACHE_MAX_ROWS', 100000))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+
+    # 'The Matrix' and ' the  matrix' share an entry
+    normalize = staticmethod(normalize_title)
+
+    def get(self, title):
+        """Return the cached movie data, NOT_FOUND for a cached negative answer, or None on a miss."""
+        key = self.normalize(title)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        entry = self._load(key, now)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, *entry)
+        return entry[0]
+
+    def put(self, title, movie_data):
+        """Cache a successful lookup."""
+        self._store(self.normalize(title), movie_data, self.ttl)
+
+    def put_not_found(self, title):
+        """Cache a "Movie not found" answer."""
+        self._store(self.normalize(title), self.NOT_FOUND, self.negative_ttl)
+
+    def stats(self):
+        """Return the hit/miss counters and the current in-memory size."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "size": len(self._entries),
+            }
+
+    def _remember(self, key, value, expires_at):
+        # Caller holds the lock
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _store(self, key, value, ttl):
+        fetched_at = time.time()
+        with self._lock:
+            self._remember(key, value, fetched_at + ttl)
+            self._writes += 1
+            prune = self._writes % 100 == 0
+
+        session = self.Session()
+        try:
+            # An upsert rather than session.merge(), which reads the row first
+            session.execute(text(
+                "INSERT INTO omdb_cache (title_key, payload, found, fetched_at) "
+                "VALUES (:title_key, :payload, :found, :fetched_at) "
+                "ON CONFLICT (title_key) DO UPDATE SET payload = excluded.payload, found = excluded.found, "
+                "fetched_at = excluded.fetched_at"
+            ), {
+                "title_key": key,
+                "payload": None if value is self.NOT_FOUND else json.dumps(value),
+                "found": value is not self.NOT_FOUND,
+                "fetched_at": fetched_at,
+            })
+            session.commit()
+            if prune:
+                self._prune(session, fetched_at)
+        except Exception as e:
+            session.rollback()
+            logging.error(f"Error writing OMDb cache entry '{key}': {e}")
+        finally:
+            session.close()
+
+    def _load(self, key, now):
+        # Read an entry from the persistent table, ignoring expired rows
+        session = self.Session()
+        try:
+            row = session.get(OMDbCacheEntry, key)
+            if row is None:
+                return None
+            ttl = self.ttl if row.found else self.negative_ttl
+            expires_at = row.fetched_at + ttl
+            if expires_at <= now:
+                return None
+            value = json.loads(row.payload) if row.found else self.NOT_FOUND
+            return value, expires_at
+        except Exception as e:
+            logging.error(f"Error reading OMDb cache entry '{key}': {e}")
+            return None
+        finally:
+            session.close()
+
+    def _prune(self, session, now):
+        # Drop expired rows and keep the table under max_rows
+        session.query(OMDbCacheEntry).filter(
+            OMDbCacheEntry.found.is_(True), OMDbCacheEntry.fetched_at < now - self.ttl
+        ).delete(synchronize_session=False)
+        session.query(OMDbCacheEntry).filter(
+            OMDbCacheEntry.found.is_(False), OMDbCacheEntry.fetched_at < now - self.negative_ttl
+        ).delete(synchronize_session=False)
+        overflow = session.query(OMDbCacheEntry).count() - self.max_rows
+        if overflow > 0:
+            oldest = (
+                session.query(OMDbCacheEntry.title_key)
+                .order_by(OMDbCacheEntry.fetched_at)
+                .limit(overflow)
+                .subquery()
+            )
+            session.query(OMDbCacheEntry).filter(
+                OMDbCacheEntry.title_key.in_(oldest.select())
+            ).delete(synchronize_session=False)
+        session.commit()
@@ -0,0 +1,246 @@
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import requests
+
+try:
+    from PIL import Image
+except ImportError:  # Optional: without Pillow the original posters are cached as they are
+    Image = None
+
+# File extensions of the image formats a poster may be stored in, by their leading bytes
+IMAGE_SIGNATURES = {
+    b'\xff\xd8\xff': '.jpg',
+    b'\x89PNG\r\n\x1a\n': '.png',
+    b'GIF87a': '.gif',
+    b'GIF89a': '.gif',
+}
+MIME_TYPES = {'.jpg': 'image/jpeg', '.png': 'image/png', '.gif': 'image/gif'}
+
+
+def has_poster(url):
+    # OMDb answers 'N/A' for films without a poster
+    return (url or '').startswith(('http://', 'https://'))
+
+
+def image_extension(data):
+    """File extension of the image format of `data`, or None if it is not a supported image."""
+    for signature, extension in IMAGE_SIGNATURES.items():
+        if data.startswith(signature):
+            return extension
+    return None
+
+
+class PosterCache:
+    """
+    Local thumbnails of the catalog's OMDb posters, so pages never hotlink the originals.
+
+    Each poster is downloaded once on a background thread pool and resized to `width`
+    pixels (with Pillow, when installed). Thumbnails are content-addressed: the file
+    name is the SHA-256 of the image, recorded on the catalog entry, so a file never
+    changes once written. The directory is capped at `max_bytes`, evicting the least
+    recently served thumbnails; an evicted poster is downloaded again on its next view.
+    """
+
+    # Posters larger than this are not downloaded
+    MAX_DOWNLOAD_BYTES = 5 * 1024 * 1024
+
+    def __init__(self, data_manager, directory=None, max_bytes=None, width=None, max_workers=None,
+                 retry_after=None):
+        self.data_manager = data_manager
+        self.directory = directory or os.getenv('POSTER_CACHE_DIR', os.path.join('data', 'posters'))
+        self.max_bytes = int(max_bytes or os.getenv('POSTER_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+        self.width = int(width or os.getenv('POSTER_WIDTH', 160))
+        # Seconds before a poster that failed to download is tried again
+        self.retry_after = float(retry_after if retry_after is not None else os.getenv('POSTER_RETRY_AFTER', 600))
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(max_workers or os.getenv('POSTER_WORKERS', 2)),
+            thread_name_prefix='poster-cache',
+        )
+        self._http = requests.Session()
+        self._lock = threading.Lock()
+        # IMDb id -> Future of the thumbnail being generated, so concurrent requests share one download
+        self._pending = {}
+        # IMDb id -> time of its last failed download
+        self._failures = {}
+        # File name -> size of every cached thumbnail, least recently served first; loaded on first use
+        self._files = None
+        self._size = 0
+
+    def path(self, file_name):
+        """Location of a thumbnail, sharded by the first two characters of its digest."""
+        return os.path.join(self.directory, file_name[:2], file_name)
+
+    @staticmethod
+    def mimetype(file_name):
+        return MIME_TYPES.get(os.path.splitext(file_name)[1], 'application/octet-stream')
+
+    def prefetch(self, movies):
+        """Queue the thumbnails missing for these movies; returns immediately."""
+        for movie in movies:
+            if (movie.get("imdb_id") and has_poster(movie.get("poster"))
+                    and not self._is_cached(movie.get("poster_thumbnail"))):
+                self.submit(movie["imdb_id"])
+
+    def submit(self, imdb_id):
+        """Future of the thumbnail's file name, or of None if the film has no usable poster."""
+        with self._lock:
+            future = self._pending.get(imdb_id)
+            if future is not None:
+                return future
+            future = self._executor.submit(self._generate, imdb_id)
+            self._pending[imdb_id] = future
+        # Outside the lock: the callback runs right away if the thumbnail is already done
+        future.add_done_callback(lambda done: self._done(imdb_id, done))
+        return future
+
+    def get(self, imdb_id, timeout):
+        """
+        File name of a film's poster thumbnail, waiting up to `timeout` seconds for it
+        to be generated; None if the film has no poster or it is not ready in time.
+        """
+        poster = self.data_manager.get_poster(imdb_id)
+        if poster is None:
+            return None
+        if self._is_cached(poster["poster_thumbnail"]):
+            self._touch(poster["poster_thumbnail"])
+            return poster["poster_thumbnail"]
+        try:
+            return self.submit(imdb_id).result(timeout)
+        except TimeoutError:
+            return None
+
+    def stats(self):
+        """Number and total size of the cached thumbnails, and downloads in flight."""
+        with self._lock:
+            self._load()
+            return {"files": len(self._files), "bytes": self._size, "max_bytes": self.max_bytes,
+                    "pending": len(self._pending)}
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+        self._http.close()
+
+    def _done(self, imdb_id, future):
+        with self._lock:
+            if self._pending.get(imdb_id) is future:
+                del self._pending[imdb_id]
+
+    def _is_cached(self, file_name):
+        if not file_name:
+            return False
+        with self._lock:
+            self._load()
+            if file_name in self._files:
+                return True
+        # Another process may have written it
+        return os.path.exists(self.path(file_name))
+
+    def _generate(self, imdb_id):
+        failed_at = self._failures.get(imdb_id)
+        if failed_at is not None and time.monotonic() - failed_at < self.retry_after:
+            return None
+        poster = self.data_manager.get_poster(imdb_id)
+        if poster is None or not has_poster(poster["poster"]):
+            return None
+        if self._is_cached(poster["poster_thumbnail"]):
+            return poster["poster_thumbnail"]
+        try:
+            thumbnail, extension = self._thumbnail(self._download(poster["poster"]))
+        except Exception as e:
+            logging.warning(f"Could not cache the poster of {imdb_id}: {e}")
+            self._failures[imdb_id] = time.monotonic()
+            return None
+
+        file_name = hashlib.sha256(thumbnail).hexdigest() + extension
+        self._store(file_name, thumbnail)
+        self.data_manager.set_poster_thumbnail(imdb_id, file_name)
+        self._failures.pop(imdb_id, None)
+        return file_name
+
+    def _download(self, url):
+        with self._http.get(url, timeout=(3.05, 10), stream=True) as response:
+            response.raise_for_status()
+            data = bytearray()
+            for chunk in response.iter_content(64 * 1024):
+                data += chunk
+                if len(data) > self.MAX_DOWNLOAD_BYTES:
+                    raise ValueError(f"poster is larger than {self.MAX_DOWNLOAD_BYTES} bytes")
+        return bytes(data)
+
+    def _thumbnail(self, data):
+        # Resized JPEG thumbnail of the poster and its file extension
+        extension = image_extension(data)
+        if extension is None:
+            raise ValueError("poster is not a JPEG, PNG or GIF image")
+        if Image is None:
+            return data, extension
+        with Image.open(io.BytesIO(data)) as image:
+            if image.width <= self.width and extension == '.jpg':
+                return data, extension
+            image = image.convert('RGB')
+            if image.width > self.width:
+                height = max(1, round(image.height * self.width / image.width))
+                image = image.resize((self.width, height), Image.LANCZOS)
+            output = io.BytesIO()
+            image.save(output, 'JPEG', quality=85, optimize=True, progressive=True)
+        return output.getvalue(), '.jpg'
+
+    def _store(self, file_name, data):
+        path = self.path(file_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written under a temporary name so that readers never see a partial file
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary, 'wb') as file:
+            file.write(data)
+        os.replace(temporary, path)
+        with self._lock:
+            self._load()
+            if file_name not in self._files:
+                self._files[file_name] = len(data)
+                self._size += len(data)
+            self._files.move_to_end(file_name)
+            self._evict()
+
+    def _touch(self, file_name):
+        with self._lock:
+            if file_name in self._files:
+                self._files.move_to_end(file_name)
+        # The modification time carries the LRU order over restarts
+        try:
+            os.utime(self.path(file_name))
+        except OSError:
+            pass
+
+    def _load(self):
+        # Index the thumbnails already on disk, oldest first; called with the lock held
+        if self._files is not None:
+            return
+        files = []
+        if os.path.isdir(self.directory):
+            for root, _, names in os.walk(self.directory):
+                for name in names:
+                    if name.endswith('.tmp'):
+                        continue
+                    stat = os.stat(os.path.join(root, name))
+                    files.append((stat.st_mtime, name, stat.st_size))
+        files.sort()
+        self._files = OrderedDict((name, size) for _, name, size in files)
+        self._size = sum(self._files.values())
+        self._evict()
+
+    def _evict(self):
+        # Remove the least recently served thumbnails until the directory fits max_bytes; called with the lock held
+        while self._size > self.max_bytes and len(self._files) > 1:
+            file_name, size = self._files.popitem(last=False)
+            self._size -= size
+            try:
+                os.remove(self.path(file_name))
+            except OSError:
+                pass
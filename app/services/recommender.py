@@ -0,0 +1,394 @@
+import heapq
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within one process
+    fcntl = None
+
+from app.model.data_model import MOVIE_RESOLVED, normalize_title
+
+MAGIC = b'MWRC'
+VERSION = 1
+# Magic, version, number of titles, neighbours per title
+HEADER = struct.Struct('<4sIII')
+
+
+def _csr(rows, columns, values, size):
+    """Group (row, column, value) triplets by row, as compressed sparse row arrays (pointers, columns, values)."""
+    pointers = array('i', bytes(4 * (size + 1)))
+    for row in rows:
+        pointers[row + 1] += 1
+    for row in range(size):
+        pointers[row + 1] += pointers[row]
+    out_columns = array('i', bytes(4 * len(rows)))
+    out_values = array('f', bytes(4 * len(rows)))
+    free = pointers[:-1]
+    for row, column, value in zip(rows, columns, values):
+        slot = free[row]
+        out_columns[slot] = column
+        out_values[slot] = value
+        free[row] = slot + 1
+    return pointers, out_columns, out_values
+
+
+def rating_matrix(ratings, max_user_items):
+    """
+    Sparse user x title matrix of the ratings, centred on each user's mean rating so that
+    "liked" means rated above that user's average. Returns the titles, the matrix by user
+    (CSR) and by title (CSC, i.e. the CSR of the transpose). Users keep their
+    max_user_items most opinionated ratings, which bounds the cost of the similarity pass.
+    """
+    title_ids = {}
+    titles = []
+    user_ids = {}
+    users, items, values = array('i'), array('i'), array('f')
+    for user_id, title, rating in ratings:
+        key = normalize_title(title)
+        item = title_ids.get(key)
+        if item is None:
+            item = title_ids[key] = len(titles)
+            titles.append(title)
+        users.append(user_ids.setdefault(user_id, len(user_ids)))
+        items.append(item)
+        values.append(rating)
+
+    pointers, user_items, user_values = _csr(users, items, values, len(user_ids))
+    users, items, values = array('i'), array('i'), array('f')
+    for user in range(len(user_ids)):
+        start, end = pointers[user], pointers[user + 1]
+        if end - start < 2:
+            # A single rating says nothing about what else the user likes
+            continue
+        mean = sum(user_values[start:end]) / (end - start)
+        centred = [(item, rating - mean) for item, rating in zip(user_items[start:end], user_values[start:end])
+                   if rating != mean]
+        if len(centred) > max_user_items:
+            centred = heapq.nlargest(max_user_items, centred, key=lambda entry: abs(entry[1]))
+        for item, value in centred:
+            users.append(user)
+            items.append(item)
+            values.append(value)
+    by_user = _csr(users, items, values, len(user_ids))
+    by_title = _csr(items, users, values, len(titles))
+    return titles, by_user, by_title
+
+
+def compute_similarities(ratings, k, max_user_items, only=None, norm_of=None, shrinkage=5):
+    """
+    Top-k item-item cosine similarities of the centred rating matrix, one title at a time
+    (a row of X^T X per title), so memory stays at the size of the sparse matrix. Scores
+    are shrunk by n / (n + shrinkage) for n common users, so that titles sharing a single
+    user do not look identical.
+
+    Returns (titles, norms, rows) where rows maps a title id to its [(title id, score)]
+    neighbours, best first. `only` restricts the computation to those title keys, and
+    `norm_of(title)` may supply norms computed over more ratings than `ratings` holds.
+    """
+    titles, (user_pointers, user_items, user_values), (title_pointers, title_users, title_values) = \
+        rating_matrix(ratings, max_user_items)
+    norms = array('f', (math.sqrt(sum(value * value for value in title_values[title_pointers[item]:
+                                                                                 title_pointers[item + 1]]))
+                        for item in range(len(titles))))
+    if norm_of is not None:
+        for item, title in enumerate(titles):
+            norms[item] = norm_of(title) or norms[item]
+
+    wanted = range(len(titles)) if only is None else [
+        item for item, title in enumerate(titles) if normalize_title(title) in only
+    ]
+    rows = {}
+    for item in wanted:
+        if not norms[item]:
+            rows[item] = []
+            continue
+        dots = defaultdict(float)
+        common = defaultdict(int)
+        for user, value in zip(title_users[title_pointers[item]:title_pointers[item + 1]],
+                               title_values[title_pointers[item]:title_pointers[item + 1]]):
+            start, end = user_pointers[user], user_pointers[user + 1]
+            for other, other_value in zip(user_items[start:end], user_values[start:end]):
+                dots[other] += value * other_value
+                common[other] += 1
+        dots.pop(item, None)
+        # Norms supplied by norm_of may predate these ratings, hence the bound
+        scored = ((min(1.0, dot / (norms[item] * norms[other])) * common[other] / (common[other] + shrinkage),
+                   other) for other, dot in dots.items() if dot > 0 and norms[other])
+        rows[item] = [(other, score) for score, other in heapq.nlargest(k, scored)]
+    return titles, norms, rows
+
+
+def write_similarities(path, titles, norms, neighbours, scores, k):
+    """
+    Write item-item similarities as one flat file that SimilarityIndex memory-maps: the
+    header, the title norms, k neighbour ids and k scores per title (padded with -1 and 0),
+    the title ids in title order, and the titles as offsets into a UTF-8 blob.
+    """
+    order = array('i', sorted(range(len(titles)), key=lambda item: normalize_title(titles[item])))
+    encoded = [title.encode() for title in titles]
+    offsets = array('I', [0])
+    for title in encoded:
+        offsets.append(offsets[-1] + len(title))
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # Written under a temporary name so that processes mapping the old file never see a partial one
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(titles), k))
+        for part in (norms, neighbours, scores, order, offsets):
+            part.tofile(file)
+        file.write(b''.join(encoded))
+    os.replace(temporary, path)
+
+
+class SimilarityIndex:
+    """Read-only view of a file written by write_similarities, memory-mapped rather than loaded."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.size, self.k = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} similarity file")
+        view = memoryview(self._mmap)
+        offset = HEADER.size
+        parts = []
+        for typecode, count in (('f', self.size), ('i', self.size * self.k), ('f', self.size * self.k),
+                                ('i', self.size), ('I', self.size + 1)):
+            parts.append(view[offset:offset + 4 * count].cast(typecode))
+            offset += 4 * count
+        self.norms, self.neighbours, self.scores, self._order, self._offsets = parts
+        self._titles_offset = offset
+
+    def title(self, item):
+        start = self._titles_offset + self._offsets[item]
+        return self._mmap[start:start + self._offsets[item + 1] - self._offsets[item]].decode()
+
+    def find(self, title):
+        """Id of a title, ignoring case and spacing, or None."""
+        key = normalize_title(title)
+        position = bisect_left(self._order, key, key=lambda item: normalize_title(self.title(item)))
+        if position < self.size and normalize_title(self.title(self._order[position])) == key:
+            return self._order[position]
+        return None
+
+    def similar(self, item):
+        """[(title id, score)] of the title's neighbours, best first: k reads from the mapped file."""
+        start = item * self.k
+        return [(other, score) for other, score in zip(self.neighbours[start:start + self.k],
+                                                       self.scores[start:start + self.k]) if other >= 0]
+
+    def arrays(self):
+        """Writable copies of the titles, norms, neighbours and scores, to build an updated file from."""
+        return ([self.title(item) for item in range(self.size)], array('f', self.norms),
+                array('i', self.neighbours), array('f', self.scores))
+
+
+class Recommender:
+    """
+    "Users who liked this also liked" suggestions from precomputed item-item similarities.
+
+    `rebuild` computes the top-K similar titles of every title from the whole movies table
+    and writes them to RECOMMENDATIONS_FILE, which every process memory-maps, so a user page
+    only reads K neighbours per movie shown. Titles whose ratings change are queued by
+    `mark_changed` and their rows recomputed on a background thread from the ratings of
+    the users who have them. Each process only queues its own changes, so writers take a
+    lock file and apply their rows to the latest file rather than to the one they mapped.
+    """
+
+    def __init__(self, data_manager, path=None, k=None, max_user_items=None, refresh_interval=None,
+                 max_raters=None):
+        self.data_manager = data_manager
+        self.path = path or os.getenv('RECOMMENDATIONS_FILE', os.path.join('data', 'recommendations.bin'))
+        self.k = int(k or os.getenv('RECOMMENDATIONS_K', 20))
+        self.max_user_items = int(max_user_items or os.getenv('RECOMMENDATIONS_MAX_USER_ITEMS', 200))
+        # Seconds changed titles are collected before their rows are recomputed
+        self.refresh_interval = float(refresh_interval if refresh_interval is not None
+                                      else os.getenv('RECOMMENDATIONS_REFRESH_SECONDS', 30))
+        # Users whose ratings are read to recompute a changed title
+        self.max_raters = int(max_raters or os.getenv('RECOMMENDATIONS_MAX_RATERS', 5000))
+        self._lock = threading.Lock()
+        self._write_mutex = threading.Lock()
+        self._index = None
+        self._file_stat = None
+        self._checked_at = 0
+        self._dirty = set()
+        self._refreshing = False
+
+    def index(self):
+        """The mapped similarity file, remapped when another process has replaced it; None if there is none."""
+        now = time.monotonic()
+        if now - self._checked_at < 1:
+            return self._index
+        self._checked_at = now
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._index = self._file_stat = None
+            return None
+        file_stat = (stat.st_ino, stat.st_mtime_ns)
+        if file_stat != self._file_stat:
+            try:
+                self._index = SimilarityIndex(self.path)
+                self._file_stat = file_stat
+            except (OSError, ValueError) as e:
+                logging.error(f"Error loading recommendations from {self.path}: {e}")
+                self._index = None
+        return self._index
+
+    def version(self):
+        """(version, updated_at) of the file in use; it changes whenever the file is rewritten."""
+        self.index()
+        file_stat = self._file_stat
+        if file_stat is None:
+            return 0, None
+        inode, mtime_ns = file_stat
+        return f"{inode}-{mtime_ns}", mtime_ns / 1e9
+
+    @contextmanager
+    def _write_lock(self):
+        # Held while a process reads the file, updates it and replaces it
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with self._write_mutex, open(f"{self.path}.lock", 'a') as file:
+            if fcntl:
+                fcntl.flock(file, fcntl.LOCK_EX)
+            yield
+
+    def recommend(self, user_id, movies, limit=5):
+        """
+        Titles similar to the given movies of the user that they rated above their average,
+        excluding titles the user already has; most similar first.
+        """
+        index = self.index()
+        rated = [movie for movie in movies if movie.get("status", MOVIE_RESOLVED) == MOVIE_RESOLVED]
+        if index is None or not rated:
+            return []
+        average = sum(movie["rating"] for movie in rated) / len(rated)
+        scores = defaultdict(float)
+        for movie in rated:
+            if movie["rating"] < average:
+                continue
+            item = index.find(movie["name"])
+            if item is not None:
+                for other, score in index.similar(item):
+                    scores[other] += score
+
+        # The best neighbours are often other movies of the same user, so look past them
+        shown = {normalize_title(movie["name"]) for movie in movies}
+        candidates = [index.title(item) for item in heapq.nlargest(limit * 10, scores, key=scores.__getitem__)]
+        candidates = [title for title in candidates if normalize_title(title) not in shown]
+        owned = self.data_manager.get_user_titles(user_id, candidates) if candidates else set()
+        return [title for title in candidates if title.lower() not in owned][:limit]
+
+    def rebuild(self):
+        """Recompute every title's neighbours from the movies table; returns the number of titles."""
+        started = time.perf_counter()
+        ratings = ((movie["user_id"], movie["name"], movie["rating"])
+                   for movie in self.data_manager.iter_movies(batch_size=10000)
+                   if movie["status"] == MOVIE_RESOLVED)
+        # Refreshes wait for the rebuild, so none of them is overwritten by ratings read before it
+        with self._write_lock():
+            titles, norms, rows = compute_similarities(ratings, self.k, self.max_user_items)
+            neighbours, scores = self._flatten(rows, len(titles))
+            write_similarities(self.path, titles, norms, neighbours, scores, self.k)
+        self._checked_at = 0
+        logging.info(f"Computed recommendations for {len(titles)} titles "
+                     f"in {time.perf_counter() - started:.1f}s.")
+        return len(titles)
+
+    def mark_changed(self, titles):
+        """Queue titles whose ratings changed; their rows are recomputed in the background."""
+        with self._lock:
+            self._dirty.update(normalize_title(title) for title in titles if title)
+            if self._refreshing or not self._dirty:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh_loop, name='recommender', daemon=True).start()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            with self._lock:
+                dirty, self._dirty = self._dirty, set()
+                if not dirty:
+                    self._refreshing = False
+                    return
+            try:
+                self.refresh(dirty)
+            except Exception as e:
+                logging.error(f"Error refreshing recommendations: {e}")
+
+    def refresh(self, keys):
+        """
+        Recompute the rows of the given title keys and rewrite the file; titles new to it are
+        appended, titles nobody has any more lose their neighbours.
+        """
+        with self._write_lock():
+            # Another process may have replaced the file since it was last checked
+            self._checked_at = 0
+            index = self.index()
+            if index is None:
+                # Nothing to update until the first `flask build-recommendations`
+                return 0
+            return self._refresh(index, set(keys))
+
+    def _refresh(self, index, keys):
+        ratings = self.data_manager.get_rater_ratings(list(keys), self.max_raters)
+
+        def norm_of(title):
+            item = index.find(title)
+            return index.norms[item] if item is not None and normalize_title(title) not in keys else None
+
+        local_titles, local_norms, local_rows = compute_similarities(ratings, self.k, self.max_user_items,
+                                                                     only=keys, norm_of=norm_of)
+        titles, norms, neighbours, scores = index.arrays()
+        ids = {}
+
+        def item_of(local_item):
+            # Id of a locally computed title in the file, appending titles the file does not have yet
+            if local_item not in ids:
+                title = local_titles[local_item]
+                item = index.find(title)
+                if item is None:
+                    item = len(titles)
+                    titles.append(title)
+                    norms.append(local_norms[local_item])
+                    neighbours.extend([-1] * self.k)
+                    scores.extend([0.0] * self.k)
+                ids[local_item] = item
+            return ids[local_item]
+
+        for key in keys - {normalize_title(title) for title in local_titles}:
+            item = index.find(key)
+            if item is not None:
+                neighbours[item * self.k:(item + 1) * self.k] = array('i', [-1]) * self.k
+                scores[item * self.k:(item + 1) * self.k] = array('f', [0.0]) * self.k
+        for local_item, row in local_rows.items():
+            item = item_of(local_item)
+            norms[item] = local_norms[local_item]
+            start = item * self.k
+            for slot in range(self.k):
+                other, score = (item_of(row[slot][0]), row[slot][1]) if slot < len(row) else (-1, 0.0)
+                neighbours[start + slot] = other
+                scores[start + slot] = score
+        write_similarities(self.path, titles, norms, neighbours, scores, self.k)
+        self._checked_at = 0
+        return len(local_rows)
+
+    def _flatten(self, rows, size):
+        neighbours = array('i', [-1]) * (size * self.k)
+        scores = array('f', [0.0]) * (size * self.k)
+        for item, row in rows.items():
+            for slot, (other, score) in enumerate(row):
+                neighbours[item * self.k + slot] = other
+                scores[item * self.k + slot] = score
+        return neighbours, scores
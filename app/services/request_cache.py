@@ -0,0 +1,26 @@
+from flask import g, has_request_context
+
+
+def get_cached(key, loader):
+    """
+    Return the entity stored under `key` for the current request, calling `loader()`
+    on the first access. Outside a request the loader is called every time.
+    """
+    if not has_request_context():
+        return loader()
+    cache = g.setdefault('_identity_cache', {})
+    if key not in cache:
+        cache[key] = loader()
+    return cache[key]
+
+
+def set_cached(key, value):
+    """Store an entity for the rest of the current request."""
+    if has_request_context():
+        g.setdefault('_identity_cache', {})[key] = value
+
+
+def clear_cached():
+    """Forget every entity loaded during the current request, e.g. after a write."""
+    if has_request_context():
+        g.pop('_identity_cache', None)
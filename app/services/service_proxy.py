@@ -0,0 +1,6 @@
+from flask import current_app
+from werkzeug.local import LocalProxy
+
+# The current app's MovieService and PosterCache, provided by the ServiceContainer registered in create_app()
+movie_service = LocalProxy(lambda: current_app.extensions['services'].movie_service)
+poster_cache = LocalProxy(lambda: current_app.extensions['services'].poster_cache)
@@ -0,0 +1,200 @@
+import heapq
+import logging
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from app.model.data_model import normalize_title
+
+
+def trigrams(key):
+    """The three-character substrings of a normalized title, padded so that word starts weigh more."""
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TitleIndex:
+    """
+    In-memory autocomplete index over movie titles.
+
+    Each distinct title (distinct once normalized) is stored once, in append-only
+    arrays addressed by a title id. `_sorted` holds the ids in key order, so
+    prefix matches are one bisect plus a short scan; `_postings` maps every
+    trigram to the ascending ids of the titles containing it, which finds
+    matches inside titles and titles with typos. Suggestions are ranked by the
+    number of movies with the title. At most `max_titles` titles are kept.
+    """
+
+    # Prefix matches looked at before ranking; short prefixes match far more titles than are shown
+    PREFIX_SCAN = 200
+    # Trigram postings counted per query; longer lists (very common trigrams) are skipped
+    POSTINGS_BUDGET = 30000
+    # Share of the query's trigrams a title must contain to be suggested
+    MIN_SIMILARITY = 0.5
+
+    def __init__(self, max_titles=None):
+        self.max_titles = max_titles
+        self._lock = threading.Lock()
+        self._titles = []
+        self._weights = array('I')
+        self._sorted = array('i')
+        self._postings = {}
+
+    def __len__(self):
+        return len(self._titles)
+
+    def _key(self, title_id):
+        # Keys are derived from the titles rather than stored, which halves the memory per title
+        return normalize_title(self._titles[title_id])
+
+    @classmethod
+    def build(cls, titles, max_titles=None):
+        """
+        Index (title, weight) pairs in one pass, much faster than add() for a whole table.
+        Titles are merged by normalized key; beyond max_titles the heaviest ones are kept.
+        """
+        weights = {}
+        display = {}
+        for title, weight in titles:
+            key = normalize_title(title or '')
+            if key:
+                weights[key] = weights.get(key, 0) + weight
+                display.setdefault(key, title.strip())
+        keys = list(weights)
+        if max_titles and len(keys) > max_titles:
+            keys = heapq.nlargest(max_titles, keys, key=weights.__getitem__)
+
+        index = cls(max_titles)
+        index._titles = [display[key] for key in keys]
+        index._weights = array('I', (weights[key] for key in keys))
+        index._sorted = array('i', sorted(range(len(keys)), key=keys.__getitem__))
+        postings = {}
+        for title_id, key in enumerate(keys):
+            for trigram in trigrams(key):
+                posting = postings.get(trigram)
+                if posting is None:
+                    postings[trigram] = posting = array('i')
+                posting.append(title_id)
+        index._postings = postings
+        return index
+
+    def add(self, title, weight=1):
+        """Add a title, or count one more movie with it; returns False when the index is full."""
+        key = normalize_title(title or '')
+        if not key:
+            return False
+        with self._lock:
+            position = bisect_left(self._sorted, key, key=self._key)
+            if position < len(self._sorted) and self._key(self._sorted[position]) == key:
+                self._weights[self._sorted[position]] += weight
+                return True
+            if self.max_titles and len(self._titles) >= self.max_titles:
+                return False
+            title_id = len(self._titles)
+            self._titles.append(title.strip())
+            self._weights.append(weight)
+            self._sorted.insert(position, title_id)
+            for trigram in trigrams(key):
+                self._postings.setdefault(trigram, array('i')).append(title_id)
+            return True
+
+    def search(self, query, limit=10):
+        """Up to `limit` titles completing `query`: prefix matches first, then titles similar to it."""
+        key = normalize_title(query or '')
+        if not key:
+            return []
+        with self._lock:
+            matches = self._prefix_matches(key)
+            ranked = heapq.nlargest(limit, matches, key=self._weights.__getitem__)
+            if len(ranked) < limit and len(key) >= 3:
+                seen = set(ranked)
+                similar = [title_id for title_id in self._similar(key, limit * 4) if title_id not in seen]
+                ranked += similar[:limit - len(ranked)]
+            return [self._titles[title_id] for title_id in ranked]
+
+    def _prefix_matches(self, key):
+        start = bisect_left(self._sorted, key, key=self._key)
+        matches = []
+        for title_id in self._sorted[start:start + self.PREFIX_SCAN]:
+            if not self._key(title_id).startswith(key):
+                break
+            matches.append(title_id)
+        return matches
+
+    def _similar(self, key, limit):
+        # Ids of the titles sharing the most trigrams with key, rarest trigrams first
+        query_trigrams = trigrams(key)
+        postings = sorted((self._postings.get(trigram, ()) for trigram in query_trigrams), key=len)
+        counts = Counter()
+        budget = self.POSTINGS_BUDGET
+        for posting in postings:
+            if len(posting) > budget:
+                break
+            counts.update(posting)
+            budget -= len(posting)
+        needed = self.MIN_SIMILARITY * len(query_trigrams)
+        candidates = [(count, title_id) for title_id, count in counts.items() if count >= needed]
+        best = heapq.nlargest(limit, candidates, key=lambda item: (item[0], self._weights[item[1]]))
+        return [title_id for _, title_id in best]
+
+
+class TitleAutocomplete:
+    """
+    Title suggestions for the add-movie form, from the movies users added and the OMDb catalog.
+
+    The TitleIndex is built from the database on a background thread the first time it is
+    queried and kept current through `add`.
+    """
+
+    def __init__(self, data_manager, max_titles=None):
+        self.data_manager = data_manager
+        self.max_titles = int(max_titles or os.getenv('AUTOCOMPLETE_MAX_TITLES', 1000000))
+        self._lock = threading.Lock()
+        self._index = None
+        self._loading = False
+        # Titles added while the index is being built, applied once it is ready
+        self._backlog = []
+
+    def search(self, query, limit=10):
+        """Suggestions for `query`, or None while the index is being built."""
+        if self._index is None:
+            self.load_async()
+            return None
+        return self._index.search(query, limit)
+
+    def add(self, title):
+        with self._lock:
+            if self._index is None:
+                if self._loading:
+                    self._backlog.append(title)
+                return
+        self._index.add(title)
+
+    def load_async(self):
+        """Start building the index on a background thread, unless it is built or being built."""
+        with self._lock:
+            if self._index is not None or self._loading:
+                return
+            self._loading = True
+        threading.Thread(target=self.load, name='title-index', daemon=True).start()
+
+    def load(self):
+        started = time.perf_counter()
+        try:
+            index = TitleIndex.build(self.data_manager.iter_titles(), self.max_titles)
+        except Exception as e:
+            logging.error(f"Error building the title index: {e}")
+            with self._lock:
+                self._loading = False
+            return
+        with self._lock:
+            for title in self._backlog:
+                index.add(title)
+            self._backlog = []
+            self._index = index
+            self._loading = False
+        logging.info(f"Indexed {len(index)} titles for autocomplete "
+                     f"in {(time.perf_counter() - started) * 1000:.0f} ms.")
@@ -1,6 +1,13 @@
+import csv
+import io
+import json
+
 from flask import request
 from werkzeug.exceptions import BadRequest
 
+# Upper bound on the number of titles accepted by one import
+MAX_IMPORT_TITLES = 1000
+
 class MovieValidator:
     @staticmethod
     def validate_add_movie():
@@ -32,4 +39,41 @@ class MovieValidator:
             if not rating.replace('.', '').isdigit() or not (1 <= float(rating) <= 10):
                 raise BadRequest('Rating must be a number between 1 and 10.')
             rating = float(rating)
-        return name, year, rating
\ No newline at end of file
+        return name, year, rating
+
+    @staticmethod
+    def validate_import_movies():
+        """Validate an uploaded CSV or JSON watch list and return its titles."""
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            raise BadRequest('A CSV or JSON file is required.')
+
+        try:
+            content = upload.read().decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise BadRequest('The file must be UTF-8 encoded.')
+
+        if upload.filename.lower().endswith('.json'):
+            try:
+                entries = json.loads(content)
+            except ValueError:
+                raise BadRequest('The file is not valid JSON.')
+            if not isinstance(entries, list):
+                raise BadRequest('The JSON file must contain a list of titles.')
+            titles = [
+                entry.get('title') or entry.get('name') if isinstance(entry, dict) else entry
+                for entry in entries
+            ]
+        else:
+            rows = [row for row in csv.reader(io.StringIO(content)) if row]
+            # Skip a header row such as "title" or "name"
+            if rows and rows[0][0].strip().lower() in ('title', 'name'):
+                rows = rows[1:]
+            titles = [row[0] for row in rows]
+
+        titles = [title.strip() for title in titles if isinstance(title, str) and title.strip()]
+        if not titles:
+            raise BadRequest('The file does not contain any movie titles.')
+        if len(titles) > MAX_IMPORT_TITLES:
+            raise BadRequest(f'A file can contain at most {MAX_IMPORT_TITLES} titles.')
+        return titles
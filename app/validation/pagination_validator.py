@@ -0,0 +1,21 @@
+from flask import request
+
+# Largest page a client may request with ?limit=
+MAX_PAGE_SIZE = 100
+
+
+class PaginationValidator:
+    @staticmethod
+    def validate_page(default_limit):
+        """
+        Read the keyset cursor (?after_id= or ?before_id=) and ?limit= from the query string.
+        Invalid values fall back to the first page and the default limit.
+        """
+        after_id = request.args.get('after_id', type=int)
+        before_id = request.args.get('before_id', type=int)
+        limit = request.args.get('limit', default_limit, type=int)
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            limit = default_limit
+        if after_id is not None:
+            before_id = None
+        return after_id, before_id, limit
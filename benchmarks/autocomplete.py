@@ -0,0 +1,92 @@
+"""
+Microbenchmark of the title autocomplete index (app/services/title_index.py).
+
+    python -m benchmarks.autocomplete --titles 1000000
+
+Builds a TitleIndex over synthetic distinct titles and reports the build time,
+the memory it holds, and p50/p99 latency of prefix, in-title and misspelt
+queries, then of incremental adds.
+"""
+import argparse
+import gc
+import random
+import statistics
+import time
+import tracemalloc
+
+from app.services.title_index import TitleIndex
+from benchmarks.seed import TITLE_WORDS
+
+SYLLABLES = 'ka lo mi ne ra to su vi an el or us ta be di go hu ja ke ly'.split()
+
+
+def synthetic_titles(count, rng):
+    """`count` distinct titles of one to four words from a vocabulary of made-up words."""
+    vocabulary = TITLE_WORDS + list({''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+                                     for _ in range(40000)})
+    titles = set()
+    while len(titles) < count:
+        titles.add(' '.join(rng.choice(vocabulary) for _ in range(rng.randint(1, 4))).title())
+    return list(titles)
+
+
+def misspell(title, rng):
+    # Swap two neighbouring letters
+    position = rng.randrange(len(title) - 1)
+    return title[:position] + title[position + 1] + title[position] + title[position + 2:]
+
+
+def percentile(timings, fraction):
+    return sorted(timings)[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+def measure(index, queries):
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(query)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--titles', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    titles = synthetic_titles(args.titles, rng)
+    weighted = [(title, rng.randint(1, 50)) for title in titles]
+
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    index = TitleIndex.build(weighted)
+    build_seconds = time.perf_counter() - started
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"Indexed {len(index)} titles in {build_seconds:.1f}s, holding {memory / 2 ** 20:.0f} MiB.")
+
+    samples = [rng.choice(titles) for _ in range(args.queries)]
+    queries = {
+        'prefix': [title[:rng.randint(2, 8)] for title in samples],
+        'word in title': [title.split()[-1] for title in samples],
+        'misspelt': [misspell(title, rng) for title in samples if len(title) > 6],
+    }
+    print(f"{'query':<14} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, batch in queries.items():
+        timings = measure(index, batch)
+        print(f"{name:<14} {statistics.median(timings):>8.3f} {percentile(timings, 0.99):>8.3f} "
+              f"{max(timings):>8.3f}")
+
+    new_titles = [f"{title} Returns" for title in samples[:1000]]
+    started = time.perf_counter()
+    for title in new_titles:
+        index.add(title)
+    print(f"add: {(time.perf_counter() - started) * 1000 / len(new_titles):.3f} ms per new title")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import struct
+import threading
+import time
+import urllib.parse
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOMDbServer:
+    """
+    Local stand-in for omdbapi.com with configurable latency.
+
+    Every title resolves to a deterministic movie, except titles containing
+    "notfound", which get OMDb's "Movie not found!" answer. Posters are
+    served from /posters/<imdb id>.png on the same server. Setting `status`
+    to an error code makes every request fail with it, as when OMDb is down.
+    Use it as a context manager and point OMDB_API_URL at `url`.
+    """
+
+    def __init__(self, latency=0.0, host='127.0.0.1', port=0, status=200):
+        self.latency = latency
+        self.status = status
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                url = urllib.parse.urlparse(self.path)
+                if server.status != 200:
+                    body, content_type = json.dumps({'Error': 'Service unavailable'}).encode(), 'application/json'
+                elif url.path.startswith('/posters/'):
+                    body, content_type = fake_poster(url.path.rsplit('/', 1)[-1]), 'image/png'
+                else:
+                    query = urllib.parse.parse_qs(url.query)
+                    body = json.dumps(fake_movie(query.get('t', [''])[0], server.url)).encode()
+                    content_type = 'application/json'
+                self.send_response(server.status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self.url = f'http://{host}:{self._httpd.server_port}/'
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def fake_movie(title, url=None):
+    """The OMDb payload the fake server returns for a title; with the server's url, it has a poster."""
+    if 'notfound' in title.lower():
+        return {'Response': 'False', 'Error': 'Movie not found!'}
+    digest = int(hashlib.sha1(title.strip().lower().encode()).hexdigest(), 16)
+    imdb_id = f'tt{digest % 10 ** 7:07d}'
+    return {
+        'Title': title.strip().title(),
+        'Year': str(1950 + digest % 75),
+        'imdbRating': f'{1 + digest % 90 / 10:.1f}',
+        'imdbID': imdb_id,
+        'Poster': f'{url}posters/{imdb_id}.png' if url else 'N/A',
+        'Response': 'True',
+    }
+
+
+def fake_poster(name, width=300, height=450):
+    """A solid-colour PNG poster, its colour derived from the name."""
+    colour = hashlib.sha1(name.encode()).digest()[:3]
+    rows = b''.join(b'\x00' + colour * width for _ in range(height))
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(rows)) + chunk(b'IEND', b''))
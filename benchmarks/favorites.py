@@ -0,0 +1,96 @@
+"""
+Time each user's favorite movie (get_user_favorites) against a per-user
+top-1 subquery, for one user, a dashboard's worth, a page of users and everyone.
+
+    python -m benchmarks.favorites --users 10000 --movies 1000000
+
+Also prints the query plan of the data manager's ROW_NUMBER() query for a
+batch of users.
+"""
+import argparse
+import statistics
+import time
+
+from sqlalchemy import bindparam, event, text
+
+from benchmarks.seed import scratch_database, seed
+
+# The alternative: one ORDER BY ... LIMIT 1 subquery per user
+TOP_ONE_QUERY = text(
+    "SELECT u.id, coalesce(m.name, c.title), coalesce(m.rating, c.rating) FROM users u "
+    "JOIN movies m ON m.id = (SELECT top.id FROM movies top LEFT JOIN catalog top_c ON top_c.imdb_id = top.imdb_id "
+    "WHERE top.user_id = u.id AND top.status = 'resolved' "
+    "ORDER BY coalesce(top.rating, top_c.rating) DESC, top.id LIMIT 1) "
+    "LEFT JOIN catalog c ON c.imdb_id = m.imdb_id "
+    "WHERE u.id IN :ids ORDER BY u.id"
+).bindparams(bindparam('ids', expanding=True))
+
+
+def median_ms(call, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def favorites_statement(data_manager, user_ids):
+    """The SQL and parameters get_user_favorites sends for these users."""
+    statements = []
+
+    def capture(connection, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(data_manager.read_engine, 'before_cursor_execute', capture)
+    try:
+        data_manager.get_user_favorites(user_ids)
+    finally:
+        event.remove(data_manager.read_engine, 'before_cursor_execute', capture)
+    return statements[-1]
+
+
+def print_plan(data_manager, user_ids):
+    statement, parameters = favorites_statement(data_manager, user_ids)
+    explain = 'EXPLAIN QUERY PLAN' if data_manager.engine.dialect.name == 'sqlite' else 'EXPLAIN'
+    with data_manager.read_engine.connect() as connection:
+        for row in connection.exec_driver_sql(f"{explain} {statement}", parameters):
+            print(f"  {row[-1]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--movies', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--database-url',
+                        help='run against this empty server database instead of a new SQLite file')
+    parser.add_argument('--keep-db', action='store_true', help='keep the seeded database afterwards')
+    args = parser.parse_args()
+
+    with scratch_database(args.database_url, keep=args.keep_db) as (data_manager, database_url):
+        started = time.perf_counter()
+        user_ids = seed(data_manager, args.users, args.movies)
+        print(f"Seeded {args.users} users and {args.movies} movies in {time.perf_counter() - started:.1f}s "
+              f"({data_manager.engine.url}).")
+        # Planner statistics, as a maintained database has them
+        with data_manager.engine.begin() as connection:
+            connection.exec_driver_sql('ANALYZE')
+
+        batches = {'one user': user_ids[-1:], 'dashboard (6)': user_ids[-6:], 'page (200)': user_ids[-200:],
+                   'all users': user_ids}
+        print(f"{'users':<14} {'top-1 ms':>10} {'row_number ms':>14} {'per user ms':>12}")
+        with data_manager.read_engine.connect() as connection:
+            for name, ids in batches.items():
+                repeat = 1 if name == 'all users' else args.repeat
+                statement, parameters = favorites_statement(data_manager, ids)
+                before = median_ms(lambda: connection.execute(TOP_ONE_QUERY, {'ids': ids}).all(), repeat)
+                after = median_ms(lambda: connection.exec_driver_sql(statement, parameters).all(), repeat)
+                print(f"{name:<14} {before:>10.2f} {after:>14.2f} {after / len(ids):>12.3f}")
+
+        print("Plan of get_user_favorites for a page of users:")
+        print_plan(data_manager, user_ids[-200:])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""
+Compare the app's queue-backed JSON logging against the synchronous setup it
+replaced (dictConfig with a plain FileHandler at DEBUG on the request thread).
+
+    python -m benchmarks.logging --threads 8 --records 20000
+    python -m benchmarks.logging --mode wsgi --concurrency 8
+
+Reports how many log records per second the logging threads get through (and
+how long the listener then needs to write what is still queued), and browse
+throughput with each setup. Log files go to a temporary directory; console
+output is discarded.
+"""
+import argparse
+import atexit
+import contextlib
+import logging
+import logging.config
+import os
+import tempfile
+import threading
+import time
+
+import logger.logger as app_logger
+from benchmarks.run import TestClientRunner, WSGIServerRunner, run_scenario
+from benchmarks.seed import scratch_database, seed
+
+# The configuration logger/logger.py applied before the queue-backed pipeline
+SYNCHRONOUS_CONFIG = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'default': {
+            'format': '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        },
+    },
+    'handlers': {
+        'file': {
+            'class': 'logging.FileHandler',
+            'filename': None,
+            'formatter': 'default',
+            'level': 'DEBUG',
+        },
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'default',
+            'level': 'INFO',
+        },
+    },
+    'root': {
+        'level': 'DEBUG',
+        'handlers': ['file', 'console'],
+    },
+}
+
+
+def reset_logging():
+    """Stop the app's listener, if any, and remove every root handler."""
+    if app_logger._listener:
+        atexit.unregister(app_logger._listener.stop)
+        app_logger._listener.stop()
+        for handler in app_logger._listener.handlers:
+            handler.close()
+        app_logger._listener = None
+    app_logger._configured = False
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+
+
+def synchronous_logging(directory):
+    config = dict(SYNCHRONOUS_CONFIG, handlers=dict(SYNCHRONOUS_CONFIG['handlers']))
+    config['handlers']['file'] = dict(config['handlers']['file'], filename=os.path.join(directory, 'sync.log'))
+    logging.config.dictConfig(config)
+
+
+def queued_logging(directory, sample_rate):
+    os.environ['LOG_INFO_SAMPLE_RATE'] = str(sample_rate)
+    app_logger.LOG_DIRECTORY = directory
+    app_logger.LOG_FILE = os.path.join(directory, 'app.log')
+    app_logger.configure_logging()
+
+
+def log_throughput(threads, records):
+    """Records per second seen by the logging threads, and seconds until everything is written."""
+    log = logging.getLogger('benchmark')
+
+    def write(index):
+        for number in range(records):
+            log.info("Rendered movies for user ID %d.", index * records + number)
+
+    workers = [threading.Thread(target=write, args=(index,)) for index in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    logged = time.perf_counter() - started
+    if app_logger._listener:
+        # Stopping the listener waits until the queue is empty
+        app_logger._listener.stop()
+        app_logger._listener.start()
+    return threads * records / logged, time.perf_counter() - started - logged
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8, help='threads logging at once')
+    parser.add_argument('--records', type=int, default=20000, help='records per thread')
+    parser.add_argument('--mode', choices=['client', 'wsgi'], default='client',
+                        help='Flask test client in-process, or a threaded WSGI server over HTTP')
+    parser.add_argument('--concurrency', type=int, default=4, help='parallel clients in wsgi mode')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--movies', type=int, default=10000)
+    parser.add_argument('--requests', type=int, default=1000, help='browse requests per setup')
+    parser.add_argument('--database-url',
+                        help='run against this empty server database instead of a new SQLite file')
+    parser.add_argument('--keep-db', action='store_true', help='keep the seeded database afterwards')
+    args = parser.parse_args()
+
+    os.environ.setdefault('API_KEY', 'benchmark')
+    # The controllers log one INFO line per page view
+    os.environ['LOG_LEVEL'] = 'INFO'
+    from app import create_app
+
+    setups = {
+        'synchronous file': synchronous_logging,
+        'queue': lambda directory: queued_logging(directory, 1),
+        'queue, 10% INFO': lambda directory: queued_logging(directory, 0.1),
+    }
+    with tempfile.TemporaryDirectory() as directory, open(os.devnull, 'w') as devnull, \
+            contextlib.redirect_stderr(devnull), \
+            scratch_database(args.database_url, keep=args.keep_db) as (data_manager, database_url):
+        os.environ['DATABASE_URL'] = database_url
+        started = time.perf_counter()
+        user_ids = seed(data_manager, args.users, args.movies)
+        print(f"Seeded {args.users} users and {args.movies} movies in {time.perf_counter() - started:.1f}s "
+              f"({data_manager.engine.url}).")
+
+        queued_logging(directory, 1)
+        app = create_app()
+        runner = (WSGIServerRunner if args.mode == 'wsgi' else TestClientRunner)(app)
+        print(f"{'logging':<18} {'records/s':>10} {'drain s':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+        try:
+            for name, configure in setups.items():
+                reset_logging()
+                configure(directory)
+                records_per_second, drain = log_throughput(args.threads, args.records)
+                result = run_scenario(runner, 'browse', user_ids, args.requests, args.concurrency, warmup=10)
+                print(f"{name:<18} {records_per_second:>10.0f} {drain:>8.2f} {result['rps']:>8} "
+                      f"{result['p50_ms']:>8} {result['p95_ms']:>8}")
+        finally:
+            runner.close()
+            reset_logging()
+            app.extensions['services'].shutdown()
+            app.extensions['services'].data_manager.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
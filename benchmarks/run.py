@@ -0,0 +1,252 @@
+"""
+Load test the app against a seeded database and a fake OMDb server.
+
+    python -m benchmarks.run --users 200 --movies 20000
+    python -m benchmarks.run --mode wsgi --concurrency 8 --scenario browse
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json
+    python -m benchmarks.run --database-url postgresql://localhost/moviweb_bench
+
+Each scenario reports latency percentiles, throughput and SQL queries per request
+(read from the Server-Timing header). With --baseline the run is compared against a
+stored result and the exit status is 1 when any scenario regressed.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_omdb import FakeOMDbServer
+from benchmarks.scenarios import SCENARIOS, build_requests
+from benchmarks.seed import scratch_database, seed
+
+# Requests per scenario when --requests is not given
+DEFAULT_REQUESTS = {'browse': 1000, 'write': 300, 'import': 20}
+
+QUERIES_PATTERN = re.compile(r'desc="(\d+) queries"')
+
+
+def route_of(path):
+    return re.sub(r'/\d+', '/<id>', path)
+
+
+def queries_of(headers):
+    match = QUERIES_PATTERN.search(headers.get('Server-Timing', ''))
+    return int(match.group(1)) if match else None
+
+
+class TestClientRunner:
+    """Sends requests in-process through Flask's test client, one at a time."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def send(self, method, path, options):
+        data = dict(options.get('data', {}))
+        for field, (filename, stream) in options.get('files', {}).items():
+            data[field] = (stream, filename)
+        response = self.client.open(path, method=method, data=data, headers=options.get('headers'))
+        response.close()
+        return response.status_code, queries_of(response.headers)
+
+    def run(self, requests_, concurrency):
+        return [self.timed(request_) for request_ in requests_]
+
+    def timed(self, request_):
+        started = time.perf_counter()
+        status, queries = self.send(*request_)
+        return request_[1], status, time.perf_counter() - started, queries
+
+    def close(self):
+        pass
+
+
+class WSGIServerRunner(TestClientRunner):
+    """Serves the app from a threaded Werkzeug server and sends real HTTP requests to it."""
+
+    def __init__(self, app):
+        import requests
+        from werkzeug.serving import make_server
+
+        self._requests = requests
+        # One access log line per request would dominate the measurement
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+        self._server = make_server('127.0.0.1', 0, app, threaded=True)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        self.url = f'http://127.0.0.1:{self._server.server_port}'
+        self._local = threading.local()
+
+    def send(self, method, path, options):
+        if not hasattr(self._local, 'session'):
+            self._local.session = self._requests.Session()
+        response = self._local.session.request(method, self.url + path, allow_redirects=False, **options)
+        return response.status_code, queries_of(response.headers)
+
+    def run(self, requests_, concurrency):
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(self.timed, requests_))
+
+    def close(self):
+        self._server.shutdown()
+
+
+def percentile(values, pct):
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[pct - 1]
+
+
+def summarize(samples, elapsed):
+    """Latency percentiles in milliseconds, throughput and query counts for a list of samples."""
+    latencies = sorted(sample[2] * 1000 for sample in samples)
+    queries = [sample[3] for sample in samples if sample[3] is not None]
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for sample in samples if sample[1] >= 500),
+        'rps': round(len(samples) / elapsed, 1) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'queries_mean': round(statistics.mean(queries), 2) if queries else None,
+        'queries_max': max(queries) if queries else None,
+    }
+
+
+def run_scenario(runner, scenario, user_ids, count, concurrency, warmup):
+    runner.run(build_requests(scenario, user_ids, warmup, seed_value=1), concurrency)
+    started = time.perf_counter()
+    samples = runner.run(build_requests(scenario, user_ids, count), concurrency)
+    elapsed = time.perf_counter() - started
+
+    by_route = {}
+    for sample in samples:
+        by_route.setdefault(route_of(sample[0]), []).append(sample)
+    result = summarize(samples, elapsed)
+    result['routes'] = {route: summarize(route_samples, None) for route, route_samples in sorted(by_route.items())}
+    return result
+
+
+def compare(results, baseline, tolerance):
+    """
+    List the regressions of a run against a baseline: p95 latency or throughput worse
+    than the tolerance allows, or more SQL queries per request than before.
+    """
+    regressions = []
+    for scenario, result in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(scenario)
+        if not previous:
+            continue
+        if result['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{scenario}: p95 {previous['p95_ms']} ms -> {result['p95_ms']} ms")
+        if previous['rps'] and result['rps'] < previous['rps'] * (1 - tolerance):
+            regressions.append(f"{scenario}: throughput {previous['rps']} -> {result['rps']} req/s")
+        for route, stats in result['routes'].items():
+            before = previous.get('routes', {}).get(route, {}).get('queries_mean')
+            if before is not None and stats['queries_mean'] is not None and stats['queries_mean'] > before:
+                regressions.append(f"{scenario} {route}: {before} -> {stats['queries_mean']} queries per request")
+    return regressions
+
+
+def print_results(results, baseline=None):
+    print(f"{'scenario':<10} {'requests':>8} {'errors':>6} {'req/s':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8}")
+    for scenario, result in results['scenarios'].items():
+        print(f"{scenario:<10} {result['requests']:>8} {result['errors']:>6} {result['rps']:>8} "
+              f"{result['p50_ms']:>8} {result['p95_ms']:>8} {result['p99_ms']:>8} {result['queries_mean']!s:>8}")
+        previous = (baseline or {}).get('scenarios', {}).get(scenario)
+        if previous:
+            print(f"{'  baseline':<10} {previous['requests']:>8} {previous['errors']:>6} {previous['rps']:>8} "
+                  f"{previous['p50_ms']:>8} {previous['p95_ms']:>8} {previous['p99_ms']:>8} "
+                  f"{previous['queries_mean']!s:>8}")
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='scenario to run, may be repeated (default: all)')
+    parser.add_argument('--mode', choices=['client', 'wsgi'], default='client',
+                        help='Flask test client in-process, or a threaded WSGI server over HTTP')
+    parser.add_argument('--concurrency', type=int, default=4, help='parallel clients in wsgi mode')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--movies', type=int, default=10000)
+    parser.add_argument('--requests', type=int, help='requests per scenario')
+    parser.add_argument('--warmup', type=int, default=10, help='unmeasured requests before each scenario')
+    parser.add_argument('--omdb-latency', type=float, default=0.05, help='fake OMDb response time in seconds')
+    parser.add_argument('--async-resolution', action='store_true', help='enable ASYNC_MOVIE_RESOLUTION')
+    parser.add_argument('--baseline', help='compare against this results file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative slowdown (default 0.2)')
+    parser.add_argument('--save-baseline', help='write the results to this file')
+    parser.add_argument('--database-url',
+                        help='run against this empty server database instead of a new SQLite file')
+    parser.add_argument('--keep-db', action='store_true', help='keep the seeded database afterwards')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.environ['SERVER_TIMING'] = '1'
+    os.environ.setdefault('API_KEY', 'benchmark')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    if args.async_resolution:
+        os.environ['ASYNC_MOVIE_RESOLUTION'] = '1'
+
+    from app import create_app
+
+    with FakeOMDbServer(latency=args.omdb_latency) as omdb, \
+            scratch_database(args.database_url, keep=args.keep_db) as (data_manager, database_url):
+        os.environ.update({'OMDB_API_URL': omdb.url, 'DATABASE_URL': database_url})
+        started = time.perf_counter()
+        user_ids = seed(data_manager, args.users, args.movies)
+        print(f"Seeded {args.users} users and {args.movies} movies in {time.perf_counter() - started:.1f}s "
+              f"({data_manager.engine.url}).")
+
+        app = create_app()
+        runner = (WSGIServerRunner if args.mode == 'wsgi' else TestClientRunner)(app)
+        results = {
+            'settings': {key: getattr(args, key) for key in
+                         ('mode', 'concurrency', 'users', 'movies', 'omdb_latency', 'async_resolution')},
+            'backend': data_manager.engine.dialect.name,
+            'scenarios': {},
+        }
+        try:
+            for scenario in args.scenario or list(SCENARIOS):
+                count = args.requests or DEFAULT_REQUESTS[scenario]
+                results['scenarios'][scenario] = run_scenario(
+                    runner, scenario, user_ids, count, args.concurrency, args.warmup)
+        finally:
+            runner.close()
+            # Background workers must be done before scratch_database removes what they write to
+            app.extensions['services'].shutdown()
+            app.extensions['services'].data_manager.engine.dispose()
+        results['omdb_requests'] = omdb.requests
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    print_results(results, baseline)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f"Saved results to {args.save_baseline}.")
+
+    if baseline:
+        if baseline.get('settings') != results['settings'] or baseline.get('backend') != results['backend']:
+            print("Warning: the baseline was recorded with different settings.")
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
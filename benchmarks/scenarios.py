@@ -0,0 +1,43 @@
+import io
+import random
+
+from benchmarks.seed import movie_title
+
+
+def browse_heavy(rng, user_ids):
+    """Mostly page views: the home page, the user list and user pages."""
+    roll = rng.random()
+    if roll < 0.2:
+        return 'GET', '/', {}
+    if roll < 0.4:
+        return 'GET', '/users/', {}
+    return 'GET', f'/users/{rng.choice(user_ids)}', {}
+
+
+def write_heavy(rng, user_ids):
+    """Half page views, half movie additions through the OMDb lookup."""
+    if rng.random() < 0.5:
+        return 'GET', f'/users/{rng.choice(user_ids)}', {}
+    return 'POST', f'/users/{rng.choice(user_ids)}/add_movie', {'data': {'name': movie_title(rng)}}
+
+
+def import_lists(rng, user_ids, titles=50):
+    """Watch-list imports of `titles` titles each."""
+    content = '\n'.join(movie_title(rng) for _ in range(titles)).encode()
+    return 'POST', f'/users/{rng.choice(user_ids)}/import', {
+        'files': {'file': ('watchlist.csv', io.BytesIO(content))},
+        'headers': {'Accept': 'application/json'},
+    }
+
+
+SCENARIOS = {
+    'browse': browse_heavy,
+    'write': write_heavy,
+    'import': import_lists,
+}
+
+
+def build_requests(scenario, user_ids, count, seed_value=7):
+    """The deterministic request list for one scenario."""
+    rng = random.Random(seed_value)
+    return [SCENARIOS[scenario](rng, user_ids) for _ in range(count)]
@@ -0,0 +1,80 @@
+"""
+Compare movie title search through the full-text index (FTS5 on SQLite,
+tsvector on PostgreSQL) against the portable LIKE '%word%' scan it replaced.
+
+    python -m benchmarks.search --users 10000 --movies 1000000
+
+Each query is timed for the search page (the best 20 matches), for every match,
+and for the best 20 matches within one user's movies.
+"""
+import argparse
+import functools
+import statistics
+import time
+from contextlib import contextmanager
+
+from app.data_manager.sql_data_manager import SQLDataManager
+from benchmarks.seed import scratch_database, seed
+
+QUERIES = ['dark', 'dark nig', 'golden ocean', 'sil sto wi', 'nothing like it']
+
+# Enough to return every match
+ALL_MATCHES = 10 ** 9
+
+
+def median_ms(call, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+@contextmanager
+def like_search(data_manager):
+    """Make data_manager.search_movies use the base class's LIKE conditions instead of the index."""
+    data_manager._match_words = functools.partial(SQLDataManager._match_words, data_manager)
+    try:
+        yield
+    finally:
+        del data_manager._match_words
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--movies', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--database-url',
+                        help='run against this empty server database instead of a new SQLite file')
+    parser.add_argument('--keep-db', action='store_true', help='keep the seeded database afterwards')
+    args = parser.parse_args()
+
+    with scratch_database(args.database_url, keep=args.keep_db) as (data_manager, database_url):
+        started = time.perf_counter()
+        user_ids = seed(data_manager, args.users, args.movies)
+        print(f"Seeded {args.users} users and {args.movies} movies in {time.perf_counter() - started:.1f}s "
+              f"({data_manager.engine.url}).")
+        # Planner statistics, as a maintained database has them
+        with data_manager.engine.begin() as connection:
+            connection.exec_driver_sql('ANALYZE')
+
+        user_id = user_ids[len(user_ids) // 2]
+        searches = {
+            'top 20': lambda query: data_manager.search_movies(query),
+            'all matches': lambda query: data_manager.search_movies(query, limit=ALL_MATCHES),
+            'one user': lambda query: data_manager.search_movies(query, user_id=user_id),
+        }
+        print(f"{'query':<16} {'search':<12} {'matches':>8} {'LIKE ms':>9} {'index ms':>9} {'speedup':>8}")
+        for query in QUERIES:
+            for name, search in searches.items():
+                matches = len(search(query))
+                with like_search(data_manager):
+                    before = median_ms(lambda: search(query), args.repeat)
+                after = median_ms(lambda: search(query), args.repeat)
+                print(f"{query:<16} {name:<12} {matches:>8} {before:>9.2f} {after:>9.2f} {before / after:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+import os
+import random
+import shutil
+import tempfile
+import uuid
+from contextlib import contextmanager
+
+from sqlalchemy import MetaData, create_engine, inspect
+
+# Words the generated movie titles are built from
+TITLE_WORDS = (
+    'dark night star return lost city king last blood river shadow empire love war ghost ocean '
+    'silent golden secret iron storm winter wild red black house road fire dream moon sun'
+).split()
+
+
+def movie_title(rng):
+    return ' '.join(rng.choice(TITLE_WORDS) for _ in range(rng.randint(1, 4))).title()
+
+
+def seed(data_manager, users, movies, films=5000, linked_share=0.8, batch_size=5000, seed_value=42):
+    """
+    Fill a database with `users` users and `movies` movies spread randomly across them,
+    through the data manager's own write paths. Returns the list of user ids.
+    A linked_share of the movies are copies of `films` catalog entries, a third of them
+    with the user's own rating; the rest have titles of their own.
+    """
+    rng = random.Random(seed_value)
+    user_ids = [data_manager.add_user(f'user{index}') for index in range(users)]
+
+    catalog = []
+    for index in range(films if movies else 0):
+        film = {'imdb_id': f'tt{index:07d}', 'title': movie_title(rng), 'year': rng.randint(1950, 2024),
+                'rating': round(rng.uniform(1, 10), 1)}
+        data_manager.save_catalog_entry(film)
+        catalog.append(film)
+
+    by_user = {}
+    for _ in range(movies):
+        if catalog and rng.random() < linked_share:
+            film = rng.choice(catalog)
+            movie = {'name': film['title'], 'year': film['year'], 'imdb_id': film['imdb_id'],
+                     'rating': film['rating'] if rng.random() < 2 / 3 else round(rng.uniform(1, 10), 1)}
+        else:
+            movie = {'name': movie_title(rng), 'year': rng.randint(1950, 2024),
+                     'rating': round(rng.uniform(1, 10), 1)}
+        by_user.setdefault(rng.choice(user_ids), []).append(movie)
+    for user_id, user_movies in by_user.items():
+        for start in range(0, len(user_movies), batch_size):
+            data_manager.add_movies(user_movies[start:start + batch_size], user_id)
+    return user_ids
+
+
+@contextmanager
+def scratch_database(database_url=None, keep=False):
+    """
+    Yield (data_manager, database_url) for a fresh database: a new data/benchmark-*.db file
+    with SQLite, or the server database at database_url, which must be empty.
+    Everything is removed again afterwards unless keep is set. Poster thumbnails and the
+    recommendations file go to a temporary directory meanwhile, never to the app's data/.
+    Apps using the database must shut down their services before the block ends.
+    """
+    from app.data_manager.factory import create_data_manager
+
+    sqlite_file = None
+    if database_url is None:
+        sqlite_file = os.path.join('data', f'benchmark-{uuid.uuid4().hex[:8]}.db')
+        os.makedirs('data', exist_ok=True)
+        database_url = f'sqlite:///{sqlite_file}'
+    else:
+        engine = create_engine(database_url)
+        tables = inspect(engine).get_table_names()
+        engine.dispose()
+        if tables:
+            raise SystemExit(f"Refusing to benchmark against a database that already has tables: {tables}")
+
+    files_folder = tempfile.mkdtemp(prefix='moviweb-benchmark-')
+    file_settings = {
+        'POSTER_CACHE_DIR': os.path.join(files_folder, 'posters'),
+        'RECOMMENDATIONS_FILE': os.path.join(files_folder, 'recommendations.bin'),
+    }
+    previous_settings = {name: os.environ.get(name) for name in file_settings}
+    os.environ.update(file_settings)
+
+    data_manager = create_data_manager(database_url)
+    try:
+        yield data_manager, database_url
+    finally:
+        for name, value in previous_settings.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        shutil.rmtree(files_folder, ignore_errors=True)
+        if not keep:
+            if sqlite_file:
+                data_manager.engine.dispose()
+                for suffix in ('', '-wal', '-shm'):
+                    if os.path.exists(sqlite_file + suffix):
+                        os.remove(sqlite_file + suffix)
+            else:
+                metadata = MetaData()
+                metadata.reflect(data_manager.engine)
+                metadata.drop_all(data_manager.engine)
+        data_manager.engine.dispose()
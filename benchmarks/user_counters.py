@@ -0,0 +1,95 @@
+"""
+Compare user lists read from the denormalized users.movies_count/avg_rating/top_rating
+columns against the LEFT JOIN ... GROUP BY aggregate they replace.
+
+    python -m benchmarks.user_counters --users 100000 --movies 10000000
+
+Also reports what the counters cost on the write path and how long a full
+`flask rebuild-user-stats` takes.
+"""
+import argparse
+import statistics
+import time
+
+from sqlalchemy import text
+
+from benchmarks.seed import scratch_database, seed
+
+PAGE = 25
+
+AGGREGATE_QUERIES = {
+    'first page': (
+        "SELECT u.id, u.name, count(m.id), avg(m.rating), max(m.rating) "
+        "FROM (SELECT id, name FROM users ORDER BY id LIMIT :limit) u "
+        "LEFT JOIN movies m ON m.user_id = u.id GROUP BY u.id, u.name ORDER BY u.id"
+    ),
+    'deep page': (
+        "SELECT u.id, u.name, count(m.id), avg(m.rating), max(m.rating) "
+        "FROM (SELECT id, name FROM users WHERE id > :after ORDER BY id LIMIT :limit) u "
+        "LEFT JOIN movies m ON m.user_id = u.id GROUP BY u.id, u.name ORDER BY u.id"
+    ),
+    'all users': (
+        "SELECT u.id, u.name, count(m.id), avg(m.rating), max(m.rating) "
+        "FROM users u LEFT JOIN movies m ON m.user_id = u.id GROUP BY u.id, u.name"
+    ),
+    'total movies': "SELECT count(*) FROM movies",
+}
+
+COUNTER_QUERIES = {
+    'first page': "SELECT id, name, movies_count, avg_rating, top_rating FROM users ORDER BY id LIMIT :limit",
+    'deep page': (
+        "SELECT id, name, movies_count, avg_rating, top_rating FROM users "
+        "WHERE id > :after ORDER BY id LIMIT :limit"
+    ),
+    'all users': "SELECT id, name, movies_count, avg_rating, top_rating FROM users",
+    'total movies': "SELECT sum(movies_count) FROM users",
+}
+
+
+def median_ms(connection, sql, params, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        connection.execute(text(sql), params).all()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--movies', type=int, default=10000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--database-url',
+                        help='run against this empty server database instead of a new SQLite file')
+    parser.add_argument('--keep-db', action='store_true', help='keep the seeded database afterwards')
+    args = parser.parse_args()
+
+    with scratch_database(args.database_url, keep=args.keep_db) as (data_manager, database_url):
+        started = time.perf_counter()
+        user_ids = seed(data_manager, args.users, args.movies)
+        print(f"Seeded {args.users} users and {args.movies} movies in {time.perf_counter() - started:.1f}s "
+              f"({data_manager.engine.url}).")
+
+        params = {'limit': PAGE, 'after': user_ids[len(user_ids) // 2]}
+        print(f"{'query':<14} {'aggregate ms':>13} {'counters ms':>12} {'speedup':>8}")
+        with data_manager.engine.connect() as connection:
+            for name, sql in AGGREGATE_QUERIES.items():
+                repeat = 1 if name in ('all users', 'total movies') else args.repeat
+                before = median_ms(connection, sql, params, repeat)
+                after = median_ms(connection, COUNTER_QUERIES[name], params, repeat)
+                print(f"{name:<14} {before:>13.2f} {after:>12.2f} {before / after:>7.0f}x")
+
+        # Write path: every movie write also recomputes the owner's counters
+        writes = [user_ids[index % len(user_ids)] for index in range(200)]
+        started = time.perf_counter()
+        for user_id in writes:
+            data_manager.add_movie('Benchmark Movie', 2000, 7.5, user_id)
+        print(f"add_movie with counters: {(time.perf_counter() - started) * 1000 / len(writes):.2f} ms per call")
+
+        started = time.perf_counter()
+        data_manager.rebuild_user_stats()
+        print(f"rebuild-user-stats: {time.perf_counter() - started:.1f}s")
+
+if __name__ == '__main__':
+    main()
@@ -1,43 +1,160 @@
+import atexit
+import copy
+import json
 import logging
-import logging.config
+import logging.handlers
 import os
+import queue
+import random
+import threading
+import uuid
+from datetime import datetime, timezone
 
-# Ensure the logger and log directories exist
 LOG_DIRECTORY = 'logger/log'
-if not os.path.exists(LOG_DIRECTORY):
-    os.makedirs(LOG_DIRECTORY)
-
-# Centralized logging configuration
-LOGGING_CONFIG = {
-    'version': 1,
-    'disable_existing_loggers': False,
-    'formatters': {
-        'default': {
-            'format': '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        },
-    },
-    'handlers': {
-        'file': {
-            'class': 'logging.FileHandler',
-            'filename': os.path.join(LOG_DIRECTORY, 'app.log'),
-            'formatter': 'default',
-            'level': 'DEBUG',
-        },
-        'console': {
-            'class': 'logging.StreamHandler',
-            'formatter': 'default',
-            'level': 'INFO',
-        },
-    },
-    'root': {
-        'level': 'DEBUG',
-        'handlers': ['file', 'console'],
-    },
-}
+LOG_FILE = os.path.join(LOG_DIRECTORY, 'app.log')
+
+_configured = False
+_configure_lock = threading.Lock()
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one JSON object per line."""
+
+    def format(self, record):
+        # RotatingFileHandler formats each record twice: to check the file size, then to write it
+        line = getattr(record, '_json_line', None)
+        if line is None:
+            line = record._json_line = self._format(record)
+        return line
+
+    def _format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+            'thread': record.threadName,
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RequestIdFilter(logging.Filter):
+    """Adds the current Flask request's id (or None) to every record as `request_id`."""
+
+    def filter(self, record):
+        if not hasattr(record, 'request_id'):
+            record.request_id = _current_request_id()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps only a fraction of INFO and DEBUG records; warnings and errors always pass."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or self.rate >= 1 or random.random() < self.rate
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that keeps the traceback apart from the message for the JSON formatter."""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+def _current_request_id():
+    try:
+        from flask import g, has_request_context
+    except ImportError:
+        return None
+    return g.get('request_id') if has_request_context() else None
+
+
+def _file_handler():
+    # Rotate by size (default) or by time, e.g. LOG_ROTATION=time LOG_ROTATE_WHEN=midnight
+    backup_count = int(os.getenv('LOG_BACKUP_COUNT', 5))
+    if os.getenv('LOG_ROTATION', 'size') == 'time':
+        handler = logging.handlers.TimedRotatingFileHandler(
+            LOG_FILE, when=os.getenv('LOG_ROTATE_WHEN', 'midnight'), backupCount=backup_count, encoding='utf-8')
+    else:
+        handler = logging.handlers.RotatingFileHandler(
+            LOG_FILE, maxBytes=int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024)), backupCount=backup_count,
+            encoding='utf-8')
+    handler.setFormatter(JsonFormatter())
+    return handler
+
+
+def _console_handler():
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    handler.setLevel(logging.INFO)
+    return handler
+
+
+def configure_logging():
+    """
+    Configure the root logger once per process. Records are put on a queue by the
+    calling thread and written to the rotating JSON log file and the console by a
+    background QueueListener, so request threads never block on log I/O.
+    """
+    global _configured, _listener
+    with _configure_lock:
+        if _configured:
+            return
+        if not os.path.exists(LOG_DIRECTORY):
+            os.makedirs(LOG_DIRECTORY)
+
+        log_queue = queue.SimpleQueue()
+        queue_handler = _QueueHandler(log_queue)
+        # Filters run in the thread that logs, where the Flask request context is available
+        queue_handler.addFilter(SamplingFilter(float(os.getenv('LOG_INFO_SAMPLE_RATE', 1))))
+        queue_handler.addFilter(RequestIdFilter())
+
+        root = logging.getLogger()
+        root.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+        root.addHandler(queue_handler)
+
+        _listener = logging.handlers.QueueListener(
+            log_queue, _file_handler(), _console_handler(), respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+        _configured = True
+
+
+def init_app(app):
+    """Give every request an id, taken from X-Request-ID when the client sends one."""
+    from flask import g, request
+
+    @app.before_request
+    def assign_request_id():
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+
+    @app.after_request
+    def return_request_id(response):
+        if g.get('request_id'):
+            response.headers['X-Request-ID'] = g.request_id
+        return response
+
 
 def setup_logger(name: str):
     """
     Sets up a logger with the given name using the centralized configuration.
     """
-    logging.config.dictConfig(LOGGING_CONFIG)
+    configure_logging()
     return logging.getLogger(name)
@@ -0,0 +1,93 @@
+import os
+import threading
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+os.environ.setdefault('API_KEY', 'test')
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import logger.logger  # noqa: E402
+from app import create_app  # noqa: E402
+from benchmarks.fake_omdb import FakeOMDbServer  # noqa: E402
+from benchmarks.seed import scratch_database  # noqa: E402
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'sqlite_only: test of SQLite specifics, skipped on TEST_DATABASE_URL')
+
+
+@pytest.fixture(scope='session', autouse=True)
+def log_file(tmp_path_factory):
+    """Keep test runs out of logger/log/app.log."""
+    directory = tmp_path_factory.mktemp('log')
+    logger.logger.LOG_DIRECTORY = str(directory)
+    logger.logger.LOG_FILE = str(directory / 'app.log')
+
+
+@pytest.fixture(scope='session')
+def omdb_server():
+    with FakeOMDbServer() as server:
+        yield server
+
+
+@pytest.fixture(params=['sqlite', 'server'])
+def database_url(request, tmp_path):
+    """
+    A fresh SQLite database under tmp_path, then the server database (e.g. PostgreSQL) at
+    TEST_DATABASE_URL when it is set. That database must be empty; its tables are dropped after each test.
+    """
+    if request.param == 'sqlite':
+        yield f"sqlite:///{tmp_path / 'test.db'}"
+        return
+    url = os.getenv('TEST_DATABASE_URL')
+    if not url:
+        pytest.skip('TEST_DATABASE_URL is not set')
+    if request.node.get_closest_marker('sqlite_only'):
+        pytest.skip('SQLite only')
+    with scratch_database(url) as (_, url):
+        yield url
+
+
+@pytest.fixture
+def app(database_url, tmp_path, monkeypatch, omdb_server):
+    """The app on a fresh database, with its files under tmp_path and OMDb answered locally."""
+    monkeypatch.setenv('OMDB_API_URL', omdb_server.url)
+    monkeypatch.setenv('POSTER_CACHE_DIR', str(tmp_path / 'posters'))
+    monkeypatch.setenv('RECOMMENDATIONS_FILE', str(tmp_path / 'recommendations.bin'))
+    app = create_app({'TESTING': True, 'DATABASE_URL': database_url})
+    yield app
+    services = app.extensions['services']
+    services.shutdown()
+    services.data_manager.read_engine.dispose()
+    services.data_manager.engine.dispose()
+
+
+@pytest.fixture
+def data_manager(app):
+    return app.extensions['services'].data_manager
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@contextmanager
+def captured_queries():
+    """Collect the (statement, parameters) sent to any database by the current thread."""
+    queries = []
+    thread = threading.get_ident()
+
+    def before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        # Background workers (poster downloads, recommendation refreshes) are not the request's queries
+        if threading.get_ident() == thread:
+            queries.append((statement, parameters))
+
+    event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield queries
+    finally:
+        event.remove(Engine, 'before_cursor_execute', before_cursor_execute)
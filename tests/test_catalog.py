@@ -0,0 +1,76 @@
+import pytest
+from sqlalchemy import text
+
+ALIEN = {'imdb_id': 'tt0078748', 'title': 'Alien', 'year': 1979, 'rating': 8.5}
+
+
+@pytest.fixture
+def user_id(data_manager):
+    data_manager.save_catalog_entry(ALIEN)
+    return data_manager.add_user('alice')
+
+
+def stored_details(data_manager, movie_id):
+    with data_manager.engine.connect() as connection:
+        return tuple(connection.execute(
+            text("SELECT name, year, rating FROM movies WHERE id = :id"), {"id": movie_id}).one())
+
+
+def test_linked_movies_store_only_their_overrides(data_manager, user_id):
+    data_manager.add_movie('Alien', 1979, 8.5, user_id, ALIEN['imdb_id'])
+    movie_id = data_manager.get_user_movies(user_id)[0]['id']
+    assert stored_details(data_manager, movie_id) == (None, None, None)
+
+    data_manager.update_movie(movie_id, year=1979, rating=9.5)
+    assert stored_details(data_manager, movie_id) == (None, None, 9.5)
+    movie = data_manager.get_movie(movie_id)
+    assert (movie['name'], movie['year'], movie['rating']) == ('Alien', 1979, 9.5)
+    assert data_manager.get_user_with_movie_count(user_id)['top_rating'] == 9.5
+    assert data_manager.get_user_favorites([user_id])[0]['favorite_movie'] == 'Alien'
+
+
+def test_bulk_adds_and_resolved_movies_store_only_their_overrides(data_manager, user_id):
+    data_manager.add_movies([dict(ALIEN, name='Alien'), dict(ALIEN, name='Alien', rating=6.0),
+                             {'name': 'Heat', 'year': 1995, 'rating': 8.3}], user_id)
+    pending_id = data_manager.add_pending_movie('alien', user_id)
+    data_manager.resolve_movie(pending_id, 'Alien', 1979, 8.5, ALIEN['imdb_id'])
+    movie_ids = [movie['id'] for movie in data_manager.get_user_movies(user_id)]
+    assert [stored_details(data_manager, movie_id) for movie_id in movie_ids] == [
+        (None, None, None), ('Heat', 1995, 8.3), (None, None, 6.0), (None, None, None)]
+
+
+def test_search_follows_catalog_titles(data_manager, user_id):
+    data_manager.add_movie('Alien', 1979, 8.5, user_id, ALIEN['imdb_id'])
+    data_manager.add_movie('Aliens', 1986, 8.4, user_id)
+    assert {movie['name'] for movie in data_manager.search_movies('alie')} == {'Alien', 'Aliens'}
+
+    version = data_manager.get_versions([f'user:{user_id}'])[f'user:{user_id}'][0]
+    data_manager.save_catalog_entry(dict(ALIEN, title='Alien: Director\'s Cut', rating=8.6))
+    assert data_manager.get_versions([f'user:{user_id}'])[f'user:{user_id}'][0] > version
+    assert data_manager.get_user_with_movie_count(user_id)['top_rating'] == 8.6
+    assert [movie['name'] for movie in data_manager.search_movies('director')] == ["Alien: Director's Cut"]
+    assert {movie['name'] for movie in data_manager.search_movies('alien')} == {"Alien: Director's Cut", 'Aliens'}
+
+    data_manager.delete_movie(data_manager.get_user_movies(user_id)[-1]['id'])
+    assert [movie['name'] for movie in data_manager.search_movies('alie')] == ['Aliens']
+
+
+def test_search_within_one_user(data_manager, user_id):
+    other_id = data_manager.add_user('bob')
+    data_manager.add_movie('Alien', 1979, 8.5, user_id, ALIEN['imdb_id'])
+    data_manager.add_movie('Aliens', 1986, 8.4, user_id)
+    data_manager.add_movie('Alien', 1979, 8.5, other_id, ALIEN['imdb_id'])
+    assert {(movie['name'], movie['user_id']) for movie in data_manager.search_movies('alie', user_id=user_id)} == {
+        ('Alien', user_id), ('Aliens', user_id)}
+    assert [movie['user_id'] for movie in data_manager.search_movies('alien', user_id=other_id)] == [other_id]
+
+
+def test_poster_thumbnails_change_their_owners_pages(data_manager, user_id):
+    other_id = data_manager.add_user('bob')
+    data_manager.add_movie('Alien', 1979, 8.5, user_id, ALIEN['imdb_id'])
+    resources = [f'user:{user_id}', f'user:{other_id}']
+    before = data_manager.get_versions(resources)
+    data_manager.set_poster_thumbnail(ALIEN['imdb_id'], 'alien.jpg')
+    after = data_manager.get_versions(resources)
+    assert after[f'user:{user_id}'][0] > before[f'user:{user_id}'][0]
+    assert after[f'user:{other_id}'] == before[f'user:{other_id}']
@@ -0,0 +1,67 @@
+import logging
+import threading
+import time
+
+import pytest
+
+# Seconds readers and writers run side by side
+DURATION = 1.5
+READERS = 6
+WRITERS = 2
+
+
+@pytest.mark.sqlite_only
+def test_sqlite_runs_in_wal_mode(data_manager):
+    with data_manager.engine.connect() as connection:
+        assert connection.exec_driver_sql('PRAGMA journal_mode').scalar() == 'wal'
+        assert connection.exec_driver_sql('PRAGMA busy_timeout').scalar() > 0
+
+
+def test_reads_keep_flowing_while_writers_commit(app, data_manager, caplog):
+    user_ids = [data_manager.add_user(f'user{index}') for index in range(10)]
+    for user_id in user_ids:
+        data_manager.add_movies([{'name': f'Movie {index}', 'year': 2000, 'rating': 7} for index in range(50)],
+                                user_id)
+    app.test_client().get('/')
+
+    stop = threading.Event()
+    reads, commits, failures = [], [], []
+
+    def reader(offset):
+        client = app.test_client()
+        count = 0
+        while not stop.is_set():
+            response = client.get(f'/users/{user_ids[(offset + count) % len(user_ids)]}')
+            if response.status_code != 200:
+                failures.append(f'GET returned {response.status_code}')
+            count += 1
+        reads.append(count)
+
+    def writer(offset):
+        count = 0
+        while not stop.is_set():
+            user_id = user_ids[(offset + count) % len(user_ids)]
+            if data_manager.add_movies([{'name': f'Bulk {count} {index}', 'year': 2001, 'rating': 6}
+                                        for index in range(20)], user_id) is False:
+                failures.append('bulk insert failed')
+            count += 1
+        commits.append(count)
+
+    threads = ([threading.Thread(target=reader, args=(index,)) for index in range(READERS)]
+               + [threading.Thread(target=writer, args=(index,)) for index in range(WRITERS)])
+    with caplog.at_level(logging.ERROR):
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        time.sleep(DURATION)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+    # The data manager logs and swallows errors such as "database is locked"
+    errors = [record.getMessage() for record in caplog.records if record.levelno >= logging.ERROR]
+    assert not failures and not errors, (failures + errors)[:5]
+    assert sum(commits) >= WRITERS
+    # Far below what the app does on a laptop; a reader stalled on the writers' locks would not get there
+    assert sum(reads) / elapsed > 20, f"{sum(reads) / elapsed:.0f} reads/s with {sum(commits)} concurrent commits"
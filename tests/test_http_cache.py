@@ -0,0 +1,31 @@
+import pytest
+
+from app.controller.http_cache import PageCache
+
+
+@pytest.fixture
+def page_cache(app):
+    app.extensions['page_cache'] = PageCache(16)
+    return app.extensions['page_cache']
+
+
+def test_cached_pages_keep_their_content_type(client, data_manager, page_cache):
+    user_id = data_manager.add_user('alice')
+    first = client.get(f'/api/v1/users/{user_id}')
+    cached = client.get(f'/api/v1/users/{user_id}')
+    assert cached.mimetype == first.mimetype == 'application/json'
+    assert cached.get_json() == first.get_json()
+    assert cached.headers['ETag'] == first.headers['ETag']
+
+
+def test_missing_pages_are_not_revalidated(client, data_manager, page_cache):
+    user_id = data_manager.add_user('alice') + 1
+    missing = client.get(f'/api/v1/users/{user_id}')
+    assert missing.status_code == 404
+    assert 'ETag' not in missing.headers and 'Last-Modified' not in missing.headers
+
+    assert data_manager.add_user('bob') == user_id
+    response = client.get(f'/api/v1/users/{user_id}')
+    assert response.status_code == 200 and response.get_json()['name'] == 'bob'
+    assert client.get(f'/api/v1/users/{user_id}', headers={'If-None-Match': response.headers['ETag']}
+                      ).status_code == 304
@@ -0,0 +1,87 @@
+import time
+
+import pytest
+
+from app.external_apis.omdb_api import OMDbAPI
+from benchmarks.fake_omdb import FakeOMDbServer
+
+# Slack for thread scheduling on a busy machine, on top of the configured limits
+SLACK = 0.5
+
+
+@pytest.fixture
+def server():
+    with FakeOMDbServer() as server:
+        yield server
+
+
+def client_for(server, **options):
+    settings = dict(api_key='test', api_url=server.url, connect_timeout=1, read_timeout=1, max_retries=2,
+                    backoff_base=0.05, backoff_cap=0.1, retry_budget=10, breaker_threshold=100, breaker_reset=60)
+    settings.update(options)
+    return OMDbAPI(**settings)
+
+
+def timed_failure(client, title='Alien'):
+    started = time.monotonic()
+    with pytest.raises(ConnectionError):
+        client.fetch_movie_data(title)
+    return time.monotonic() - started
+
+
+def test_fetches_through_the_stub(server):
+    client = client_for(server)
+    assert client.fetch_movie_data('alien')['title'] == 'Alien'
+    assert client.breaker.is_open is False
+
+
+def test_slow_server_is_cut_off_by_the_read_timeout(server):
+    server.latency = 1.0
+    client = client_for(server, read_timeout=0.2)
+    elapsed = timed_failure(client)
+    # Three attempts of at most 0.2s each, with two backoff delays of at most 0.1s
+    assert server.requests == 3
+    assert elapsed < 3 * 0.2 + 2 * 0.1 + SLACK
+
+
+def test_failing_server_is_retried_with_bounded_backoff(server):
+    server.status = 503
+    client = client_for(server, max_retries=3)
+    elapsed = timed_failure(client)
+    assert server.requests == 4
+    assert elapsed < 3 * 0.1 + SLACK
+
+
+def test_retry_budget_bounds_the_time_spent_retrying(server):
+    server.status = 503
+    client = client_for(server, max_retries=50, backoff_base=0.2, backoff_cap=0.2, retry_budget=0.5)
+    elapsed = timed_failure(client)
+    assert server.requests < 50
+    assert elapsed < 0.5 + SLACK
+
+
+def test_breaker_opens_and_fails_fast(server):
+    server.status = 503
+    client = client_for(server, max_retries=0, breaker_threshold=3)
+    for _ in range(3):
+        timed_failure(client)
+    assert client.breaker.is_open
+
+    requests = server.requests
+    elapsed = max(timed_failure(client) for _ in range(20))
+    # Rejected without a request, so without waiting for OMDb
+    assert server.requests == requests
+    assert elapsed < 0.01
+
+
+def test_breaker_closes_when_the_probe_succeeds(server):
+    server.status = 503
+    client = client_for(server, max_retries=0, breaker_threshold=2, breaker_reset=0.2)
+    for _ in range(2):
+        timed_failure(client)
+    assert client.breaker.is_open
+
+    server.status = 200
+    time.sleep(0.25)
+    assert client.fetch_movie_data('Alien')['title'] == 'Alien'
+    assert client.breaker.is_open is False
@@ -0,0 +1,74 @@
+import pytest
+
+from tests.conftest import captured_queries
+
+
+@pytest.fixture
+def user_with_movies(client, data_manager):
+    user_id = data_manager.add_user('alice')
+    data_manager.add_movies([{'name': f'Movie {index}', 'year': 2000, 'rating': 5 + index % 5}
+                             for index in range(30)], user_id)
+    movie_id = data_manager.get_user_movies(user_id, limit=1)[0]['id']
+    return user_id, movie_id
+
+
+def count_queries(client, method, path, data=None):
+    with captured_queries() as queries:
+        response = client.open(path, method=method, data=data)
+    assert response.status_code < 400, f"{method} {path} returned {response.status_code}"
+    return len(queries)
+
+
+# (method, path, most queries): the page's version check, then each entity loaded once
+ROUTES = [
+    ('GET', '/', 4),
+    ('GET', '/users/', 2),
+    ('GET', '/users/{user_id}', 3),
+    ('GET', '/users/{user_id}?after_id={movie_id}', 3),
+    ('GET', '/api/v1/users/{user_id}/movies?after_id={movie_id}', 3),
+    ('GET', '/users/{user_id}/add_movie', 1),
+    ('GET', '/users/{user_id}/update/{movie_id}', 1),
+]
+
+
+@pytest.mark.parametrize('method, path, most', ROUTES)
+def test_page_query_count(client, user_with_movies, method, path, most):
+    user_id, movie_id = user_with_movies
+    assert count_queries(client, method, path.format(user_id=user_id, movie_id=movie_id)) <= most
+
+
+def test_keyset_page_starts_after_the_cursor(client, user_with_movies):
+    user_id, movie_id = user_with_movies
+    items = client.get(f'/api/v1/users/{user_id}/movies?after_id={movie_id}').get_json()['items']
+    assert items and all(item['id'] < movie_id for item in items)
+
+
+def test_user_page_does_not_grow_with_the_movie_list(client, data_manager, user_with_movies):
+    user_id, _ = user_with_movies
+    before = count_queries(client, 'GET', f'/users/{user_id}')
+    data_manager.add_movies([{'name': f'More {index}', 'year': 2001, 'rating': 6} for index in range(100)], user_id)
+    assert count_queries(client, 'GET', f'/users/{user_id}') == before
+
+
+def test_add_movie_query_count(client, user_with_movies):
+    user_id, _ = user_with_movies
+    # User check, OMDb cache and catalog lookups and writes (with the catalog entry's owners' counters and
+    # versions), insert, counters, versions
+    assert count_queries(client, 'POST', f'/users/{user_id}/add_movie', {'name': 'Heat'}) <= 10
+    # The second add of a title is answered by the in-memory OMDb cache
+    assert count_queries(client, 'POST', f'/users/{user_id}/add_movie', {'name': 'Heat'}) <= 4
+
+
+def test_update_movie_query_count(client, data_manager, user_with_movies):
+    user_id, movie_id = user_with_movies
+    data = {'name': 'Heat', 'year': '1999', 'rating': '8.5'}
+    # Owner-scoped lookup, OMDb cache and catalog (with the entry's owners), then the update with its counters
+    # and versions
+    assert count_queries(client, 'POST', f'/users/{user_id}/update/{movie_id}', data) <= 11
+    assert data_manager.get_movie(movie_id)['rating'] == 8.5
+
+
+def test_delete_movie_query_count(client, user_with_movies):
+    user_id, movie_id = user_with_movies
+    # Owner-scoped lookup, then the delete with its counters and versions
+    assert count_queries(client, 'POST', f'/users/{user_id}/delete/{movie_id}') <= 5
@@ -0,0 +1,135 @@
+import json
+import re
+import sqlite3
+
+import pytest
+
+from app.data_manager.factory import create_data_manager
+from tests.conftest import captured_queries
+
+pytestmark = pytest.mark.sqlite_only
+
+# A full pass over the movies table, as opposed to an index search
+FULL_SCAN = re.compile(r'^SCAN movies( USING COVERING INDEX \w+)?$')
+
+
+@pytest.fixture
+def user_id(data_manager):
+    user_id = data_manager.add_user('alice')
+    other_id = data_manager.add_user('bob')
+    for index in range(20):
+        data_manager.save_catalog_entry({'imdb_id': f'tt{index:07d}', 'title': f'Dark City {index}', 'year': 1998,
+                                         'rating': 7.5})
+    for owner in (user_id, other_id):
+        data_manager.add_movies([{'name': f'Dark Night {index}', 'year': 2000, 'rating': 1 + index % 10}
+                                 for index in range(200)], owner)
+        data_manager.add_movies([{'name': f'Dark City {index}', 'year': 1998, 'rating': 7.5,
+                                  'imdb_id': f'tt{index:07d}'} for index in range(20)], owner)
+    return user_id
+
+
+def query_plans(data_manager, call):
+    """EXPLAIN QUERY PLAN of every statement `call()` runs, as lists of plan lines."""
+    with captured_queries() as queries:
+        call()
+    assert queries
+    with data_manager.engine.connect() as connection:
+        return [[row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+                for statement, parameters in queries]
+
+
+def assert_uses_index(plans, index):
+    lines = [line for plan in plans for line in plan]
+    assert any(f'INDEX {index} ' in line for line in lines), lines
+    assert not any(FULL_SCAN.match(line) for line in lines), lines
+
+
+def test_user_movies_use_the_user_id_index(data_manager, user_id):
+    assert_uses_index(query_plans(data_manager, lambda: data_manager.get_user_movies(user_id, limit=25)),
+                      'ix_movies_user_id_id')
+    movie_id = data_manager.get_user_movies(user_id, limit=30)[-1]['id']
+    assert_uses_index(query_plans(data_manager, lambda: data_manager.get_user_movies(user_id, after_id=movie_id,
+                                                                                    limit=25)),
+                      'ix_movies_user_id_id')
+
+
+def test_favorites_use_the_user_id_index(data_manager, user_id):
+    assert_uses_index(query_plans(data_manager, lambda: data_manager.get_user_favorites([user_id])),
+                      'ix_movies_user_id_id')
+
+
+def test_title_lookups_use_the_title_indexes(data_manager, user_id):
+    # Movies' own names through ix_movies_name_lower, catalog titles through ix_catalog_title_key
+    for index in ('ix_movies_name_lower', 'ix_catalog_title_key'):
+        assert_uses_index(query_plans(data_manager, lambda: data_manager.get_rater_ratings(['dark night 7'])), index)
+    assert_uses_index(query_plans(data_manager, lambda: data_manager.get_user_titles(user_id, ['DARK city 7'])),
+                      'ix_movies_user_id_id')
+
+
+@pytest.mark.parametrize('within_user', [False, True])
+def test_search_uses_the_full_text_index(data_manager, user_id, within_user):
+    plans = query_plans(data_manager,
+                        lambda: data_manager.search_movies('dark nig', user_id=user_id if within_user else None))
+    lines = [line for plan in plans for line in plan]
+    assert any('movies_fts VIRTUAL TABLE' in line for line in lines), lines
+    assert not any(FULL_SCAN.match(line) for line in lines), lines
+
+
+def test_migrations_index_an_existing_database(tmp_path):
+    # The schema databases had before the migrations existed
+    path = tmp_path / 'old.db'
+    with sqlite3.connect(path) as connection:
+        connection.executescript(
+            "CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, name VARCHAR NOT NULL);"
+            "CREATE TABLE movies (id INTEGER PRIMARY KEY AUTOINCREMENT, name VARCHAR NOT NULL, "
+            "year INTEGER NOT NULL, rating FLOAT NOT NULL, user_id INTEGER REFERENCES users (id));"
+            "INSERT INTO users (name) VALUES ('alice');"
+            "INSERT INTO movies (name, year, rating, user_id) VALUES ('Alien', 1979, 8.5, 1);"
+        )
+    connection.close()
+
+    data_manager = create_data_manager(f"sqlite:///{path}")
+    try:
+        with data_manager.engine.connect() as connection:
+            indexes = set(connection.exec_driver_sql(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'movies'").scalars())
+        assert {'ix_movies_user_id_id', 'ix_movies_name_lower', 'ix_movies_imdb_id'} <= indexes
+        assert [movie['name'] for movie in data_manager.get_user_movies(1)] == ['Alien']
+        assert_uses_index(query_plans(data_manager, lambda: data_manager.get_user_movies(1, limit=25)),
+                          'ix_movies_user_id_id')
+    finally:
+        data_manager.read_engine.dispose()
+        data_manager.engine.dispose()
+
+
+def test_migrations_move_movie_details_to_the_catalog(tmp_path):
+    # Movies from before the catalog, with an OMDb lookup cached for one of them
+    path = tmp_path / 'old.db'
+    payload = json.dumps({'title': 'Amélie', 'year': 2001, 'rating': 8.3, 'imdb_id': 'tt0211915'})
+    with sqlite3.connect(path) as connection:
+        connection.executescript(
+            "CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, name VARCHAR NOT NULL);"
+            "CREATE TABLE movies (id INTEGER PRIMARY KEY AUTOINCREMENT, name VARCHAR NOT NULL, "
+            "year INTEGER NOT NULL, rating FLOAT NOT NULL, user_id INTEGER REFERENCES users (id));"
+            "CREATE TABLE omdb_cache (title_key VARCHAR PRIMARY KEY, payload TEXT, found BOOLEAN NOT NULL, "
+            "fetched_at FLOAT NOT NULL);"
+            "INSERT INTO users (name) VALUES ('alice');"
+            "INSERT INTO movies (name, year, rating, user_id) VALUES ('AMÉLIE', 2001, 8.3, 1), "
+            "('Amélie', 2001, 9.5, 1), ('Alien', 1979, 8.5, 1);"
+        )
+        connection.execute("INSERT INTO omdb_cache VALUES ('amélie', ?, 1, 0)", (payload,))
+    connection.close()
+
+    data_manager = create_data_manager(f"sqlite:///{path}")
+    try:
+        with data_manager.engine.connect() as connection:
+            rows = connection.exec_driver_sql("SELECT name, year, rating, imdb_id FROM movies ORDER BY id").all()
+        # Matched however the title is cased; only what differs from the catalog stays on the movies
+        assert rows == [('AMÉLIE', None, None, 'tt0211915'), (None, None, 9.5, 'tt0211915'),
+                        ('Alien', 1979, 8.5, None)]
+        assert [(movie['name'], movie['rating']) for movie in data_manager.get_user_movies(1)] == [
+            ('Alien', 8.5), ('Amélie', 9.5), ('AMÉLIE', 8.3)]
+        assert {movie['id'] for movie in data_manager.search_movies('amel')} == {1, 2}
+    finally:
+        data_manager.read_engine.dispose()
+        data_manager.engine.dispose()